@@ -0,0 +1,122 @@
+import gzip
+import zlib
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_header_parameters
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# content types worth compressing; event streams are left alone so every event is flushed as it is sent
+COMPRESSIBLE_TYPES = {
+    'application/json',
+    'application/geo+json',
+    'application/x-ndjson',
+    'application/vnd.mapbox-vector-tile',
+    'text/csv',
+    'text/plain',
+}
+# cheap levels for responses compressed on every request, dearer ones for bytes compressed once and cached
+DYNAMIC_LEVELS = {'br': 4, 'gzip': 6}
+CACHED_LEVELS = {'br': 9, 'gzip': 9}
+
+
+def supported_encodings():
+    return ('br', 'gzip') if brotli else ('gzip',)
+
+def negotiate_encoding(accept_encoding):
+    """the content coding to answer an Accept-Encoding header with, br before gzip on equal weights, None for identity"""
+    weights = {}
+    for part in accept_encoding.split(','):
+        coding, params = parse_header_parameters(part)
+        if not coding:
+            continue
+        try:
+            weights[coding] = float(params.get('q', 1))
+        except ValueError:
+            weights[coding] = 0
+    best, best_weight = None, 0
+    for coding in supported_encodings():
+        weight = weights.get(coding, weights.get('*', 0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+def request_encoding(request):
+    return negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+
+def compress(data, encoding, cached=False):
+    level = (CACHED_LEVELS if cached else DYNAMIC_LEVELS)[encoding]
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    # no timestamp in the header so the same bytes always compress the same way
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+def compress_stream(chunks, encoding):
+    """compress an iterable of bytes, flushing after every chunk so rows reach the client as they are read"""
+    level = DYNAMIC_LEVELS[encoding]
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=level)
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def set_content_encoding(response, encoding):
+    """mark a response as encoded and vary it on Accept-Encoding; strong ETags become weak as the bytes differ"""
+    if encoding:
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+def is_compressible(response):
+    content_type, _ = parse_header_parameters(response.get('Content-Type', ''))
+    return content_type in COMPRESSIBLE_TYPES
+
+
+class CompressionMiddleware:
+    """compress API responses with brotli or gzip, whichever the client prefers
+
+    responses smaller than COMPRESSION_MIN_SIZE, partial responses and responses a view already encoded,
+    such as cached tiles, are sent as they are.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.status_code != 200 or response.has_header('Content-Encoding') or not is_compressible(response):
+            return response
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = request_encoding(request)
+        if encoding is None:
+            return response
+        if response.streaming:
+            if response.is_async:
+                return response
+            response.streaming_content = compress_stream(response.streaming_content, encoding)
+            del response['Content-Length']
+        else:
+            content = compress(response.content, encoding)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response['Content-Length'] = str(len(content))
+        return set_content_encoding(response, encoding)
@@ -0,0 +1,32 @@
+import hashlib
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+def detail_validators(instance):
+    """strong (etag, last_modified) of one row, instance only needs its pk and updated_at loaded"""
+    version = int(instance.updated_at.timestamp() * 1_000_000)
+    return f'"{instance._meta.label_lower}.{instance.pk}.{version}"', instance.updated_at
+
+def list_validators(request, queryset, field='updated_at'):
+    """weak (etag, last_modified) of a list page from max(updated_at) and the row count of its queryset
+
+    the full path is part of the tag so every page and filter combination is validated separately.
+    """
+    summary = queryset.order_by().aggregate(last_modified=Max(field), count=Count('pk'))
+    key = f'{request.get_full_path()}|{summary["last_modified"]}|{summary["count"]}'
+    return f'W/"{hashlib.md5(key.encode()).hexdigest()}"', summary['last_modified']
+
+def not_modified(request, etag, last_modified):
+    """a 304 response when the client's copy matches the validators, None when it must be rendered"""
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    return set_validators(response, etag, last_modified) if response is not None else None
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_cache_control(response, no_cache=True)
+    return response
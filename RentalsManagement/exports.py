@@ -0,0 +1,107 @@
+import csv
+import io
+import zlib
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from announcements.models import Comment, Notice
+from buildings.functions import X, Y
+from buildings.models import Building
+from users.models import Profile, UserBuilding
+
+EXPORT_CHUNK_SIZE = 2000
+BUFFER_SIZE = 64 * 1024
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+EXPORTS = {
+    'buildings': lambda: (
+        Building.objects.annotate(lon=X('building'), lat=Y('building')),
+        ('id', 'lon', 'lat', 'county', 'district', 'rent', 'payment_details', 'occupancy', 'created_at', 'updated_at')),
+    'profiles': lambda: (
+        Profile.objects.all(),
+        ('id', 'user_id', 'user__username', 'user__email', 'phone', 'address')),
+    'user_buildings': lambda: (
+        UserBuilding.objects.all(),
+        ('id', 'profile_id', 'profile__user__username', 'building_id', 'relationship')),
+    'notices': lambda: (
+        Notice.objects.all(),
+        ('id', 'owner_id', 'owner__username', 'building_id', 'notice', 'created_at', 'updated_at')),
+    'comments': lambda: (
+        Comment.objects.all(),
+        ('id', 'tenant_id', 'tenant__username', 'building_id', 'comment', 'created_at', 'updated_at')),
+}
+
+encoder = DjangoJSONEncoder(separators=(',', ':'))
+
+
+def export_rows(name, chunk_size=EXPORT_CHUNK_SIZE):
+    """(columns, rows) of an export, rows are tuples read through a server-side cursor"""
+    if name not in EXPORTS:
+        raise ValueError(f'unknown export {name}, choose one of {", ".join(EXPORTS)}')
+    queryset, columns = EXPORTS[name]()
+    return columns, queryset.order_by('pk').values_list(*columns).iterator(chunk_size=chunk_size)
+
+def csv_chunks(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= BUFFER_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def ndjson_chunks(columns, rows):
+    lines = []
+    size = 0
+    for row in rows:
+        line = encoder.encode(dict(zip(columns, row)))
+        lines.append(line)
+        size += len(line) + 1
+        if size >= BUFFER_SIZE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+            size = 0
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+def gzip_chunks(chunks):
+    """compress text chunks into a single gzip member as they are produced"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+def export_stream(name, export_format, compress=False):
+    """chunks of an export in csv or ndjson, gzip compressed bytes when compress is set"""
+    if export_format not in FORMATS:
+        raise ValueError(f'unknown format {export_format}, choose one of {", ".join(FORMATS)}')
+    columns, rows = export_rows(name)
+    chunks = csv_chunks(columns, rows) if export_format == 'csv' else ndjson_chunks(columns, rows)
+    return gzip_chunks(chunks) if compress else chunks
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_data(request, name, export_format):
+    compress = request.query_params.get('gzip') == 'true'
+    try:
+        chunks = export_stream(name, export_format, compress)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+    filename = f'{name}.{export_format}'
+    if compress:
+        response = StreamingHttpResponse(chunks, content_type='application/gzip')
+        filename += '.gz'
+    else:
+        response = StreamingHttpResponse(chunks, content_type=f'{FORMATS[export_format]}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
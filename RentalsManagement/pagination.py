@@ -0,0 +1,39 @@
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+CREATED_ORDERING = ('created_at', 'pk')
+
+
+class CursorPaginator(CursorPagination):
+    """keyset pagination shared by every list endpoint
+
+    Pages are addressed by an opaque cursor holding the position of the last
+    row seen, so the database seeks straight to the page through the index on
+    the ordering columns instead of counting and skipping every earlier row.
+    The total count is only computed when the client asks for it with
+    ?count=true.
+    """
+    page_size = 5
+    max_page_size = 20
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    ordering = 'pk'
+
+    def __init__(self, ordering=None):
+        if ordering is not None:
+            self.ordering = ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(self.count_query_param) == 'true':
+            self.count = queryset.count()
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_page_links(self):
+        links = {'next': self.get_next_link(), 'previous': self.get_previous_link()}
+        if self.count is not None:
+            links['count'] = self.count
+        return links
+
+    def get_paginated_response(self, data):
+        return Response({**self.get_page_links(), 'results': data})
@@ -0,0 +1,82 @@
+import datetime
+import json
+from decimal import Decimal
+from django.contrib.gis.geos import GEOSGeometry
+from django.utils.http import parse_header_parameters
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class APIJSONEncoder(JSONEncoder):
+    """DRF's encoder, writing values the way the serializers and orjson do
+
+    decimals become strings, datetimes keep their microseconds with a Z for UTC and GEOS geometries
+    become GeoJSON geometries.
+    """
+
+    def default(self, o):
+        if isinstance(o, Decimal):
+            return str(o)
+        if isinstance(o, datetime.datetime):
+            value = o.isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        if isinstance(o, GEOSGeometry):
+            if o.geom_type == 'GeometryCollection':
+                return json.loads(o.json)
+            return {'type': o.geom_type, 'coordinates': o.coords}
+        return super().default(o)
+
+
+encoder = APIJSONEncoder(separators=(',', ':'), ensure_ascii=False)
+
+
+def stdlib_dumps(data):
+    return encoder.encode(data).encode()
+
+def orjson_dumps(data):
+    try:
+        return orjson.dumps(data, default=encoder.default, option=orjson.OPT_UTC_Z)
+    except orjson.JSONEncodeError:
+        # integer keys are rare and make every dump slower, only retry with them allowed
+        return orjson.dumps(data, default=encoder.default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+
+# orjson when it is installed, the standard library otherwise; dumps returns bytes, loads takes bytes or str
+dumps = orjson_dumps if orjson else stdlib_dumps
+loads = orjson.loads if orjson else json.loads
+
+
+class FastJSONRenderer(BaseRenderer):
+    """compact JSON rendered by orjson, or the standard library when it is missing"""
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        try:
+            indent = max(0, min(int(parse_header_parameters(accepted_media_type or '')[1]['indent']), 8))
+        except (KeyError, ValueError):
+            indent = None
+        if indent:
+            # the browsable API asks for indented JSON, which is not worth a fast path
+            return json.dumps(data, cls=APIJSONEncoder, indent=indent, ensure_ascii=False).encode()
+        return dumps(data)
+
+
+class FastJSONParser(BaseParser):
+    media_type = 'application/json'
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return loads(stream.read() if stream is not None else b'')
+        except ValueError as e:
+            raise ParseError(f'JSON parse error - {e}')
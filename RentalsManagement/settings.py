@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 import os
 load_dotenv()
 
@@ -50,6 +51,7 @@ if os.getenv('SECRET_APP', 'false').lower() == 'true':
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'RentalsManagement.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -94,6 +96,32 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'tiles': {
+        'BACKEND': os.getenv('TILE_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('TILE_CACHE_LOCATION', str(BASE_DIR / 'cache' / 'tiles')),
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('TILE_CACHE_MAX_ENTRIES', 200000)),
+        },
+    },
+}
+
+# manage.py test swaps the caches for in-memory ones
+TEST_RUNNER = 'RentalsManagement.test_runner.TestRunner'
+
+
+# Compression
+# responses smaller than this many bytes are not worth compressing
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -130,6 +158,25 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Building photos and videos
+# https://docs.djangoproject.com/en/5.1/topics/files/
+
+MEDIA_URL = os.getenv('MEDIA_URL', '/media/')
+MEDIA_ROOT = os.getenv('MEDIA_ROOT', str(BASE_DIR / 'media'))
+MEDIA_UPLOAD_MAX_SIZE = int(os.getenv('MEDIA_UPLOAD_MAX_SIZE', 1024 * 1024 * 1024))
+MEDIA_THUMBNAIL_SIZE = (320, 320)
+# processes rendering thumbnails and video previews, 0 renders them in the request process
+MEDIA_THUMBNAIL_WORKERS = int(os.getenv('MEDIA_THUMBNAIL_WORKERS', 2))
+# 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache, lighttpd) lets the front server send media files
+MEDIA_SENDFILE = os.getenv('MEDIA_SENDFILE', '').lower()
+if MEDIA_SENDFILE not in ('', 'x-accel-redirect', 'x-sendfile'):
+    raise ImproperlyConfigured(f"MEDIA_SENDFILE must be 'x-accel-redirect', 'x-sendfile' or empty, not {MEDIA_SENDFILE!r}")
+MEDIA_ACCEL_REDIRECT_LOCATION = os.getenv('MEDIA_ACCEL_REDIRECT_LOCATION', '/protected-media/')
+
+# Duplicate buildings
+# a building created within this many meters of a stored one is refused as a duplicate, 0 turns the check off
+BUILDING_DUPLICATE_RADIUS = float(os.getenv('BUILDING_DUPLICATE_RADIUS', 25))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -143,7 +190,16 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework_simplejwt.authentication.JWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
-    ]
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'RentalsManagement.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'RentalsManagement.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=15),
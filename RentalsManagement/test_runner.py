@@ -0,0 +1,21 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+# tests never touch the tile cache on disk, every run shares one in-memory cache
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'tiles': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-tiles'},
+}
+
+
+class TestRunner(DiscoverRunner):
+    """the default runner with the caches swapped for in-memory ones"""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.test_caches = override_settings(CACHES=TEST_CACHES)
+        self.test_caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_caches.disable()
+        super().teardown_test_environment(**kwargs)
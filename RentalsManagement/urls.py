@@ -14,9 +14,12 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from RentalsManagement.exports import export_data
 import os
 from dotenv import load_dotenv
 
@@ -30,7 +33,11 @@ urlpatterns = [
     path('api/v1/announcements/', include('announcements.api.v1.urls')),
     path('api/v1/building/', include('buildings.api.v1.urls')),
     path('buildings/', include('buildings.urls')),
+    path('api/v1/exports/<slug:name>.<slug:export_format>', export_data, name='api-export_data'),
 ]
 
+# in production the front server serves MEDIA_ROOT, static() only adds the route when DEBUG is on
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+
 if os.getenv('SECRET_APP', 'false').lower() == 'true':
     urlpatterns.insert(1, path('', include('secret_app.urls')))
@@ -7,7 +7,8 @@ from announcements.serializers import NoticeSerializer, CommentSerializer
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, IsAdminUser
-from announcements.pagination import CustomPaginator
+from RentalsManagement.pagination import CursorPaginator, CREATED_ORDERING
+from RentalsManagement.conditional import detail_validators, list_validators, not_modified, set_validators
 from rest_framework.exceptions import PermissionDenied, NotAuthenticated
 
 """
@@ -25,6 +26,17 @@ def check_permission_filter_by_user(request, user):
         if request.user != user:
             raise PermissionDenied('permission denied')
 
+def paginated_response(request, queryset, serializer_class):
+    """one cursor page of the queryset, or 304 when the client's weak etag still matches"""
+    validators = list_validators(request, queryset)
+    response = not_modified(request, *validators)
+    if response is not None:
+        return response
+    paginator = CursorPaginator(CREATED_ORDERING)
+    paginated_queryset = paginator.paginate_queryset(queryset, request)
+    data = list(map(lambda x: serializer_class(x).data, paginated_queryset))
+    return set_validators(paginator.get_paginated_response(data), *validators)
+
 @api_view(['GET', 'PUT'])
 def comment_list_create(request):
 
@@ -46,10 +58,7 @@ def comment_list_create(request):
         if not IsAdminUser().has_permission(request, None):
             return Response({'error': 'user lacks permission to access this data'}, status=status.HTTP_403_FORBIDDEN)
         comments = Comment.objects.all()
-        paginator = CustomPaginator()
-        paginated_queryset = paginator.paginate_queryset(comments, request)
-        all_comments = list(map(lambda x: CommentSerializer(x).data, paginated_queryset))
-        return paginator.get_paginated_response(all_comments)
+        return paginated_response(request, comments, CommentSerializer)
     
     if request.method == 'PUT':
         try:
@@ -76,16 +85,20 @@ def comment_list_create(request):
 def comment_retrieve_update(request, comment_id):
 
     def check_permission(tenant, comment):
-        if tenant != comment.tenant:
+        if tenant.pk != comment.tenant_id:
             raise PermissionDenied('user lacks permission to perform this action')
     
     if request.method == 'GET':
         try:
-            comment =Comment.objects.get(pk=comment_id)
+            comment = Comment.objects.only('tenant', 'updated_at').get(pk=comment_id)
             if not IsAdminUser().has_permission(request, None):
                 check_permission(request.user, comment)
+            response = not_modified(request, *detail_validators(comment))
+            if response is not None:
+                return response
+            comment = Comment.objects.get(pk=comment_id)
             serializer = CommentSerializer(comment)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return set_validators(Response(serializer.data, status=status.HTTP_200_OK), *detail_validators(comment))
         except Comment.DoesNotExist:
             return Response({'error': 'comment id does not exist'}, status=status.HTTP_404_NOT_FOUND)
         except PermissionError as e:
@@ -124,10 +137,7 @@ def comment_list_by_building(request, building_id):
         building = Building.objects.get(pk=building_id)
         check_permission_filter_by_building(request, building)
         all_building_comments = building.comments.all()
-        paginator = CustomPaginator()
-        paginated_queryset = paginator.paginate_queryset(all_building_comments, request)
-        comments = list(map(lambda x: CommentSerializer(x).data, paginated_queryset))
-        return paginator.get_paginated_response(comments)
+        return paginated_response(request, all_building_comments, CommentSerializer)
     except Building.DoesNotExist:
         return Response({'error': 'Building does not exist'}, status=status.HTTP_404_NOT_FOUND)
     except PermissionDenied as e:
@@ -140,10 +150,7 @@ def comment_list_by_user(request, user_id):
         user = User.objects.get(pk=user_id)
         check_permission_filter_by_user(request, user)
         all_user_comments = Comment.objects.filter(tenant=user)
-        paginator = CustomPaginator()
-        paginated_queryset = paginator.paginate_queryset(all_user_comments, request)
-        comments = list(map(lambda x: CommentSerializer(x).data, paginated_queryset))
-        return paginator.get_paginated_response(comments)
+        return paginated_response(request, all_user_comments, CommentSerializer)
     except User.DoesNotExist:
         return Response({'error': 'user does not exist'}, status=status.HTTP_404_NOT_FOUND)
     except PermissionDenied as e:
@@ -170,10 +177,7 @@ def notice_list_create(request):
         if not IsAdminUser().has_permission(request, None):
             return Response({'error': 'user lacks permission to access this data'}, status=status.HTTP_403_FORBIDDEN)
         notices = Notice.objects.all()
-        paginator = CustomPaginator()
-        paginated_queryset = paginator.paginate_queryset(notices, request)
-        all_notices = list(map(lambda x: NoticeSerializer(x).data, paginated_queryset))
-        return paginator.get_paginated_response(all_notices)
+        return paginated_response(request, notices, NoticeSerializer)
     
     if request.method == 'PUT':
         try:
@@ -199,15 +203,19 @@ def notice_list_create(request):
 def notice_retrieve_update(request, notice_id):
 
     def check_permission(owner, notice):
-        if owner != notice.owner:
+        if owner.pk != notice.owner_id:
             if not IsAdminUser().has_permission(request, None):
                 raise PermissionDenied('user not authorized to perform this action')
     if request.method == 'GET':
         try:
-            notice =Notice.objects.get(pk=notice_id)
+            notice = Notice.objects.only('owner', 'updated_at').get(pk=notice_id)
             check_permission(request.user, notice)
+            response = not_modified(request, *detail_validators(notice))
+            if response is not None:
+                return response
+            notice = Notice.objects.get(pk=notice_id)
             serializer = NoticeSerializer(notice)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return set_validators(Response(serializer.data, status=status.HTTP_200_OK), *detail_validators(notice))
         except Notice.DoesNotExist:
             return Response({'error': 'notice id does not exist'}, status=status.HTTP_404_NOT_FOUND)
         except PermissionDenied as e:
@@ -245,10 +253,7 @@ def notice_list_by_building(request, building_id):
         building = Building.objects.get(pk=building_id)
         check_permission_filter_by_building(request, building)
         all_building_notices = building.notices.all()
-        paginator = CustomPaginator()
-        paginated_queryset = paginator.paginate_queryset(all_building_notices, request)
-        notices = list(map(lambda x: NoticeSerializer(x).data, paginated_queryset))
-        return paginator.get_paginated_response(notices)
+        return paginated_response(request, all_building_notices, NoticeSerializer)
     except Building.DoesNotExist:
         return Response({'error': 'Building does not exist'}, status=status.HTTP_404_NOT_FOUND)
     except PermissionDenied as e:
@@ -261,10 +266,7 @@ def notice_list_by_user(request, user_id):
         user = User.objects.get(pk=user_id)
         check_permission_filter_by_user(request, user)
         all_user_notices = Notice.objects.filter(owner=user)
-        paginator = CustomPaginator()
-        paginated_queryset = paginator.paginate_queryset(all_user_notices, request)
-        notices = list(map(lambda x: NoticeSerializer(x).data, paginated_queryset))
-        return paginator.get_paginated_response(notices)
+        return paginated_response(request, all_user_notices, NoticeSerializer)
     except User.DoesNotExist:
         return Response({'error': 'user does not exist'}, status=status.HTTP_404_NOT_FOUND)
     except PermissionDenied as e:
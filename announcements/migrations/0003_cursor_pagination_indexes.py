@@ -0,0 +1,40 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('announcements', '0002_comment_updated_at_notice_updated_at'),
+        ('buildings', '0004_remove_building_comment'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['created_at', 'id'], name='comment_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['building', 'created_at', 'id'], name='comment_building_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['tenant', 'created_at', 'id'], name='comment_tenant_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notice',
+            index=models.Index(fields=['created_at', 'id'], name='notice_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notice',
+            index=models.Index(fields=['building', 'created_at', 'id'], name='notice_building_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notice',
+            index=models.Index(fields=['owner', 'created_at', 'id'], name='notice_owner_created_idx'),
+        ),
+    ]
@@ -15,6 +15,11 @@ class Notice(models.Model):
 
     class Meta:
         db_table = 'notice'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='notice_created_idx'),
+            models.Index(fields=['building', 'created_at', 'id'], name='notice_building_created_idx'),
+            models.Index(fields=['owner', 'created_at', 'id'], name='notice_owner_created_idx'),
+        ]
 
 
 class Comment(models.Model):
@@ -29,4 +34,9 @@ class Comment(models.Model):
         return f'{self.tenant.username} Announcement'
 
     class Meta:
-        db_table = 'comment'
\ No newline at end of file
+        db_table = 'comment'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='comment_created_idx'),
+            models.Index(fields=['building', 'created_at', 'id'], name='comment_building_created_idx'),
+            models.Index(fields=['tenant', 'created_at', 'id'], name='comment_tenant_created_idx'),
+        ]
\ No newline at end of file
@@ -0,0 +1,12 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from announcements.models import Notice
+from buildings.events import broadcaster, notice_event
+
+
+@receiver(post_save, sender=Notice)
+def publish_notice_after_create(sender, instance, created, **kwargs):
+    if created:
+        event = notice_event(instance)
+        transaction.on_commit(lambda: broadcaster.publish(event))
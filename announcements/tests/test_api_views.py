@@ -3,6 +3,7 @@ from django.contrib.auth.models import User
 from announcements.models import Comment, Notice
 from buildings.models import Building
 from django.urls import reverse
+from django.contrib.gis.geos import Point
 
 class TestComments(APITestCase):
     @classmethod
@@ -443,4 +444,55 @@ class TestNotices(APITestCase):
     def test_list_user_notices_fails_for_nonexistent_user(self):
         response = self.client.get(reverse('api_notice_list_by_user', args=[self.tenant.pk + self.admin.pk + self.regular_user.pk]), headers={'Authorization': f'Bearer {self.admin_token}'})
         self.assertEqual(response.status_code, 404)
-        self.assertEqual(response.json()['error'], 'user does not exist')
\ No newline at end of file
+        self.assertEqual(response.json()['error'], 'user does not exist')
+
+class TestConditionalGet(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='etag_owner', password='Yyugbcdasdd@178')
+        cls.owner_token = APIClient().post(reverse('api-user_login'), data={'username': 'etag_owner', 'password': 'Yyugbcdasdd@178'}).json()['access']
+        cls.other = User.objects.create_user(username='etag_other', password='Yyugbcdasdd@178')
+        cls.other_token = APIClient().post(reverse('api-user_login'), data={'username': 'etag_other', 'password': 'Yyugbcdasdd@178'}).json()['access']
+        cls.building = Building.objects.create(building=Point(33.1, -4.0))
+
+    def setUp(self):
+        self.notice = Notice.objects.create(owner=self.owner, building=self.building, notice='rent is due')
+        self.notice_url = reverse('api_notice_retrieve_update', args=[self.notice.pk])
+        self.auth = {'Authorization': f'Bearer {self.owner_token}'}
+
+    def test_notice_not_modified(self):
+        response = self.client.get(self.notice_url, headers=self.auth)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        # the token's user and the notice's owner and updated_at, nothing is serialized
+        with self.assertNumQueries(2):
+            response = self.client.get(self.notice_url, headers={**self.auth, 'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        response = self.client.get(self.notice_url, headers={**self.auth, 'If-Modified-Since': response['Last-Modified']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_notice_modified_after_update(self):
+        etag = self.client.get(self.notice_url, headers=self.auth)['ETag']
+        self.client.patch(self.notice_url, data={'notice': 'rent is overdue'}, headers=self.auth)
+        response = self.client.get(self.notice_url, headers={**self.auth, 'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['notice'], 'rent is overdue')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_notice_not_modified_still_checks_permission(self):
+        etag = self.client.get(self.notice_url, headers=self.auth)['ETag']
+        response = self.client.get(self.notice_url, headers={'Authorization': f'Bearer {self.other_token}', 'If-None-Match': etag})
+        self.assertEqual(response.status_code, 403)
+
+    def test_notice_list_weak_etag(self):
+        url = reverse('api_notice_list_by_user', args=[self.owner.pk])
+        response = self.client.get(url, headers=self.auth)
+        self.assertTrue(response['ETag'].startswith('W/'))
+        response = self.client.get(url, headers={**self.auth, 'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+        Notice.objects.create(owner=self.owner, building=self.building, notice='water outage')
+        response = self.client.get(url, headers={**self.auth, 'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 2)
@@ -0,0 +1,94 @@
+import asyncio
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import AuthenticationFailed, PermissionDenied
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from buildings.events import broadcaster, format_event
+from buildings.filters import parse_bbox
+from users.models import UserBuilding
+
+HEARTBEAT_INTERVAL = 15
+STREAM_LIFETIME = 600
+RETRY_MILLISECONDS = 3000
+
+
+async def authenticate(request):
+    """session user, else the user of a JWT access token from the Authorization header or ?token=
+
+    browsers cannot set headers on an EventSource, hence the query parameter.
+    """
+    user = await request.auser()
+    if user.is_authenticated:
+        return user
+    header = request.headers.get('Authorization', '')
+    raw_token = header[len('Bearer '):] if header.startswith('Bearer ') else request.GET.get('token')
+    if not raw_token:
+        return None
+    authentication = JWTAuthentication()
+    try:
+        token = authentication.get_validated_token(raw_token)
+        return await sync_to_async(authentication.get_user)(token)
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+
+def parse_building_ids(value):
+    if value is None:
+        return None
+    try:
+        return {int(x) for x in value.split(',') if x.strip()}
+    except ValueError:
+        raise ValueError('buildings must be comma separated building ids')
+
+def subscribed_building_ids(user, requested):
+    """the linked buildings of the user, or the requested ones when the user may follow them"""
+    linked = set(UserBuilding.objects.filter(profile__user=user).values_list('building_id', flat=True))
+    if requested is None:
+        return linked
+    if not user.is_staff and not requested <= linked:
+        raise PermissionDenied('user profile not linked to building')
+    return requested
+
+async def event_stream(building_ids, bbox, lifetime=STREAM_LIFETIME):
+    """server-sent events until the client leaves or the stream lifetime ends, EventSource then reconnects"""
+    subscription = broadcaster.subscribe(building_ids, bbox)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + lifetime
+    try:
+        yield f'retry: {RETRY_MILLISECONDS}\n\n'
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), min(HEARTBEAT_INTERVAL, remaining))
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if subscription.overflowed:
+                subscription.overflowed = False
+                yield 'event: resync\ndata: {}\n\n'
+            yield format_event(event)
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+async def building_events(request):
+    if request.method != 'GET':
+        return JsonResponse({'error': f'method {request.method} not allowed'}, status=405)
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'the event stream is only served by the ASGI application'}, status=501)
+    user = await authenticate(request)
+    if user is None:
+        return JsonResponse({'error': 'authentication required'}, status=401)
+    try:
+        bbox = parse_bbox(request.GET['bbox']).extent if request.GET.get('bbox') else None
+        requested = parse_building_ids(request.GET.get('buildings'))
+        building_ids = await sync_to_async(subscribed_building_ids)(user, requested)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except PermissionDenied as e:
+        return JsonResponse({'error': str(e.detail)}, status=403)
+    if not building_ids and bbox is None:
+        return JsonResponse({'error': 'no linked buildings, subscribe with buildings or bbox'}, status=400)
+    response = StreamingHttpResponse(event_stream(building_ids, bbox), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
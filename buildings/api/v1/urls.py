@@ -1,11 +1,24 @@
 from django.urls import path
 from buildings.api.v1 import views as building_api
+from buildings.api.v1.events import building_events
 
 urlpatterns = [
     path('', building_api.building_list_create, name="api-building_list_create"),
+    path('bulk/', building_api.building_bulk_create, name='api-building_bulk_create'),
+    path('clusters/', building_api.building_clusters, name='api-building_clusters'),
+    path('tiles/<int:z>/<int:x>/<int:y>.mvt', building_api.building_tile, name='api-building_tile'),
+    path('search/', building_api.building_search, name='api-building_search'),
+    path('events/', building_events, name='api-building_events'),
+    path('stats/', building_api.building_stats, name='api-building_stats'),
+    path('heatmap/', building_api.building_heatmap, name='api-building_heatmap'),
+    path('nearest/', building_api.building_nearest, name='api-building_nearest'),
     path('<int:building_id>/', building_api.building_retrieve_update, name='api-building_retrieve_update'),
     #path('<int:building_id>/profile/', building_api.building_profile_add, name='api-building_profile_add'),
     #path('<int:building_id>/profile/<int:user_id>/', building_api.building_profile_delete, name='api-building_profile_delete'),
     #path('<int:building_id>/users', building_api.building_users, name="api-building_users_list"),
+    path('<int:building_id>/media/', building_api.building_media_list_create, name='api-building_media_list_create'),
+    path('<int:building_id>/media/<int:media_id>/', building_api.building_media_delete, name='api-building_media_delete'),
+    path('<int:building_id>/media/<int:media_id>/file/', building_api.building_media_file, name='api-building_media_file'),
+    path('media/uploads/<uuid:upload_id>/', building_api.media_upload, name='api-media_upload'),
     path('by-user/<int:user_id>/', building_api.buildings_list_by_user, name='api-buildings_list_by_user')
 ]
\ No newline at end of file
@@ -1,25 +1,60 @@
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, parser_classes
 from django.contrib.auth.models import User
 from rest_framework import status
 from rest_framework.response import Response
 from users.models import Profile
-from buildings.models import Building
-from buildings.serializers import BuildingsSerializer
+from buildings.models import Building, BuildingMedia, MediaUpload
+from buildings.serializers import BuildingsSerializer, BuildingMediaSerializer, coordinate_to_point, BULK_BATCH_SIZE, MAX_BULK_BUILDINGS
+from buildings.media import OffsetConflict, complete_upload, discard_upload, start_upload, write_chunk
+from buildings.serving import serve_file
+from buildings.parsers import NDJSONParser
+from RentalsManagement.renderers import FastJSONParser
+from RentalsManagement.compression import request_encoding, set_content_encoding
+from django.db import transaction
 from announcements.serializers import CommentSerializer, NoticeSerializer
 from users.serializers import UserSerializer, UserProfileSerializer
-from django.core import serializers
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated, IsAdminUser
 from rest_framework.decorators import permission_classes
-from buildings.pagination import CustomPaginator
+from RentalsManagement.pagination import CursorPaginator
+from RentalsManagement.conditional import detail_validators, list_validators, not_modified, set_validators
 from django.db.models.deletion import ProtectedError
 from users.models import UserBuilding
 from rest_framework.exceptions import PermissionDenied, ValidationError
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_safe
+from django.urls import reverse
+from buildings.geojson import building_rows, feature_collection, stream_feature_collection, CRS, GEOJSON_CONTENT_TYPE
+from buildings.tiles import tiles_in_bbox, validate_tile, MVT_CONTENT_TYPE
+from buildings.clusters import cluster_feature_collection, MAX_CLUSTER_TILES
+from buildings.cache import get_heatmap, get_tile, invalidate_tiles
+from buildings.stats import rent_statistics
+from buildings.search import parse_query, search_buildings
+from buildings.filters import coordinate_precision, filter_buildings, nearest_buildings, parse_bbox, parse_encoding, parse_k, parse_limit, parse_point, parse_precision, parse_zoom
+from buildings.compact import DEFAULT_COMPACT_PRECISION, compact_collection, stream_compact_collection
+from buildings.duplicates import bulk_duplicates, duplicate_features, duplicate_radius
+from buildings.heatmap import parse_metric, parse_output, parse_resolution, parse_smooth, render_heatmap, PNG_CONTENT_TYPE
 
 def check_permission_create_building(request, user_id):
         if not IsAdminUser().has_permission(request, None):
             if request.user.pk != int(user_id):
                 raise PermissionDenied('user does not have permission to perform this action')
 
+def check_permission_modify_building(request, building):
+    try:
+        if not IsAdminUser().has_permission(request, None):
+            user_building = UserBuilding.objects.get(profile=request.user.profile, building=building)
+            if user_building.relationship != 'owner':
+                raise PermissionDenied('user does not have permission to modify this building')
+    except UserBuilding.DoesNotExist:
+        raise PermissionDenied('user profile is not linked to the building')
+
+def duplicate_check_radius(request):
+    """meters of the duplicate check on a create request, None when the check is off or the client allows duplicates"""
+    radius = duplicate_radius()
+    if radius <= 0 or request.query_params.get('allow_duplicates') == 'true':
+        return None
+    return radius
+
 # def check_permission_modify_profile(building, request):
 #     if not IsAdminUser().has_permission(request, None):
 #         try:
@@ -39,16 +74,33 @@ def check_permission_create_building(request, user_id):
 def building_list_create(request):
 
     if request.method =='GET':
-        all_buildings = Building.objects.all()
+        try:
+            all_buildings = filter_buildings(Building.objects.all(), request.query_params)
+            precision = coordinate_precision(request.query_params)
+            encoding = parse_encoding(request.query_params.get('encoding'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if encoding is not None and precision is None:
+            precision = DEFAULT_COMPACT_PRECISION
+        validators = list_validators(request, all_buildings)
+        response = not_modified(request, *validators)
+        if response is not None:
+            return response
         geojson = request.query_params.get('geojson') == 'true'
+        if geojson and encoding is not None:
+            response = StreamingHttpResponse(stream_compact_collection(all_buildings, encoding, precision), content_type='application/json')
+            return set_validators(response, *validators)
         if geojson:
-            buildings = serializers.serialize('geojson', all_buildings)
-            return Response(buildings)
+            response = StreamingHttpResponse(stream_feature_collection(all_buildings, precision), content_type=GEOJSON_CONTENT_TYPE)
+            return set_validators(response, *validators)
         
-        paginator = CustomPaginator()
-        paginated_queryset = paginator.paginate_queryset(all_buildings, request)
-        buildings = list(map(lambda x: serializers.serialize('geojson', [x]), paginated_queryset))
-        return paginator.get_paginated_response(buildings)
+        paginator = CursorPaginator()
+        paginated_rows = paginator.paginate_queryset(building_rows(all_buildings), request)
+        if encoding is not None:
+            buildings = compact_collection(paginated_rows, encoding, precision, **paginator.get_page_links())
+            return set_validators(HttpResponse(buildings, content_type='application/json'), *validators)
+        buildings = feature_collection(paginated_rows, precision, **paginator.get_page_links())
+        return set_validators(HttpResponse(buildings, content_type=GEOJSON_CONTENT_TYPE), *validators)
 
     if request.method == 'PUT':
         try:
@@ -57,6 +109,11 @@ def building_list_create(request):
             check_permission_create_building(request, request.data.get('user_id'))
             serializer = BuildingsSerializer(data=request.data)
             if serializer.is_valid():
+                radius = duplicate_check_radius(request)
+                if radius is not None:
+                    candidates = duplicate_features(coordinate_to_point(serializer.validated_data['building']), radius)
+                    if candidates:
+                        return Response({'error': f'building is within {radius:g} m of existing buildings', 'candidates': candidates}, status=status.HTTP_409_CONFLICT)
                 building = serializer.save()
                 profile.buildings.add(building, through_defaults={'relationship': 'owner'})
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -68,6 +125,126 @@ def building_list_create(request):
         except PermissionDenied as e:
             return Response({'error': str(e)}, status=status.HTTP_403_FORBIDDEN)
 
+@api_view(['PUT'])
+@permission_classes([IsAuthenticated])
+@parser_classes([FastJSONParser, NDJSONParser])
+def building_bulk_create(request):
+    try:
+        user = User.objects.get(pk=request.query_params.get('user_id'))
+        profile = Profile.objects.get(user=user)
+        check_permission_create_building(request, user.pk)
+    except (User.DoesNotExist, ValueError):
+        return Response({'error': 'user does not exist'}, status=status.HTTP_404_NOT_FOUND)
+    except Profile.DoesNotExist:
+        return Response({'error': 'user profile does not exist'}, status=status.HTTP_404_NOT_FOUND)
+    except PermissionDenied as e:
+        return Response({'error': str(e)}, status=status.HTTP_403_FORBIDDEN)
+
+    serializer = BuildingsSerializer(data=request.data, many=True, max_length=MAX_BULK_BUILDINGS)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    if not serializer.valid_rows:
+        return Response({'created': [], 'errors': serializer.row_errors}, status=status.HTTP_400_BAD_REQUEST)
+    radius = duplicate_check_radius(request)
+    if radius is not None:
+        points = [coordinate_to_point(item['building']) for item in serializer.validated_data]
+        duplicates = bulk_duplicates(points, serializer.valid_rows, radius)
+        if duplicates:
+            return Response({'error': f'rows are within {radius:g} m of existing buildings or earlier rows', 'duplicates': duplicates, 'errors': serializer.row_errors}, status=status.HTTP_409_CONFLICT)
+    with transaction.atomic():
+        buildings = serializer.save()
+        UserBuilding.objects.bulk_create(
+            [UserBuilding(profile=profile, building=building, relationship='owner') for building in buildings],
+            batch_size=BULK_BATCH_SIZE)
+        transaction.on_commit(lambda: invalidate_tiles(*(building.building for building in buildings)))
+    created = [{'row': row, 'id': building.pk} for row, building in zip(serializer.valid_rows, buildings)]
+    return Response({'created': created, 'errors': serializer.row_errors}, status=status.HTTP_201_CREATED)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticatedOrReadOnly])
+def building_nearest(request):
+    try:
+        point = parse_point(request.query_params.get('lat'), request.query_params.get('lon'))
+        k = parse_k(request.query_params.get('k'))
+        buildings = filter_buildings(Building.objects.all(), request.query_params)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    rows = list(nearest_buildings(buildings, point, k))
+    for row in rows:
+        row['distance'] = round(row['distance'].m, 1)
+    return HttpResponse(feature_collection(rows), content_type=GEOJSON_CONTENT_TYPE)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticatedOrReadOnly])
+def building_clusters(request):
+    if not request.query_params.get('bbox') or request.query_params.get('zoom') is None:
+        return Response({'error': 'bbox and zoom query parameters are required'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        zoom = parse_zoom(request.query_params.get('zoom'))
+        tiles = tiles_in_bbox(*parse_bbox(request.query_params.get('bbox')).extent, zoom)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if len(tiles) > MAX_CLUSTER_TILES:
+        return Response({'error': 'bbox covers too many tiles for this zoom level'}, status=status.HTTP_400_BAD_REQUEST)
+    features = []
+    for x, y in tiles:
+        features.extend(get_tile('clusters', zoom, x, y))
+    return HttpResponse(cluster_feature_collection(features, zoom=zoom), content_type=GEOJSON_CONTENT_TYPE)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticatedOrReadOnly])
+def building_tile(request, z, x, y):
+    try:
+        validate_tile(z, x, y)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+    content_encoding = request_encoding(request)
+    response = HttpResponse(get_tile('mvt', z, x, y, content_encoding), content_type=MVT_CONTENT_TYPE)
+    return set_content_encoding(response, content_encoding)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticatedOrReadOnly])
+def building_heatmap(request):
+    if not request.query_params.get('bbox'):
+        return Response({'error': 'bbox query parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        bbox = parse_bbox(request.query_params.get('bbox'))
+        res = parse_resolution(request.query_params.get('res'))
+        metric = parse_metric(request.query_params.get('metric'))
+        smooth = parse_smooth(request.query_params.get('smooth'))
+        output = parse_output(request.query_params.get('output'))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    validators = list_validators(request, Building.objects.filter(building__contained=bbox))
+    response = not_modified(request, *validators)
+    if response is not None:
+        return response
+    # PNG is compressed already
+    content_encoding = request_encoding(request) if output == 'array' else None
+    heatmap = get_heatmap(validators[0], content_encoding, lambda: render_heatmap(bbox, res, metric, smooth, output))
+    content_type = PNG_CONTENT_TYPE if output == 'png' else 'application/json'
+    response = set_validators(HttpResponse(heatmap, content_type=content_type), *validators)
+    return set_content_encoding(response, content_encoding)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticatedOrReadOnly])
+def building_search(request):
+    try:
+        query = parse_query(request.query_params.get('q'))
+        limit = parse_limit(request.query_params.get('limit'))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return HttpResponse(feature_collection(search_buildings(query, limit)), content_type=GEOJSON_CONTENT_TYPE)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticatedOrReadOnly])
+def building_stats(request):
+    try:
+        results = rent_statistics(request.query_params.get('group_by', 'county'))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'group_by': request.query_params.get('group_by', 'county'), 'results': results}, status=status.HTTP_200_OK)
+
 # @api_view(['PATCH'])
 # @permission_classes([IsAuthenticated])
 # def building_profile_add(request, building_id):
@@ -129,28 +306,27 @@ def building_list_create(request):
 @api_view(['GET', 'DELETE', 'PATCH'])
 @permission_classes([IsAuthenticatedOrReadOnly])
 def building_retrieve_update(request, building_id):
-
-    def check_permission(building, user):
-        try:
-            if not IsAdminUser().has_permission(request, None):
-                user_building = UserBuilding.objects.get(profile=user.profile, building=building)
-                if user_building.relationship != 'owner':
-                    raise PermissionDenied('user does not have permission to modify this building')
-        except UserBuilding.DoesNotExist:
-            raise PermissionDenied('user profile is not linked to the building')
-
     try:
+        if request.method == 'GET':
+            precision = parse_precision(request.query_params['precision']) if 'precision' in request.query_params else None
+            etag, last_modified = detail_validators(Building.objects.only('updated_at').get(pk=building_id))
+            if precision is not None:
+                # every precision is its own representation and needs its own strong etag
+                etag = f'{etag[:-1]}.p{precision}"'
+            response = not_modified(request, etag, last_modified)
+            if response is not None:
+                return response
+            data = feature_collection(building_rows(Building.objects.filter(pk=building_id)), precision, crs=CRS)
+            return set_validators(HttpResponse(data, content_type=GEOJSON_CONTENT_TYPE), etag, last_modified)
         building = Building.objects.get(pk=building_id)
     except Building.DoesNotExist:
         return Response({'error': 'building does not exist'}, status=status.HTTP_404_NOT_FOUND)
-
-    if request.method == 'GET':
-        data = serializers.serialize('geojson', [building])
-        return Response(data, status=status.HTTP_200_OK)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
     if request.method == 'DELETE':
         try:
-            check_permission(building, request.user)
+            check_permission_modify_building(request, building)
             building.delete()
             return Response({'building_id': building_id, 'status': 'succesfully deleted'})
         except ProtectedError as e:
@@ -160,7 +336,7 @@ def building_retrieve_update(request, building_id):
 
     if request.method == 'PATCH':
         try:
-            check_permission(building, request.user)
+            check_permission_modify_building(request, building)
             serializer = BuildingsSerializer(building, data=request.data, partial=True)
             if serializer.is_valid():
                 serializer.save()
@@ -169,11 +345,100 @@ def building_retrieve_update(request, building_id):
         except PermissionDenied as e:
             return Response({'error': str(e)}, status=status.HTTP_403_FORBIDDEN)
 
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticatedOrReadOnly])
+def building_media_list_create(request, building_id):
+    try:
+        building = Building.objects.get(pk=building_id)
+    except Building.DoesNotExist:
+        return Response({'error': 'building does not exist'}, status=status.HTTP_404_NOT_FOUND)
+
+    if request.method == 'GET':
+        media = BuildingMedia.objects.filter(building=building).order_by('created_at', 'pk')
+        return Response(BuildingMediaSerializer(media, many=True).data, status=status.HTTP_200_OK)
+
+    if request.method == 'POST':
+        try:
+            check_permission_modify_building(request, building)
+            upload = start_upload(building, request.user, request.data.get('filename'), request.data.get('content_type'), request.data.get('size'))
+        except PermissionDenied as e:
+            return Response({'error': str(e)}, status=status.HTTP_403_FORBIDDEN)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        location = reverse('api-media_upload', args=[upload.pk])
+        return Response({'id': upload.pk, 'offset': upload.offset, 'size': upload.size, 'upload_url': location},
+                        status=status.HTTP_201_CREATED, headers={'Location': location, 'Upload-Offset': upload.offset})
+
+@api_view(['GET', 'PATCH', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def media_upload(request, upload_id):
+    """resumable upload, PATCH sends the next chunk as the raw body with its position in the Upload-Offset header"""
+    try:
+        upload = MediaUpload.objects.get(pk=upload_id)
+    except MediaUpload.DoesNotExist:
+        return Response({'error': 'upload does not exist'}, status=status.HTTP_404_NOT_FOUND)
+    if upload.owner_id != request.user.pk and not IsAdminUser().has_permission(request, None):
+        return Response({'error': 'user does not have permission to access this upload'}, status=status.HTTP_403_FORBIDDEN)
+
+    if request.method == 'GET':
+        return Response({'id': upload.pk, 'offset': upload.offset, 'size': upload.size}, status=status.HTTP_200_OK, headers={'Upload-Offset': upload.offset})
+
+    if request.method == 'DELETE':
+        discard_upload(upload)
+        return Response({'id': upload_id, 'status': 'upload discarded'}, status=status.HTTP_200_OK)
+
+    if request.method == 'PATCH':
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.headers['Content-Length'])
+        except (KeyError, ValueError):
+            return Response({'error': 'Upload-Offset and Content-Length headers are required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            with transaction.atomic():
+                upload = MediaUpload.objects.select_for_update().get(pk=upload_id)
+                upload.offset = write_chunk(upload, offset, request.stream, length)
+                upload.save(update_fields=['offset', 'updated_at'])
+        except MediaUpload.DoesNotExist:
+            return Response({'error': 'upload does not exist'}, status=status.HTTP_404_NOT_FOUND)
+        except OffsetConflict as e:
+            return Response({'error': str(e), 'offset': upload.offset}, status=status.HTTP_409_CONFLICT, headers={'Upload-Offset': upload.offset})
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if upload.offset < upload.size:
+            return Response({'id': upload.pk, 'offset': upload.offset, 'size': upload.size}, status=status.HTTP_200_OK, headers={'Upload-Offset': upload.offset})
+        media = complete_upload(upload)
+        return Response(BuildingMediaSerializer(media).data, status=status.HTTP_201_CREATED, headers={'Upload-Offset': upload.size})
+
+@require_safe
+def building_media_file(request, building_id, media_id):
+    """the media file itself, with Range support so videos can be seeked without loading them whole
+
+    a plain Django view, DRF content negotiation would refuse players that only accept video types.
+    """
+    try:
+        media = BuildingMedia.objects.only('file', 'content_type', 'sha256').get(pk=media_id, building_id=building_id)
+        return serve_file(request, media.file.name, media.content_type, f'"{media.sha256}"')
+    except (BuildingMedia.DoesNotExist, FileNotFoundError):
+        return JsonResponse({'error': 'media does not exist'}, status=status.HTTP_404_NOT_FOUND)
+
+@api_view(['DELETE'])
+@permission_classes([IsAuthenticated])
+def building_media_delete(request, building_id, media_id):
+    try:
+        media = BuildingMedia.objects.select_related('building').get(pk=media_id, building_id=building_id)
+        check_permission_modify_building(request, media.building)
+    except BuildingMedia.DoesNotExist:
+        return Response({'error': 'media does not exist'}, status=status.HTTP_404_NOT_FOUND)
+    except PermissionDenied as e:
+        return Response({'error': str(e)}, status=status.HTTP_403_FORBIDDEN)
+    media.delete()
+    return Response({'media_id': media_id, 'status': 'succesfully deleted'}, status=status.HTTP_200_OK)
+
 # @api_view(['GET'])
 # @permission_classes([IsAuthenticated])
 # def building_users(request, building_id):
 #     def paginate_data(data):
-#         paginator = CustomPaginator()
+#         paginator = CursorPaginator()
 #         paginated_queryset = paginator.paginate_queryset(data, request)
 #         users = list(map(lambda x: {'user': { **UserSerializer(x.profile.user).data, 'profile': UserProfileSerializer(x.profile).data }}, paginated_queryset))
 #         return (paginator, users)
@@ -199,7 +464,7 @@ def building_retrieve_update(request, building_id):
 def buildings_list_by_user(request, user_id):
 
     def paginate_buildings(data):
-        paginator = CustomPaginator()
+        paginator = CursorPaginator()
         paginated_queryset = paginator.paginate_queryset(data, request)
         all_buildings = list(map(lambda x: BuildingsSerializer(x.building).data, paginated_queryset))
         return (paginator, all_buildings)
@@ -221,7 +486,11 @@ def buildings_list_by_user(request, user_id):
             {'error': "Missing or invalid 'category' query parameter. Expected 'owner' or 'tenant'."},
             status=status.HTTP_400_BAD_REQUEST)
     
-    buildings = UserBuilding.objects.filter(profile=profile, relationship=category)
+    buildings = UserBuilding.objects.filter(profile=profile, relationship=category).select_related('building')
+    validators = list_validators(request, buildings, 'building__updated_at')
+    response = not_modified(request, *validators)
+    if response is not None:
+        return response
     response = paginate_buildings(buildings)
-    return response[0].get_paginated_response(response[1])
+    return set_validators(response[0].get_paginated_response(response[1]), *validators)
         
\ No newline at end of file
@@ -0,0 +1,55 @@
+from django.contrib.gis.gdal import CoordTransform, GDALException, SpatialReference
+from django.contrib.gis.geos import MultiPolygon
+from django.db.models import Case, F, OuterRef, Q, Subquery, When
+from django.db.models.functions import Coalesce, Now
+from django.db.models.lookups import Exact, IsNull
+from buildings.models import Boundary, Building
+from buildings.stats import ROLLUP_FIELDS, building_state
+
+BOUNDARY_LEVELS = ('county', 'district')
+
+
+def boundary_names(point):
+    """{level: name} of the boundaries containing a point, answered from the boundary spatial index"""
+    return dict(Boundary.objects.filter(geometry__contains=point).values_list('level', 'name'))
+
+def tag_buildings(queryset):
+    """set county and district of every building in the queryset in one UPDATE joined to the boundaries
+
+    buildings outside every boundary of a level keep their current value for that level. updated_at only
+    moves for the buildings whose county or district changes, so the other ETags stay valid.
+    """
+    changes, changed = {}, Q()
+    for level in BOUNDARY_LEVELS:
+        containing = Subquery(Boundary.objects.filter(level=level, geometry__contains=OuterRef('building')).values('name')[:1])
+        changes[level] = Coalesce(containing, F(level))
+        changed |= Q(IsNull(containing, False)) & (Q(**{f'{level}__isnull': True}) | ~Q(Exact(F(level), containing)))
+    changes['updated_at'] = Case(When(changed, then=Now()), default=F('updated_at'))
+    return queryset.update(**changes)
+
+def tag_created_buildings(buildings):
+    """tag buildings inserted with bulk_create, returning their rollup states as stored after tagging"""
+    if not Boundary.objects.exists():
+        return [building_state(building) for building in buildings]
+    created = Building.objects.filter(pk__in=[building.pk for building in buildings])
+    tag_buildings(created)
+    return list(created.values_list(*ROLLUP_FIELDS))
+
+def boundary_geometries(layer):
+    """the features of a GDAL layer as (feature, WGS84 multipolygon), skipping non polygon geometries"""
+    transform = None
+    if layer.srs is not None and layer.srs.srid != 4326:
+        transform = CoordTransform(layer.srs, SpatialReference(4326))
+    for feature in layer:
+        try:
+            geom = feature.geom
+            if transform is not None:
+                geom.transform(transform)
+            geom = geom.geos
+        except GDALException:
+            continue
+        if geom.geom_type == 'Polygon':
+            geom = MultiPolygon(geom)
+        if geom.geom_type == 'MultiPolygon':
+            geom.srid = 4326
+            yield feature, geom
@@ -0,0 +1,89 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import transaction
+from buildings.clusters import render_cluster_tile
+from buildings.tiles import render_tile, tile_for_point, MAX_ZOOM
+from RentalsManagement.compression import compress
+
+LAYER_VERSION = 1
+RENDERERS = {
+    'mvt': render_tile,
+    'clusters': render_cluster_tile,
+}
+# content codings whose bytes are cached next to a representation, whether or not brotli is installed here
+ENCODINGS = ('br', 'gzip')
+# heatmaps are keyed by the ETag of their query, old copies are left to expire
+HEATMAP_TIMEOUT = 60 * 60
+# points of the tiles to drop inside collect_invalidated_points(), None outside of it
+_invalidated_points = ContextVar('invalidated_tile_points', default=None)
+
+
+def tile_cache():
+    return caches['tiles']
+
+def tile_key(kind, z, x, y):
+    return f'buildings:{kind}:{z}/{x}/{y}'
+
+def encoded_key(key, encoding):
+    return f'{key}:{encoding}' if encoding else key
+
+def get_encoded(key, encoding, render, timeout=DEFAULT_TIMEOUT):
+    """bytes cached under key, rendered on a miss; with an encoding, their compressed bytes, compressed once and cached next to them"""
+    data = tile_cache().get(encoded_key(key, encoding), version=LAYER_VERSION)
+    if data is None:
+        data = compress(get_encoded(key, None, render, timeout), encoding, cached=True) if encoding else render()
+        tile_cache().set(encoded_key(key, encoding), data, timeout, version=LAYER_VERSION)
+    return data
+
+def get_tile(kind, z, x, y, encoding=None):
+    """rendered tile from the cache, rendering and storing it on a miss, compressed when an encoding is given"""
+    return get_encoded(tile_key(kind, z, x, y), encoding, lambda: RENDERERS[kind](z, x, y))
+
+def seed_tile(kind, z, x, y):
+    key = tile_key(kind, z, x, y)
+    tile = RENDERERS[kind](z, x, y)
+    tile_cache().set(key, tile, version=LAYER_VERSION)
+    tile_cache().delete_many([encoded_key(key, encoding) for encoding in ENCODINGS], version=LAYER_VERSION)
+    return tile
+
+def invalidate_tiles(*points):
+    """drop the cached tiles containing any of the points and their compressed copies, at every zoom level"""
+    keys = set()
+    for point in points:
+        if point is None:
+            continue
+        for z in range(MAX_ZOOM + 1):
+            x, y = tile_for_point(point.x, point.y, z)
+            for kind in RENDERERS:
+                key = tile_key(kind, z, x, y)
+                keys.add(key)
+                keys.update(encoded_key(key, encoding) for encoding in ENCODINGS)
+    if keys:
+        tile_cache().delete_many(keys, version=LAYER_VERSION)
+
+@contextmanager
+def collect_invalidated_points():
+    """drop the tiles of the building changes inside the block with one invalidate_tiles after commit"""
+    points = []
+    token = _invalidated_points.set(points)
+    try:
+        yield
+    finally:
+        _invalidated_points.reset(token)
+    if points:
+        transaction.on_commit(partial(invalidate_tiles, *points))
+
+def invalidate_tiles_on_commit(*points):
+    """drop the tiles of the points once the transaction commits, or leave it to the enclosing collect_invalidated_points()"""
+    collected = _invalidated_points.get()
+    if collected is None:
+        transaction.on_commit(partial(invalidate_tiles, *points))
+    else:
+        collected.extend(points)
+
+def get_heatmap(etag, encoding, render):
+    """a heatmap for the list ETag of its bbox and parameters, rendered once and compressed once per encoding"""
+    return get_encoded('buildings:heatmap:' + etag.strip('W/"'), encoding, render, HEATMAP_TIMEOUT)
@@ -0,0 +1,61 @@
+from decimal import Decimal
+from django.db.models import Avg, Count, F, Max, Min, Q
+from django.db.models.functions import Floor
+from django.contrib.gis.geos import Polygon
+from buildings.functions import X, Y
+from buildings.models import Building
+from buildings.tiles import tile_bounds
+from RentalsManagement.renderers import dumps
+
+CELLS_PER_TILE = 4
+MAX_CLUSTER_TILES = 64
+
+
+def cluster_buildings(queryset, z, x, y):
+    """group the buildings of one map tile into a 4x4 grid of cells in one GROUP BY query"""
+    min_lon, min_lat, max_lon, max_lat = tile_bounds(z, x, y)
+    bounds = Polygon.from_bbox((min_lon, min_lat, max_lon, max_lat))
+    bounds.srid = 4326
+    width = (max_lon - min_lon) / CELLS_PER_TILE
+    height = (max_lat - min_lat) / CELLS_PER_TILE
+    return (queryset
+        .filter(building__contained=bounds)
+        .annotate(point_lon=X('building'), point_lat=Y('building'))
+        .filter(point_lon__gte=min_lon, point_lon__lt=max_lon, point_lat__gte=min_lat, point_lat__lt=max_lat)
+        .annotate(cell_x=Floor((F('point_lon') - min_lon) / width), cell_y=Floor((F('point_lat') - min_lat) / height))
+        .values('cell_x', 'cell_y')
+        .annotate(
+            lon=Avg('point_lon'),
+            lat=Avg('point_lat'),
+            count=Count('pk'),
+            occupied=Count('pk', filter=Q(occupancy=True)),
+            min_rent=Min('rent'),
+            avg_rent=Avg('rent'),
+            max_rent=Max('rent'))
+        .order_by('cell_x', 'cell_y'))
+
+def cluster_feature(row):
+    avg_rent = row['avg_rent']
+    return {
+        'type': 'Feature',
+        'properties': {
+            'count': row['count'],
+            'occupied': row['occupied'],
+            'vacant': row['count'] - row['occupied'],
+            'min_rent': row['min_rent'],
+            'avg_rent': None if avg_rent is None else Decimal(avg_rent).quantize(Decimal('0.01')),
+            'max_rent': row['max_rent'],
+        },
+        'geometry': {'type': 'Point', 'coordinates': [row['lon'], row['lat']]},
+    }
+
+def render_cluster_tile(z, x, y):
+    """cluster features of one map tile"""
+    return [cluster_feature(row) for row in cluster_buildings(Building.objects.all(), z, x, y)]
+
+def cluster_feature_collection(features, **members):
+    return dumps({
+        'type': 'FeatureCollection',
+        **members,
+        'features': features,
+    })
@@ -0,0 +1,78 @@
+from buildings.geojson import PROPERTY_FIELDS, STREAM_CHUNK_SIZE, building_rows
+from buildings.media import media_url
+from RentalsManagement.renderers import dumps
+
+ENCODINGS = ('delta', 'polyline')
+DEFAULT_COMPACT_PRECISION = 6
+
+
+def quantize(value, precision):
+    return round(value * 10 ** precision)
+
+def polyline_value(value):
+    """one signed integer in Google's encoded polyline alphabet"""
+    value = ~(value << 1) if value < 0 else value << 1
+    chunks = []
+    while value >= 0x20:
+        chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+        value >>= 5
+    chunks.append(chr(value + 63))
+    return ''.join(chunks)
+
+def property_values(row):
+    return [media_url(row[field]) if field == 'thumbnail' else row[field] for field in PROPERTY_FIELDS]
+
+
+class CompactEncoder:
+    """encode building rows in pk order as arrays of pk and coordinate deltas followed by the properties
+
+    delta rows are [pk delta, lon delta, lat delta, *properties] with coordinates quantized to integers
+    at the given precision. polyline rows are [pk delta, *properties] and the coordinates of all rows
+    form one encoded polyline of (lat, lon) pairs at that precision.
+    """
+
+    def __init__(self, encoding, precision):
+        self.encoding = encoding
+        self.precision = precision
+        self.pk = self.lon = self.lat = 0
+        self.polyline = []
+
+    def header(self):
+        columns = ['pk', *PROPERTY_FIELDS] if self.encoding == 'polyline' else ['pk', 'lon', 'lat', *PROPERTY_FIELDS]
+        return {'encoding': self.encoding, 'precision': self.precision, 'columns': columns}
+
+    def row(self, row):
+        pk, lon, lat = row['pk'], quantize(row['lon'], self.precision), quantize(row['lat'], self.precision)
+        delta = [pk - self.pk, lon - self.lon, lat - self.lat]
+        self.pk, self.lon, self.lat = pk, lon, lat
+        if self.encoding == 'polyline':
+            self.polyline.append(polyline_value(delta[2]) + polyline_value(delta[1]))
+            return [delta[0], *property_values(row)]
+        return [*delta, *property_values(row)]
+
+    def trailer(self):
+        return {'coordinates': ''.join(self.polyline)} if self.encoding == 'polyline' else {}
+
+
+def compact_collection(rows, encoding, precision, **members):
+    """rows of one page as a compact collection in bytes, extra keyword arguments are added as members"""
+    encoder = CompactEncoder(encoding, precision)
+    encoded = [encoder.row(row) for row in sorted(rows, key=lambda x: x['pk'])]
+    return dumps({**encoder.header(), **members, 'rows': encoded, **encoder.trailer()})
+
+def stream_compact_collection(queryset, encoding, precision, chunk_size=STREAM_CHUNK_SIZE):
+    """yield the compact collection of a whole queryset in chunks, reading rows in pk order"""
+    encoder = CompactEncoder(encoding, precision)
+    yield dumps(encoder.header())[:-1] + b',"rows":['
+    separator = b''
+    encoded = []
+    for row in building_rows(queryset.order_by('pk')).iterator(chunk_size=chunk_size):
+        encoded.append(dumps(encoder.row(row)))
+        if len(encoded) == chunk_size:
+            yield separator + b','.join(encoded)
+            separator = b','
+            encoded = []
+    if encoded:
+        yield separator + b','.join(encoded)
+    trailer = dumps(encoder.trailer())
+    yield b']' + (b',' + trailer[1:] if len(trailer) > 2 else b'}')
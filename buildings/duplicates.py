@@ -0,0 +1,132 @@
+import math
+from collections import defaultdict
+from django.conf import settings
+from django.db import connection
+from django.contrib.gis.db.models.functions import Distance
+from django.contrib.gis.measure import D
+from buildings.geojson import building_feature, building_rows
+from buildings.models import Building
+
+# meters in a degree of latitude, and of longitude on the equator
+METERS_PER_DEGREE = 111320
+EARTH_RADIUS = 6371008.8
+DUPLICATE_BATCH_SIZE = 500
+
+# the dwithin in degrees is answered from the spatial index on building and is at least radius meters wide
+# at the latitude of the point; the geography dwithin then keeps the buildings that are really that close
+DEGREES = f'%s / ({METERS_PER_DEGREE} * GREATEST(cos(radians(ST_Y({{point}}))), 0.01))'
+UPLOAD_JOIN_SQL = f'''
+    WITH incoming AS (
+        SELECT n, ST_SetSRID(ST_MakePoint(lon, lat), 4326) AS geom
+        FROM unnest(%s::int[], %s::float8[], %s::float8[]) AS t(n, lon, lat)
+    )
+    SELECT i.n, b.id, ST_Distance(i.geom::geography, b.building::geography) AS distance
+    FROM incoming AS i
+    JOIN {Building._meta.db_table} AS b
+      ON ST_DWithin(b.building, i.geom, {DEGREES.format(point='i.geom')})
+     AND ST_DWithin(b.building::geography, i.geom::geography, %s)
+    ORDER BY i.n, distance
+'''
+TABLE_JOIN_SQL = f'''
+    SELECT a.id, b.id, ST_Distance(a.building::geography, b.building::geography) AS distance
+    FROM {Building._meta.db_table} AS a
+    JOIN {Building._meta.db_table} AS b
+      ON b.id > a.id
+     AND ST_DWithin(b.building, a.building, {DEGREES.format(point='a.building')})
+     AND ST_DWithin(b.building::geography, a.building::geography, %s)
+    WHERE a.id >= %s AND a.id < %s
+    ORDER BY a.id, distance
+'''
+
+
+def duplicate_radius():
+    """meters within which a new building is taken for one already stored, 0 turns the check off"""
+    return settings.BUILDING_DUPLICATE_RADIUS
+
+def radius_degrees(radius, lat):
+    """degrees covering at least radius meters in every direction around a point at latitude lat"""
+    return radius / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+
+def haversine(a, b):
+    """meters between two WGS84 points on a spherical earth"""
+    lon1, lat1, lon2, lat2 = map(math.radians, (a.x, a.y, b.x, b.y))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(h))
+
+def duplicate_candidates(point, radius):
+    """feature rows of the buildings within radius meters of point, nearest first, with their distance"""
+    queryset = (Building.objects
+        .filter(building__dwithin=(point, radius_degrees(radius, point.y)), building__distance_lte=(point, D(m=radius)))
+        .annotate(distance=Distance('building', point)))
+    return building_rows(queryset, 'distance').order_by('distance')
+
+def duplicate_features(point, radius):
+    """GeoJSON features of the buildings a new building at point would duplicate, distances in meters"""
+    features = []
+    for row in duplicate_candidates(point, radius):
+        row['distance'] = round(row['distance'].m, 1)
+        features.append(building_feature(row))
+    return features
+
+def stored_matches(points, radius):
+    """{position: [(pk, distance)]} of the stored buildings near each point, one spatial join per batch of points"""
+    matches = defaultdict(list)
+    for start in range(0, len(points), DUPLICATE_BATCH_SIZE):
+        batch = points[start:start + DUPLICATE_BATCH_SIZE]
+        if connection.ops.postgis:
+            with connection.cursor() as cursor:
+                cursor.execute(UPLOAD_JOIN_SQL, [list(range(len(batch))), [p.x for p in batch], [p.y for p in batch], radius, radius])
+                rows = cursor.fetchall()
+        else:
+            rows = [(n, row['pk'], row['distance'].m) for n, point in enumerate(batch) for row in duplicate_candidates(point, radius)]
+        for n, pk, distance in rows:
+            matches[start + n].append((pk, distance))
+    return matches
+
+def upload_matches(points, radius):
+    """{position: [(earlier position, distance)]} of points close to an earlier point of the same upload
+
+    points are hashed into a grid of cells at least radius wide, so only the neighbouring cells are compared.
+    """
+    if not points:
+        return {}
+    cell = radius_degrees(radius, max(abs(p.y) for p in points))
+    grid = defaultdict(list)
+    matches = defaultdict(list)
+    for position, point in enumerate(points):
+        cx, cy = math.floor(point.x / cell), math.floor(point.y / cell)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for earlier in grid[(cx + dx, cy + dy)]:
+                    distance = haversine(points[earlier], point)
+                    if distance <= radius:
+                        matches[position].append((earlier, distance))
+        grid[(cx, cy)].append(position)
+    return matches
+
+def bulk_duplicates(points, rows, radius):
+    """[{'row', 'candidates'}] for the points of an upload that duplicate a stored building or an earlier row
+
+    rows holds the row number of every point in the upload, candidates are {'id', 'distance'} for stored
+    buildings and {'row', 'distance'} for earlier rows, nearest first.
+    """
+    stored = stored_matches(points, radius)
+    upload = upload_matches(points, radius)
+    duplicates = []
+    for position in sorted(stored.keys() | upload.keys()):
+        candidates = [{'id': pk, 'distance': round(distance, 1)} for pk, distance in stored.get(position, [])]
+        candidates += [{'row': rows[earlier], 'distance': round(distance, 1)} for earlier, distance in upload.get(position, [])]
+        duplicates.append({'row': rows[position], 'candidates': sorted(candidates, key=lambda x: x['distance'])})
+    return duplicates
+
+def table_duplicates(start, stop, radius):
+    """(pk, duplicate pk, distance) of the buildings with start <= pk < stop and the later buildings near them"""
+    if connection.ops.postgis:
+        with connection.cursor() as cursor:
+            cursor.execute(TABLE_JOIN_SQL, [radius, radius, start, stop])
+            return cursor.fetchall()
+    pairs = []
+    for building in Building.objects.filter(pk__gte=start, pk__lt=stop).only('pk', 'building').order_by('pk'):
+        candidates = duplicate_candidates(building.building, radius).filter(pk__gt=building.pk)
+        pairs.extend((building.pk, row['pk'], row['distance'].m) for row in candidates)
+    return pairs
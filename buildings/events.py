@@ -0,0 +1,86 @@
+import asyncio
+import threading
+from django.core.serializers.json import DjangoJSONEncoder
+
+MAX_PENDING_EVENTS = 100
+
+encoder = DjangoJSONEncoder(separators=(',', ':'))
+
+
+class Subscription:
+    """events of some buildings, or occupancy events inside a bbox, queued for one event stream"""
+
+    def __init__(self, loop, building_ids=(), bbox=None):
+        self.loop = loop
+        self.building_ids = frozenset(building_ids)
+        self.bbox = bbox
+        self.queue = asyncio.Queue(MAX_PENDING_EVENTS)
+        self.overflowed = False
+
+    def wants(self, event):
+        if event['building'] in self.building_ids:
+            return True
+        if self.bbox is None or event['type'] != 'occupancy':
+            return False
+        min_lon, min_lat, max_lon, max_lat = self.bbox
+        return min_lon <= event['lon'] <= max_lon and min_lat <= event['lat'] <= max_lat
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # a client that stopped reading is told to refetch instead of growing the queue
+            self.overflowed = True
+
+
+class Broadcaster:
+    """in-process fan-out from model signals, which run in worker threads, to the event loops of the streams"""
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, building_ids=(), bbox=None):
+        subscription = Subscription(asyncio.get_running_loop(), building_ids, bbox)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if not subscription.wants(event):
+                continue
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:
+                # the loop of an abandoned stream is closed
+                self.unsubscribe(subscription)
+
+
+broadcaster = Broadcaster()
+
+
+def format_event(event):
+    return f'event: {event["type"]}\ndata: {encoder.encode(event)}\n\n'
+
+def occupancy_event(building):
+    return {
+        'type': 'occupancy',
+        'building': building.pk,
+        'lon': building.building.x,
+        'lat': building.building.y,
+        'occupancy': building.occupancy,
+    }
+
+def notice_event(notice):
+    return {
+        'type': 'notice',
+        'building': notice.building_id,
+        'notice': {'pk': notice.pk, 'owner': notice.owner_id, 'notice': notice.notice, 'created_at': notice.created_at},
+    }
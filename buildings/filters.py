@@ -0,0 +1,143 @@
+import math
+from decimal import Decimal, InvalidOperation
+from django.db import connection
+from django.db.models import F, Value
+from django.contrib.gis.db.models import PointField
+from django.contrib.gis.db.models.functions import Distance
+from django.contrib.gis.geos import Point, Polygon
+from buildings.functions import KNNDistance
+from buildings.geojson import building_rows
+from buildings.compact import ENCODINGS
+
+MAX_ZOOM = 22
+DEFAULT_NEAREST = 10
+MAX_NEAREST = 100
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+MAX_PRECISION = 9
+
+
+def parse_bbox(value):
+    """parse 'minLon,minLat,maxLon,maxLat' into a WGS84 polygon"""
+    try:
+        min_lon, min_lat, max_lon, max_lat = map(float, value.split(','))
+    except ValueError:
+        raise ValueError('bbox must be four comma separated numbers: minLon,minLat,maxLon,maxLat')
+    if not (-180 <= min_lon < max_lon <= 180 and -90 <= min_lat < max_lat <= 90):
+        raise ValueError('bbox is out of range or its minimum is not below its maximum')
+    bbox = Polygon.from_bbox((min_lon, min_lat, max_lon, max_lat))
+    bbox.srid = 4326
+    return bbox
+
+def parse_zoom(value):
+    try:
+        zoom = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'zoom must be an integer between 0 and {MAX_ZOOM}')
+    if not 0 <= zoom <= MAX_ZOOM:
+        raise ValueError(f'zoom must be an integer between 0 and {MAX_ZOOM}')
+    return zoom
+
+def zoom_precision(zoom):
+    """number of decimal places needed to place a point to the nearest pixel at a zoom level"""
+    return max(0, math.ceil(math.log10(256 * 2 ** zoom / 360)))
+
+def parse_precision(value):
+    """decimal places of the coordinates, 5 is about a meter and 9 keeps everything below a millimeter"""
+    try:
+        precision = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'precision must be an integer between 0 and {MAX_PRECISION}')
+    if not 0 <= precision <= MAX_PRECISION:
+        raise ValueError(f'precision must be an integer between 0 and {MAX_PRECISION}')
+    return precision
+
+def parse_encoding(value):
+    if value is not None and value not in ENCODINGS:
+        raise ValueError(f'encoding must be one of {", ".join(ENCODINGS)}')
+    return value
+
+def coordinate_precision(query_params):
+    """precision from ?precision=, else the one the ?zoom= level can display, None for full precision"""
+    if query_params.get('precision') is not None:
+        return parse_precision(query_params.get('precision'))
+    if query_params.get('zoom') is not None:
+        return zoom_precision(parse_zoom(query_params.get('zoom')))
+    return None
+
+def parse_point(lat, lon):
+    try:
+        point = Point(float(lon), float(lat), srid=4326)
+    except (TypeError, ValueError):
+        raise ValueError('lat and lon are required and must be numbers')
+    if not (-180 <= point.x <= 180 and -90 <= point.y <= 90):
+        raise ValueError('lat must be between -90 and 90 and lon between -180 and 180')
+    return point
+
+def parse_k(value):
+    if value is None:
+        return DEFAULT_NEAREST
+    try:
+        k = int(value)
+    except ValueError:
+        raise ValueError(f'k must be an integer between 1 and {MAX_NEAREST}')
+    if not 1 <= k <= MAX_NEAREST:
+        raise ValueError(f'k must be an integer between 1 and {MAX_NEAREST}')
+    return k
+
+def parse_limit(value):
+    if value is None:
+        return DEFAULT_SEARCH_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError(f'limit must be an integer between 1 and {MAX_SEARCH_LIMIT}')
+    if not 1 <= limit <= MAX_SEARCH_LIMIT:
+        raise ValueError(f'limit must be an integer between 1 and {MAX_SEARCH_LIMIT}')
+    return limit
+
+def parse_bool(name, value):
+    if value.lower() not in ('true', 'false'):
+        raise ValueError(f"{name} must be 'true' or 'false'")
+    return value.lower() == 'true'
+
+def parse_rent(name, value):
+    try:
+        rent = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f'{name} must be a number')
+    if not rent.is_finite():
+        raise ValueError(f'{name} must be a number')
+    return rent
+
+def filter_buildings(queryset, params):
+    """apply the spatial and attribute query parameters of the building endpoints to a queryset"""
+    if params.get('bbox'):
+        queryset = queryset.filter(building__contained=parse_bbox(params.get('bbox')))
+    if params.get('occupancy'):
+        queryset = queryset.filter(occupancy=parse_bool('occupancy', params.get('occupancy')))
+    if params.get('county'):
+        queryset = queryset.filter(county=params.get('county'))
+    if params.get('district'):
+        queryset = queryset.filter(district=params.get('district'))
+    min_rent = parse_rent('min_rent', params.get('min_rent')) if params.get('min_rent') else None
+    max_rent = parse_rent('max_rent', params.get('max_rent')) if params.get('max_rent') else None
+    if min_rent is not None and max_rent is not None and min_rent > max_rent:
+        raise ValueError('min_rent cannot be greater than max_rent')
+    if min_rent is not None:
+        queryset = queryset.filter(rent__gte=min_rent)
+    if max_rent is not None:
+        queryset = queryset.filter(rent__lte=max_rent)
+    return queryset
+
+def nearest_buildings(queryset, point, k):
+    """feature rows of the k buildings closest to point, with their distance
+
+    On PostGIS the rows are ordered by the <-> operator so the spatial index
+    walks outwards from the point and stops after k rows. Other backends sort
+    on the computed distance.
+    """
+    rows = building_rows(queryset.annotate(distance=Distance('building', point)), 'distance')
+    if connection.ops.postgis:
+        return rows.order_by(KNNDistance(F('building'), Value(point, output_field=PointField(srid=4326))))[:k]
+    return rows.order_by('distance')[:k]
@@ -0,0 +1,39 @@
+from django.db.models import BooleanField, FloatField, Func, TextField
+
+
+class X(Func):
+    """longitude of a point column, read straight from the database"""
+    function = 'ST_X'
+    output_field = FloatField()
+
+
+class Y(Func):
+    """latitude of a point column, read straight from the database"""
+    function = 'ST_Y'
+    output_field = FloatField()
+
+
+class KNNDistance(Func):
+    """PostGIS nearest-neighbour operator, answered from the spatial index when used in ORDER BY ... LIMIT"""
+    arg_joiner = ' <-> '
+    template = '%(expressions)s'
+    output_field = FloatField()
+
+
+class SearchDocument(Func):
+    """text columns joined with spaces, spelled exactly like the expression of the trigram search index"""
+    arg_joiner = ", '') || ' ' || COALESCE("
+    template = "(COALESCE(%(expressions)s, ''))"
+    output_field = TextField()
+
+
+class WordSimilar(Func):
+    """pg_trgm word similarity operator, answered from a gin_trgm_ops index on the right hand side"""
+    arg_joiner = ' <%% '
+    template = '%(expressions)s'
+    output_field = BooleanField()
+
+
+class WordSimilarity(Func):
+    function = 'word_similarity'
+    output_field = FloatField()
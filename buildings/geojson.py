@@ -0,0 +1,56 @@
+from buildings.functions import X, Y
+from buildings.media import media_url
+from RentalsManagement.renderers import dumps
+
+GEOJSON_CONTENT_TYPE = 'application/geo+json'
+PROPERTY_FIELDS = ('county', 'district', 'rent', 'payment_details', 'occupancy', 'created_at', 'updated_at', 'thumbnail')
+STREAM_CHUNK_SIZE = 2000
+CRS = {'type': 'name', 'properties': {'name': 'EPSG:4326'}}
+
+
+def building_rows(queryset, *extra):
+    """restrict a building queryset to the feature columns, with raw coordinates instead of GEOS points
+
+    extra names annotations of the queryset that should become feature properties too.
+    """
+    return queryset.annotate(lon=X('building'), lat=Y('building')).values('pk', 'lon', 'lat', *PROPERTY_FIELDS, *extra)
+
+def building_feature(row, precision=None):
+    """build a GeoJSON feature from a row returned by building_rows()"""
+    properties = {key: value for key, value in row.items() if key not in ('pk', 'lon', 'lat')}
+    properties['pk'] = str(row['pk'])
+    if 'thumbnail' in properties:
+        properties['thumbnail'] = media_url(properties['thumbnail'])
+    coordinates = [row['lon'], row['lat']]
+    if precision is not None:
+        coordinates = [round(coordinates[0], precision), round(coordinates[1], precision)]
+    return {
+        'type': 'Feature',
+        'id': row['pk'],
+        'properties': properties,
+        'geometry': {'type': 'Point', 'coordinates': coordinates},
+    }
+
+def feature_collection(rows, precision=None, **members):
+    """render rows as a single FeatureCollection in bytes, extra keyword arguments become foreign members"""
+    return dumps({
+        'type': 'FeatureCollection',
+        **members,
+        'features': [building_feature(row, precision) for row in rows],
+    })
+
+def stream_feature_collection(queryset, precision=None, chunk_size=STREAM_CHUNK_SIZE):
+    """yield a FeatureCollection in chunks, reading rows through a server-side cursor"""
+    rows = building_rows(queryset).iterator(chunk_size=chunk_size)
+    yield b'{"type":"FeatureCollection","crs":{"type":"name","properties":{"name":"EPSG:4326"}},"features":['
+    separator = b''
+    features = []
+    for row in rows:
+        features.append(dumps(building_feature(row, precision)))
+        if len(features) == chunk_size:
+            yield separator + b','.join(features)
+            separator = b','
+            features = []
+    if features:
+        yield separator + b','.join(features)
+    yield b']}'
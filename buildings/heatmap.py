@@ -0,0 +1,170 @@
+import base64
+import io
+import numpy as np
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db import connection
+from django.db.models import Case, FloatField, Value, When
+from django.db.models.functions import Cast
+from buildings.functions import X, Y
+from buildings.models import Building
+from RentalsManagement.renderers import dumps
+
+METRICS = ('rent', 'vacancy')
+OUTPUTS = ('array', 'png')
+DEFAULT_RESOLUTION = 256
+MAX_RESOLUTION = 1024
+MAX_SMOOTH = 10
+PNG_CONTENT_TYPE = 'image/png'
+# transparent for empty cells, then blue through yellow to red from the lowest to the highest value
+COLOR_STOPS = [(0, (49, 54, 149)), (0.5, (255, 255, 191)), (1, (165, 0, 38))]
+ALPHA = 200
+
+
+def parse_resolution(value):
+    """cells along the width of the grid, its height follows the aspect of the bbox"""
+    if value is None:
+        return DEFAULT_RESOLUTION
+    try:
+        res = int(value)
+    except ValueError:
+        raise ValueError(f'res must be an integer between 1 and {MAX_RESOLUTION}')
+    if not 1 <= res <= MAX_RESOLUTION:
+        raise ValueError(f'res must be an integer between 1 and {MAX_RESOLUTION}')
+    return res
+
+def parse_metric(value):
+    metric = value or 'rent'
+    if metric not in METRICS:
+        raise ValueError(f'metric must be one of {", ".join(METRICS)}')
+    return metric
+
+def parse_smooth(value):
+    """standard deviation of the Gaussian smoothing in cells, 0 leaves the grid as binned"""
+    if value is None:
+        return 0.0
+    try:
+        smooth = float(value)
+    except ValueError:
+        raise ValueError(f'smooth must be a number between 0 and {MAX_SMOOTH}')
+    if not 0 <= smooth <= MAX_SMOOTH:
+        raise ValueError(f'smooth must be a number between 0 and {MAX_SMOOTH}')
+    return smooth
+
+def parse_output(value):
+    output = value or 'array'
+    if output not in OUTPUTS:
+        raise ValueError(f'output must be one of {", ".join(OUTPUTS)}')
+    return output
+
+def grid_shape(extent, res):
+    """(rows, columns) of a grid res cells wide over extent, with cells as tall as they are wide in degrees"""
+    min_lon, min_lat, max_lon, max_lat = extent
+    return min(MAX_RESOLUTION, max(1, round(res * (max_lat - min_lat) / (max_lon - min_lon)))), res
+
+def metric_expression(metric):
+    if metric == 'rent':
+        return Cast('rent', FloatField())
+    return Case(When(occupancy=True, then=Value(0.0)), default=Value(1.0), output_field=FloatField())
+
+def heatmap_arrays(bbox, metric):
+    """(lon, lat, value) flat float64 arrays of the buildings inside bbox, value is the rent or 1 for vacant
+
+    PostgreSQL sends each column as one array in a single row, other databases one row per building.
+    """
+    queryset = Building.objects.filter(building__contained=bbox)
+    if metric == 'rent':
+        queryset = queryset.filter(rent__isnull=False)
+    if connection.vendor == 'postgresql':
+        arrays = queryset.aggregate(lon=ArrayAgg(X('building')), lat=ArrayAgg(Y('building')), value=ArrayAgg(metric_expression(metric)))
+        return tuple(np.array(arrays[key] or [], dtype=np.float64) for key in ('lon', 'lat', 'value'))
+    rows = queryset.annotate(lon=X('building'), lat=Y('building'), value=metric_expression(metric)).values_list('lon', 'lat', 'value')
+    data = np.array(list(rows), dtype=np.float64).reshape(-1, 3)
+    return data[:, 0], data[:, 1], data[:, 2]
+
+def gaussian_kernel(sigma):
+    radius = max(1, int(3 * sigma + 0.5))
+    kernel = np.exp(-0.5 * (np.arange(-radius, radius + 1) / sigma) ** 2)
+    return kernel / kernel.sum()
+
+def gaussian_blur(grid, sigma):
+    """separable Gaussian blur, cells beyond the edges count as zero"""
+    kernel = gaussian_kernel(sigma)
+    radius = len(kernel) // 2
+    for axis in (0, 1):
+        padding = [(0, 0), (0, 0)]
+        padding[axis] = (radius, radius)
+        padded = np.pad(grid, padding)
+        size = grid.shape[axis]
+        grid = sum(weight * padded.take(np.arange(i, i + size), axis=axis) for i, weight in enumerate(kernel))
+    return grid
+
+def bin_grid(lon, lat, values, extent, shape, smooth=0.0):
+    """(mean value, building count) per cell, north row first; cells without buildings have a NaN mean
+
+    with smoothing, the sums and counts are blurred separately so the mean stays a weighted average.
+    """
+    min_lon, min_lat, max_lon, max_lat = extent
+    rows, columns = shape
+    # the same bins as np.histogram2d, with the last row and column closed, but the cell index of every
+    # building is computed once and both grids are summed with bincount, which is several times faster
+    x = np.minimum(((lon - min_lon) * (columns / (max_lon - min_lon))).astype(np.int64), columns - 1)
+    y = np.minimum(((lat - min_lat) * (rows / (max_lat - min_lat))).astype(np.int64), rows - 1)
+    inside = (lon >= min_lon) & (lon <= max_lon) & (lat >= min_lat) & (lat <= max_lat)
+    cells = y[inside] * columns + x[inside]
+    counts = np.bincount(cells, minlength=rows * columns).reshape(shape).astype(np.float64)
+    sums = np.bincount(cells, weights=values[inside], minlength=rows * columns).reshape(shape)
+    weights = counts
+    if smooth > 0:
+        sums, weights = gaussian_blur(sums, smooth), gaussian_blur(counts, smooth)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = np.where(weights > 1e-9, sums / weights, np.nan)
+    # histogram rows run south to north, images and the payload run north to south
+    return np.flipud(means), np.flipud(counts)
+
+def value_range(means):
+    finite = means[np.isfinite(means)]
+    return (float(finite.min()), float(finite.max())) if finite.size else (None, None)
+
+def heatmap_payload(means, counts, extent, metric, smooth):
+    """grid as JSON with the means as base64 little-endian float32 and the counts as uint32, both row-major"""
+    low, high = value_range(means)
+    return dumps({
+        'bbox': list(extent),
+        'metric': metric,
+        'smooth': smooth,
+        'rows': means.shape[0],
+        'columns': means.shape[1],
+        'count': int(counts.sum()),
+        'min': low,
+        'max': high,
+        'values': base64.b64encode(means.astype('<f4').tobytes()).decode(),
+        'counts': base64.b64encode(counts.astype('<u4').tobytes()).decode(),
+    })
+
+def color_table():
+    """256 RGB colors interpolated between the color stops"""
+    positions = np.linspace(0, 1, 256)
+    stops = [position for position, _ in COLOR_STOPS]
+    return np.stack([np.interp(positions, stops, [color[i] for _, color in COLOR_STOPS]) for i in range(3)], axis=-1).astype(np.uint8)
+
+def heatmap_png(means):
+    """grid as an RGBA PNG, one pixel per cell, colored from its lowest to its highest value"""
+    from PIL import Image
+    low, high = value_range(means)
+    filled = np.isfinite(means)
+    scaled = np.zeros(means.shape)
+    if low is not None and high > low:
+        scaled = (np.where(filled, means, low) - low) / (high - low)
+    pixels = np.zeros((*means.shape, 4), dtype=np.uint8)
+    pixels[..., :3] = color_table()[(scaled * 255).astype(np.uint8)]
+    pixels[..., 3] = np.where(filled, ALPHA, 0)
+    output = io.BytesIO()
+    Image.fromarray(pixels).save(output, 'PNG')
+    return output.getvalue()
+
+def render_heatmap(bbox, res, metric, smooth, output):
+    extent = bbox.extent
+    means, counts = bin_grid(*heatmap_arrays(bbox, metric), extent, grid_shape(extent, res), smooth)
+    if output == 'png':
+        return heatmap_png(means)
+    return heatmap_payload(means, counts, extent, metric, smooth)
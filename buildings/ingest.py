@@ -0,0 +1,129 @@
+import json
+import os
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from django.contrib.gis.gdal import CoordTransform, DataSource, GDALException, SpatialReference
+from django.contrib.gis.geos import Point
+from buildings.models import Building
+from buildings.boundaries import tag_created_buildings
+from buildings.stats import update_rollup
+
+IMPORT_FIELDS = ('county', 'district', 'rent', 'occupancy')
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y', 'occupied'}
+FALSE_VALUES = {'0', 'false', 'f', 'no', 'n', 'vacant', ''}
+MAX_EMPTY_CHUNKS = 10
+
+
+@lru_cache(maxsize=1)
+def open_layer(path, layer=0):
+    """open a layer of any vector file GDAL can read, cached so pool workers open each file once"""
+    try:
+        return DataSource(path)[layer]
+    except (GDALException, IndexError) as e:
+        raise ValueError(f'cannot open layer {layer} of {path}: {e}')
+
+def field_mapping(layer, overrides=None):
+    """source field name of each import field, matched case-insensitively unless given explicitly"""
+    fields = {name.lower(): name for name in layer.fields}
+    mapping = {}
+    for field in IMPORT_FIELDS:
+        source = (overrides or {}).get(field)
+        if source is not None and source not in layer.fields:
+            raise ValueError(f'field {source} does not exist in layer {layer.name}')
+        source = source or fields.get(field)
+        if source is not None:
+            mapping[field] = source
+    return mapping
+
+def feature_row(feature, transform, mapping):
+    """(lon, lat, county, district, rent, occupancy) of a feature, polygons are reduced to their centroid"""
+    geom = feature.geom
+    if geom is None:
+        raise ValueError('feature has no geometry')
+    if transform is not None:
+        geom.transform(transform)
+    if geom.geom_name != 'POINT':
+        geom = geom.centroid
+    values = {field: feature.get(source) for field, source in mapping.items()}
+    return (
+        geom.x,
+        geom.y,
+        _text(values.get('county')),
+        _text(values.get('district')),
+        _rent(values.get('rent')),
+        _occupancy(values.get('occupancy')),
+    )
+
+def read_chunk(path, layer, start, stop, mapping):
+    """parse the features with ids in [start, stop), returning (start, features seen, rows, skipped)"""
+    source = open_layer(path, layer)
+    transform = None
+    if source.srs is not None and source.srs.srid != 4326:
+        transform = CoordTransform(source.srs, SpatialReference(4326))
+    rows = []
+    seen = skipped = 0
+    for fid in range(start, stop):
+        try:
+            feature = source[fid]
+        except IndexError:
+            continue
+        seen += 1
+        try:
+            rows.append(feature_row(feature, transform, mapping))
+        except (ValueError, GDALException):
+            skipped += 1
+    return start, seen, rows, skipped
+
+def first_feature_id(layer):
+    for feature in layer:
+        return feature.fid
+    return 0
+
+def create_buildings(rows, batch_size):
+    buildings = [
+        Building(building=Point(lon, lat, srid=4326), county=county, district=district, rent=rent, occupancy=occupancy)
+        for lon, lat, county, district, rent, occupancy in rows
+    ]
+    buildings = Building.objects.bulk_create(buildings, batch_size=batch_size)
+    update_rollup(added=tag_created_buildings(buildings))
+    return buildings
+
+def read_checkpoint(path):
+    try:
+        with open(path) as checkpoint:
+            return json.load(checkpoint)
+    except FileNotFoundError:
+        return None
+
+def write_checkpoint(path, **progress):
+    """replace the checkpoint atomically so an interrupted write never leaves a truncated file"""
+    with open(f'{path}.tmp', 'w') as checkpoint:
+        json.dump(progress, checkpoint)
+    os.replace(f'{path}.tmp', path)
+
+def _text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value[:255] or None
+
+def _rent(value):
+    if value is None or value == '':
+        return None
+    try:
+        rent = Decimal(str(value)).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError(f'rent {value!r} is not a number')
+    if rent.adjusted() >= 6:
+        raise ValueError(f'rent {value!r} is too large')
+    return rent
+
+def _occupancy(value):
+    if value is None or isinstance(value, bool):
+        return bool(value)
+    value = str(value).strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(f'occupancy {value!r} is not a boolean')
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max, Min
+from buildings.boundaries import tag_buildings
+from buildings.cache import tile_cache
+from buildings.models import Boundary, Building
+from buildings.stats import rebuild_rollup
+
+
+class Command(BaseCommand):
+    help = 'Set the county and district of every building from the boundary containing it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10000, help='building ids per UPDATE and transaction (default 10000)')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be positive')
+        if not Boundary.objects.exists():
+            raise CommandError('no boundaries loaded, run load_boundaries first')
+        ids = Building.objects.aggregate(first=Min('pk'), last=Max('pk'))
+        if ids['first'] is None:
+            self.stdout.write('no buildings to tag')
+            return
+        tagged = 0
+        for start in range(ids['first'], ids['last'] + 1, chunk_size):
+            with transaction.atomic():
+                tagged += tag_buildings(Building.objects.filter(pk__gte=start, pk__lt=start + chunk_size))
+            self.stdout.write(f'{tagged} buildings tagged, up to id {min(start + chunk_size - 1, ids["last"])}')
+        # the UPDATEs bypass the save signals that keep these current
+        rebuild_rollup()
+        tile_cache().clear()
+        self.stdout.write(self.style.SUCCESS(f'tagged {tagged} buildings'))
@@ -0,0 +1,84 @@
+import timeit
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from announcements.models import Notice
+from announcements.serializers import NoticeSerializer
+from buildings.geojson import building_feature
+from RentalsManagement.pagination import CursorPaginator
+from RentalsManagement import renderers
+
+
+def building_rows(count):
+    """rows shaped like buildings.geojson.building_rows(), made up so no database is needed"""
+    now = timezone.now()
+    return [{
+        'pk': pk,
+        'lon': 36.8 + pk * 1e-5,
+        'lat': -1.29 - pk * 1e-5,
+        'county': 'Nairobi',
+        'district': 'Westlands',
+        'rent': Decimal('15000.00') + pk,
+        'payment_details': f'Paybill 400200 account {pk}',
+        'occupancy': pk % 3 == 0,
+        'created_at': now - timedelta(days=pk % 365),
+        'updated_at': now,
+        'thumbnail': f'/media/thumbnails/{pk % 256:02x}/{pk:064x}.jpg',
+    } for pk in range(1, count + 1)]
+
+def notice_page(count):
+    now = timezone.now()
+    notices = [Notice(pk=pk, owner_id=1, building_id=pk, notice='Water will be off on Saturday from 9am to 4pm', created_at=now, updated_at=now)
+               for pk in range(1, count + 1)]
+    return {'next': 'http://testserver/api/v1/announcements/notices/?cursor=cD0yMDI0', 'previous': None,
+            'results': [NoticeSerializer(x).data for x in notices]}
+
+
+class Command(BaseCommand):
+    help = 'Compare the JSON encoders of the API on building and notice payloads, without touching the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--layer-size', type=int, default=10000, help='features of the whole building layer (default 10000)')
+        parser.add_argument('--seconds', type=float, default=1.0, help='time spent on each measurement (default 1)')
+
+    def handle(self, *args, **options):
+        if options['layer_size'] < 1 or options['seconds'] <= 0:
+            raise CommandError('--layer-size and --seconds must be positive')
+        if renderers.orjson is None:
+            self.stdout.write(self.style.WARNING('orjson is not installed, the API uses the standard library encoder'))
+        django_encoder = DjangoJSONEncoder(separators=(',', ':'))
+        drf_renderer = JSONRenderer()
+        fast_renderer = renderers.FastJSONRenderer()
+        page = CursorPaginator.max_page_size
+        cases = [
+            (f'building list page ({page} features)', {'type': 'FeatureCollection', 'features': [building_feature(x) for x in building_rows(page)]}),
+            (f'building layer ({options["layer_size"]} features)', {'type': 'FeatureCollection', 'features': [building_feature(x) for x in building_rows(options['layer_size'])]}),
+        ]
+        for name, collection in cases:
+            self.compare(name, options['seconds'], {
+                'DjangoJSONEncoder': lambda: django_encoder.encode(collection).encode(),
+                'stdlib': lambda: renderers.stdlib_dumps(collection),
+                'orjson': (lambda: renderers.orjson_dumps(collection)) if renderers.orjson else None,
+            })
+        notices = notice_page(page)
+        self.compare(f'notice list page ({page} notices)', options['seconds'], {
+            'DRF JSONRenderer': lambda: drf_renderer.render(notices),
+            'FastJSONRenderer': lambda: fast_renderer.render(notices),
+        })
+
+    def compare(self, name, seconds, encoders):
+        self.stdout.write(name)
+        baseline = None
+        for label, encode in encoders.items():
+            if encode is None:
+                continue
+            size = len(encode())
+            timer = timeit.Timer(encode)
+            number, elapsed = timer.autorange()
+            runs = max(1, int(number * seconds / elapsed))
+            rate = runs / timer.timeit(runs)
+            baseline = baseline or rate
+            self.stdout.write(f'  {label:<18} {rate:>10.0f}/s {rate * size / 1e6:>8.1f} MB/s {rate / baseline:>6.2f}x')
@@ -0,0 +1,31 @@
+import csv
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from buildings.duplicates import duplicate_radius, table_duplicates
+from buildings.models import Building
+
+
+class Command(BaseCommand):
+    help = 'List pairs of stored buildings closer than the duplicate radius as CSV, scanning the table in chunks of ids'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--radius', type=float, help='meters (default BUILDING_DUPLICATE_RADIUS)')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='building ids per spatial join (default 10000)')
+
+    def handle(self, *args, **options):
+        radius = duplicate_radius() if options['radius'] is None else options['radius']
+        chunk_size = options['chunk_size']
+        if radius <= 0 or chunk_size < 1:
+            raise CommandError('--radius and --chunk-size must be positive')
+        ids = Building.objects.aggregate(first=Min('pk'), last=Max('pk'))
+        writer = csv.writer(self.stdout, lineterminator='\n')
+        writer.writerow(['building', 'duplicate', 'distance'])
+        if ids['first'] is None:
+            return
+        pairs = 0
+        for start in range(ids['first'], ids['last'] + 1, chunk_size):
+            for pk, duplicate, distance in table_duplicates(start, start + chunk_size, radius):
+                writer.writerow([pk, duplicate, round(distance, 1)])
+                pairs += 1
+            self.stderr.write(f'{pairs} pairs found, up to id {min(start + chunk_size - 1, ids["last"])}')
+        self.stderr.write(f'{pairs} pairs of buildings within {radius:g} m')
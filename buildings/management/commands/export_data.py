@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from RentalsManagement.exports import export_stream, EXPORTS, FORMATS
+
+
+class Command(BaseCommand):
+    help = 'Stream buildings, profiles, user buildings, notices or comments as CSV or NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=list(EXPORTS))
+        parser.add_argument('--format', choices=list(FORMATS), default='csv', help='output format (default csv)')
+        parser.add_argument('--gzip', action='store_true', help='gzip the output, requires --output')
+        parser.add_argument('--output', default='-', help='file to write, defaults to standard output')
+
+    def handle(self, *args, **options):
+        if options['gzip'] and options['output'] == '-':
+            raise CommandError('--gzip requires --output')
+        chunks = export_stream(options['name'], options['format'], options['gzip'])
+        if options['output'] == '-':
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(options['output'], 'wb') as output:
+            for chunk in chunks:
+                output.write(chunk if options['gzip'] else chunk.encode())
+        self.stderr.write(f'{options["name"]} exported to {options["output"]}')
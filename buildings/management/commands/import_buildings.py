@@ -0,0 +1,106 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from buildings.cache import tile_cache
+from buildings.ingest import (
+    IMPORT_FIELDS, MAX_EMPTY_CHUNKS, create_buildings, field_mapping, first_feature_id,
+    open_layer, read_checkpoint, read_chunk, write_checkpoint,
+)
+
+
+class Command(BaseCommand):
+    help = 'Import buildings from a Shapefile, GeoPackage, GeoJSON or any other vector file GDAL can read'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='vector file to import')
+        parser.add_argument('--layer', default='0', help='layer index or name (default 0)')
+        parser.add_argument('--map', action='append', default=[], metavar='FIELD=SOURCE',
+                            help=f'source attribute for one of {", ".join(IMPORT_FIELDS)}, matched by name by default')
+        parser.add_argument('--batch-size', type=int, default=5000, help='features per transaction (default 5000)')
+        parser.add_argument('--workers', type=int, default=1, help='processes parsing batches in parallel (default 1)')
+        parser.add_argument('--checkpoint', help='progress file, defaults to <path>.checkpoint')
+        parser.add_argument('--resume', action='store_true', help='continue from the last committed batch of the checkpoint')
+
+    def handle(self, *args, **options):
+        path = os.path.abspath(options['path'])
+        layer = int(options['layer']) if options['layer'].isdigit() else options['layer']
+        batch_size = options['batch_size']
+        workers = options['workers']
+        if batch_size < 1 or workers < 1:
+            raise CommandError('--batch-size and --workers must be positive')
+        overrides = {}
+        for item in options['map']:
+            field, _, source = item.partition('=')
+            if field not in IMPORT_FIELDS or not source:
+                raise CommandError(f'--map expects FIELD=SOURCE with FIELD one of {", ".join(IMPORT_FIELDS)}')
+            overrides[field] = source
+        open_layer.cache_clear()
+        try:
+            source = open_layer(path, layer)
+            mapping = field_mapping(source, overrides)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        checkpoint = options['checkpoint'] or f'{path}.checkpoint'
+        progress = {'path': path, 'layer': layer, 'next_fid': first_feature_id(source), 'seen': 0, 'imported': 0, 'skipped': 0}
+        if options['resume']:
+            saved = read_checkpoint(checkpoint)
+            if saved is None:
+                raise CommandError(f'no checkpoint at {checkpoint}')
+            if (saved['path'], saved['layer']) != (path, layer):
+                raise CommandError(f'checkpoint {checkpoint} belongs to layer {saved["layer"]} of {saved["path"]}')
+            progress = saved
+            self.stdout.write(f'resuming at feature {progress["next_fid"]}, {progress["imported"]} already imported')
+        total = len(source)
+        self.stdout.write(f'importing {total} features from {source.name}, mapping {mapping or "no attributes"}')
+
+        for start, seen, rows, skipped in self.read_batches(path, layer, mapping, progress, total, batch_size, workers):
+            with transaction.atomic():
+                create_buildings(rows, batch_size)
+            progress.update(
+                next_fid=start + batch_size,
+                seen=progress['seen'] + seen,
+                imported=progress['imported'] + len(rows),
+                skipped=progress['skipped'] + skipped,
+            )
+            write_checkpoint(checkpoint, **progress)
+            self.stdout.write(f'{progress["seen"]}/{total} features read, {progress["imported"]} imported')
+
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        tile_cache().clear()
+        self.stdout.write(f'{progress["skipped"]} features skipped for invalid geometry or attributes')
+        self.stdout.write(self.style.SUCCESS(f'imported {progress["imported"]} buildings, run seed_tiles to warm the tile cache'))
+
+    def read_batches(self, path, layer, mapping, progress, total, batch_size, workers):
+        """yield parsed batches in feature id order, reading ahead in a process pool when workers > 1
+
+        Feature ids usually run without gaps, but deleted features leave holes, so reading stops
+        once every feature has been seen or after MAX_EMPTY_CHUNKS empty batches in a row.
+        """
+        seen = progress['seen']
+        start = progress['next_fid']
+        empty = 0
+        if workers == 1:
+            while seen < total and empty < MAX_EMPTY_CHUNKS:
+                batch = read_chunk(path, layer, start, start + batch_size, mapping)
+                seen += batch[1]
+                empty = 0 if batch[1] else empty + 1
+                start += batch_size
+                yield batch
+            return
+        # forked workers must not share the parent's open file handle
+        with ProcessPoolExecutor(workers, initializer=open_layer.cache_clear) as pool:
+            pending = deque()
+            while seen < total and empty < MAX_EMPTY_CHUNKS:
+                while len(pending) < workers * 2:
+                    pending.append(pool.submit(read_chunk, path, layer, start, start + batch_size, mapping))
+                    start += batch_size
+                batch = pending.popleft().result()
+                seen += batch[1]
+                empty = 0 if batch[1] else empty + 1
+                yield batch
+            for future in pending:
+                future.cancel()
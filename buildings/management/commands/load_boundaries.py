@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from buildings.boundaries import BOUNDARY_LEVELS, boundary_geometries
+from buildings.ingest import open_layer
+from buildings.models import Boundary
+
+
+class Command(BaseCommand):
+    help = 'Load county or district boundaries from a Shapefile, GeoPackage or GeoJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='vector file of administrative areas')
+        parser.add_argument('--level', choices=BOUNDARY_LEVELS, required=True, help='administrative level of the areas')
+        parser.add_argument('--name-field', required=True, help='attribute holding the area name')
+        parser.add_argument('--layer', default='0', help='layer index or name (default 0)')
+        parser.add_argument('--replace', action='store_true', help='delete the loaded boundaries of this level first')
+
+    def handle(self, *args, **options):
+        layer = int(options['layer']) if options['layer'].isdigit() else options['layer']
+        open_layer.cache_clear()
+        try:
+            source = open_layer(options['path'], layer)
+        except ValueError as e:
+            raise CommandError(str(e))
+        if options['name_field'] not in source.fields:
+            raise CommandError(f'field {options["name_field"]} does not exist in layer {source.name}')
+        boundaries = [
+            Boundary(name=str(feature.get(options['name_field'])).strip(), level=options['level'], geometry=geometry)
+            for feature, geometry in boundary_geometries(source)
+        ]
+        with transaction.atomic():
+            if options['replace']:
+                Boundary.objects.filter(level=options['level']).delete()
+            Boundary.objects.bulk_create(boundaries, batch_size=500)
+        self.stdout.write(f'{len(source) - len(boundaries)} features without polygon geometry skipped')
+        self.stdout.write(self.style.SUCCESS(f'loaded {len(boundaries)} {options["level"]} boundaries, run assign_boundaries to tag existing buildings'))
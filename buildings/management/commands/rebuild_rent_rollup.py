@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from buildings.stats import rebuild_rollup
+
+
+class Command(BaseCommand):
+    help = 'Recompute the rent and occupancy rollup behind /api/v1/building/stats/ from the building table'
+
+    def handle(self, *args, **options):
+        rows = rebuild_rollup()
+        self.stdout.write(self.style.SUCCESS(f'rent rollup rebuilt, {rows} rows'))
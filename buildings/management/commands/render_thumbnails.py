@@ -0,0 +1,39 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from buildings.media import record_thumbnail, thumbnail_name
+from buildings.models import BuildingMedia
+from buildings.thumbnails import render_thumbnail
+
+
+class Command(BaseCommand):
+    help = 'Render the thumbnails of building media left pending, e.g. by a restart, or that failed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--failed', action='store_true', help='retry media whose thumbnail failed too')
+        parser.add_argument('--workers', type=int, default=1, help='processes rendering thumbnails (default 1)')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if workers < 1:
+            raise CommandError('--workers must be positive')
+        if options['failed']:
+            BuildingMedia.objects.filter(status='failed').update(status='pending')
+        # one job per file, every row sharing it is updated together
+        jobs = {x.sha256: x for x in BuildingMedia.objects.filter(status='pending').order_by('pk')}
+        rendered = failed = 0
+        with ProcessPoolExecutor(workers) as pool:
+            futures = {
+                pool.submit(render_thumbnail, x.file.path, default_storage.path(thumbnail_name(sha256)), x.kind, settings.MEDIA_THUMBNAIL_SIZE): sha256
+                for sha256, x in jobs.items()
+            }
+            for future in as_completed(futures):
+                error = future.exception()
+                record_thumbnail(futures[future], error is None)
+                if error is None:
+                    rendered += 1
+                else:
+                    failed += 1
+                    self.stderr.write(f'{futures[future]}: {error}')
+        self.stdout.write(self.style.SUCCESS(f'rendered {rendered} thumbnails, {failed} failed'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.gis.db.models import Extent
+from buildings.cache import seed_tile, RENDERERS
+from buildings.models import Building
+from buildings.tiles import tiles_in_bbox, MAX_ZOOM
+
+
+class Command(BaseCommand):
+    help = 'Render and cache the building tiles and clusters of the low zoom levels'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-zoom', type=int, default=8, help='highest zoom level to seed (default 8)')
+        parser.add_argument('--kind', choices=list(RENDERERS), action='append', help='tile kind to seed, defaults to all')
+
+    def handle(self, *args, **options):
+        max_zoom = options['max_zoom']
+        if not 0 <= max_zoom <= MAX_ZOOM:
+            raise CommandError(f'--max-zoom must be between 0 and {MAX_ZOOM}')
+        extent = Building.objects.aggregate(extent=Extent('building'))['extent']
+        if extent is None:
+            self.stdout.write('no buildings to seed')
+            return
+        kinds = options['kind'] or list(RENDERERS)
+        for z in range(max_zoom + 1):
+            tiles = tiles_in_bbox(*extent, z)
+            for x, y in tiles:
+                for kind in kinds:
+                    seed_tile(kind, z, x, y)
+            self.stdout.write(f'zoom {z}: seeded {len(tiles)} tiles')
+        self.stdout.write(self.style.SUCCESS('tile cache seeded'))
@@ -0,0 +1,191 @@
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache, partial
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from buildings.models import Building, BuildingMedia, MediaUpload
+from buildings.thumbnails import render_thumbnail
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/webp': '.webp',
+    'video/mp4': '.mp4',
+    'video/webm': '.webm',
+    'video/quicktime': '.mov',
+}
+UPLOAD_CHUNK_SIZE = 64 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class OffsetConflict(Exception):
+    """a chunk was sent for another offset than the one the upload has reached"""
+
+
+def media_url(name):
+    return default_storage.url(name) if name else None
+
+def blob_name(sha256, content_type):
+    """content addressed location of a media file, identical files share it"""
+    return f'buildings/{sha256[:2]}/{sha256}{CONTENT_TYPES[content_type]}'
+
+def thumbnail_name(sha256):
+    return f'thumbnails/{sha256[:2]}/{sha256}.jpg'
+
+def upload_path(upload):
+    return os.path.join(settings.MEDIA_ROOT, 'uploads', f'{upload.pk}.part')
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def parse_upload_size(value):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('size must be the file size in bytes')
+    if size < 1:
+        raise ValueError('size must be the file size in bytes')
+    if size > settings.MEDIA_UPLOAD_MAX_SIZE:
+        raise ValueError(f'files larger than {settings.MEDIA_UPLOAD_MAX_SIZE} bytes are not accepted')
+    return size
+
+def start_upload(building, owner, filename, content_type, size):
+    if content_type not in CONTENT_TYPES:
+        raise ValueError(f'content_type must be one of {", ".join(CONTENT_TYPES)}')
+    upload = MediaUpload.objects.create(
+        building=building, owner=owner, filename=(filename or '')[:255], content_type=content_type, size=parse_upload_size(size))
+    path = upload_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+    return upload
+
+def write_chunk(upload, offset, stream, length):
+    """write up to length bytes of stream at offset straight to the partial file, return the new offset
+
+    a client that disconnects mid chunk keeps the bytes that arrived and resumes from the returned offset.
+    """
+    if offset != upload.offset:
+        raise OffsetConflict(f'upload is at offset {upload.offset}')
+    if offset + length > upload.size:
+        raise ValueError('chunk exceeds the upload size')
+    remaining = length
+    with open(upload_path(upload), 'r+b') as f:
+        # drop bytes of an earlier chunk that were written but never recorded
+        f.truncate(offset)
+        f.seek(offset)
+        while remaining and (data := stream.read(min(UPLOAD_CHUNK_SIZE, remaining))):
+            f.write(data)
+            remaining -= len(data)
+    return offset + length - remaining
+
+def complete_upload(upload):
+    """store a finished upload under its content hash and attach it to the building
+
+    a file already stored for another building is reused together with its thumbnail.
+    """
+    path = upload_path(upload)
+    sha256 = file_sha256(path)
+    with transaction.atomic():
+        existing = BuildingMedia.objects.filter(sha256=sha256).order_by('pk').first()
+        if existing is not None and default_storage.exists(existing.file.name):
+            name = existing.file.name
+            os.remove(path)
+        else:
+            name = blob_name(sha256, upload.content_type)
+            os.makedirs(os.path.dirname(default_storage.path(name)), exist_ok=True)
+            os.replace(path, default_storage.path(name))
+        media, created = BuildingMedia.objects.get_or_create(building_id=upload.building_id, sha256=sha256, defaults={
+            'owner_id': upload.owner_id,
+            'kind': upload.content_type.split('/')[0],
+            'content_type': upload.content_type,
+            'size': upload.size,
+            'file': name,
+        })
+        if created and existing is not None and existing.status == 'ready':
+            media.thumbnail, media.status = existing.thumbnail.name, 'ready'
+            media.save(update_fields=['thumbnail', 'status'])
+            refresh_building_thumbnails([media.building_id])
+        upload.delete()
+        if media.status == 'pending':
+            transaction.on_commit(lambda: schedule_thumbnail(media))
+    return media
+
+def discard_upload(upload):
+    path = upload_path(upload)
+    upload.delete()
+    if os.path.exists(path):
+        os.remove(path)
+
+@lru_cache(maxsize=1)
+def thumbnail_pool():
+    return ProcessPoolExecutor(settings.MEDIA_THUMBNAIL_WORKERS)
+
+def schedule_thumbnail(media):
+    """render the thumbnail of a media file in the process pool, its rows are updated once it is done"""
+    job = (media.file.path, default_storage.path(thumbnail_name(media.sha256)), media.kind, settings.MEDIA_THUMBNAIL_SIZE)
+    if settings.MEDIA_THUMBNAIL_WORKERS == 0:
+        try:
+            render_thumbnail(*job)
+        except Exception:
+            logger.exception('thumbnail of %s failed', media.sha256)
+            record_thumbnail(media.sha256, False)
+        else:
+            record_thumbnail(media.sha256, True)
+        return
+    try:
+        future = thumbnail_pool().submit(render_thumbnail, *job)
+    except BrokenProcessPool:
+        # a worker died, start a fresh pool
+        thumbnail_pool.cache_clear()
+        future = thumbnail_pool().submit(render_thumbnail, *job)
+    future.add_done_callback(partial(thumbnail_rendered, media.sha256))
+
+def thumbnail_rendered(sha256, future):
+    """done callback of a thumbnail job, the rows are updated from a thread of their own that closes its connection"""
+    error = future.exception()
+    if error is not None:
+        logger.error('thumbnail of %s failed: %s', sha256, error)
+    threading.Thread(target=record_thumbnail_and_close, args=(sha256, error is None)).start()
+
+def record_thumbnail_and_close(sha256, rendered):
+    try:
+        record_thumbnail(sha256, rendered)
+    finally:
+        connection.close()
+
+def record_thumbnail(sha256, rendered):
+    """mark every pending media row with this content as ready or failed"""
+    media = BuildingMedia.objects.filter(sha256=sha256, status='pending')
+    if not rendered:
+        media.update(status='failed')
+        return
+    building_ids = list(media.values_list('building_id', flat=True))
+    media.update(status='ready', thumbnail=thumbnail_name(sha256))
+    refresh_building_thumbnails(building_ids)
+
+def refresh_building_thumbnails(building_ids):
+    """store the thumbnail of the first ready media on each building, or None once it has none left
+
+    list ETags follow updated_at, so it is bumped for the new thumbnail to reach cached listings.
+    """
+    first_ready = BuildingMedia.objects.filter(building=OuterRef('pk'), status='ready').order_by('created_at', 'pk').values('thumbnail')[:1]
+    Building.objects.filter(pk__in=building_ids).update(thumbnail=Subquery(first_ready), updated_at=timezone.now())
+
+def remove_unreferenced_files(sha256, names):
+    if not BuildingMedia.objects.filter(sha256=sha256).exists():
+        for name in names:
+            if name:
+                default_storage.delete(name)
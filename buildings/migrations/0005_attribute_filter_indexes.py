@@ -0,0 +1,25 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('buildings', '0004_remove_building_comment'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='building',
+            index=models.Index(condition=models.Q(('occupancy', False)), fields=['county', 'rent'], name='building_vacant_county_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='building',
+            index=models.Index(condition=models.Q(('occupancy', False)), fields=['rent'], name='building_vacant_rent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='building',
+            index=models.Index(fields=['county', 'district', 'rent'], name='building_county_district_idx'),
+        ),
+    ]
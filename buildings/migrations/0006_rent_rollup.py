@@ -0,0 +1,35 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:53
+
+from django.db import migrations, models
+
+
+def build_rollup(apps, schema_editor):
+    from buildings.stats import rebuild_rollup
+    rebuild_rollup(apps.get_model('buildings', 'Building'), apps.get_model('buildings', 'BuildingRentRollup'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('buildings', '0005_attribute_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BuildingRentRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('county', models.CharField(default='', max_length=255)),
+                ('district', models.CharField(default='', max_length=255)),
+                ('rent_bucket', models.IntegerField()),
+                ('buildings', models.IntegerField(default=0)),
+                ('occupied', models.IntegerField(default=0)),
+                ('rent_sum', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+            ],
+            options={
+                'db_table': 'building_rent_rollup',
+                'constraints': [models.UniqueConstraint(fields=('county', 'district', 'rent_bucket'), name='building_rent_rollup_key')],
+            },
+        ),
+        migrations.RunPython(build_rollup, migrations.RunPython.noop),
+    ]
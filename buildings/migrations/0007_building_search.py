@@ -0,0 +1,50 @@
+from django.db import migrations
+
+SEARCH_DOCUMENT = "(COALESCE(county, '') || ' ' || COALESCE(district, '') || ' ' || COALESCE(payment_details, ''))"
+
+POSTGRES_FORWARD = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    f'CREATE INDEX IF NOT EXISTS building_search_trgm_idx ON building USING gin ({SEARCH_DOCUMENT} gin_trgm_ops)',
+]
+POSTGRES_BACKWARD = [
+    'DROP INDEX IF EXISTS building_search_trgm_idx',
+]
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE building_search USING fts5(county, district, payment_details, content='building', content_rowid='id', tokenize='trigram')",
+    '''CREATE TRIGGER building_search_insert AFTER INSERT ON building BEGIN
+        INSERT INTO building_search(rowid, county, district, payment_details) VALUES (new.id, new.county, new.district, new.payment_details);
+    END''',
+    '''CREATE TRIGGER building_search_delete AFTER DELETE ON building BEGIN
+        INSERT INTO building_search(building_search, rowid, county, district, payment_details) VALUES ('delete', old.id, old.county, old.district, old.payment_details);
+    END''',
+    '''CREATE TRIGGER building_search_update AFTER UPDATE OF county, district, payment_details ON building BEGIN
+        INSERT INTO building_search(building_search, rowid, county, district, payment_details) VALUES ('delete', old.id, old.county, old.district, old.payment_details);
+        INSERT INTO building_search(rowid, county, district, payment_details) VALUES (new.id, new.county, new.district, new.payment_details);
+    END''',
+    "INSERT INTO building_search(building_search) VALUES ('rebuild')",
+]
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS building_search_insert',
+    'DROP TRIGGER IF EXISTS building_search_delete',
+    'DROP TRIGGER IF EXISTS building_search_update',
+    'DROP TABLE IF EXISTS building_search',
+]
+
+
+def run_for_vendor(postgres, sqlite):
+    def run(apps, schema_editor):
+        statements = {'postgresql': postgres, 'sqlite': sqlite}.get(schema_editor.connection.vendor, [])
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('buildings', '0006_rent_rollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_for_vendor(POSTGRES_FORWARD, SQLITE_FORWARD), run_for_vendor(POSTGRES_BACKWARD, SQLITE_BACKWARD)),
+    ]
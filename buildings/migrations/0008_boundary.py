@@ -0,0 +1,27 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:56
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('buildings', '0007_building_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Boundary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('level', models.CharField(choices=[('county', 'County'), ('district', 'District')], max_length=8)),
+                ('geometry', django.contrib.gis.db.models.fields.MultiPolygonField(srid=4326)),
+            ],
+            options={
+                'db_table': 'boundary',
+                'indexes': [models.Index(fields=['level', 'name'], name='boundary_level_name_idx')],
+            },
+        ),
+    ]
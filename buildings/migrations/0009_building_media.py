@@ -0,0 +1,55 @@
+# Generated by Django 5.1.4 on 2026-10-18 11:01
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('buildings', '0008_boundary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255)),
+                ('content_type', models.CharField(max_length=100)),
+                ('size', models.BigIntegerField()),
+                ('offset', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('building', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='media_uploads', to='buildings.building')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='media_uploads', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'media_upload',
+            },
+        ),
+        migrations.CreateModel(
+            name='BuildingMedia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('image', 'Image'), ('video', 'Video')], max_length=5)),
+                ('content_type', models.CharField(max_length=100)),
+                ('size', models.BigIntegerField()),
+                ('sha256', models.CharField(db_index=True, max_length=64)),
+                ('file', models.FileField(max_length=255, upload_to='')),
+                ('thumbnail', models.FileField(blank=True, max_length=255, upload_to='')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=7)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('building', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='media', to='buildings.building')),
+                ('owner', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='building_media', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'building_media',
+                'indexes': [models.Index(fields=['building', 'status', 'created_at'], name='building_media_status_idx')],
+                'constraints': [models.UniqueConstraint(fields=('building', 'sha256'), name='building_media_building_sha256_key')],
+            },
+        ),
+    ]
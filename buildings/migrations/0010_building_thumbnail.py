@@ -0,0 +1,27 @@
+# Generated by Django 5.1.4 on 2026-10-18 11:34
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def store_thumbnails(apps, schema_editor):
+    Building = apps.get_model('buildings', 'Building')
+    BuildingMedia = apps.get_model('buildings', 'BuildingMedia')
+    first_ready = BuildingMedia.objects.filter(building=OuterRef('pk'), status='ready').order_by('created_at', 'pk').values('thumbnail')[:1]
+    Building.objects.filter(media__status='ready').update(thumbnail=Subquery(first_ready))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('buildings', '0009_building_media'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='building',
+            name='thumbnail',
+            field=models.CharField(default=None, max_length=255, null=True),
+        ),
+        migrations.RunPython(store_thumbnails, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,6 @@
+import uuid
 from django.db import models
+from django.contrib.auth.models import User
 from django.contrib.gis.db import models as gis_models
 
 class Building(models.Model):
@@ -9,14 +11,95 @@ class Building(models.Model):
     payment_details = models.CharField(max_length=255, null=True, default=None)
     occupancy = models.BooleanField(default=False)
     building = gis_models.PointField(spatial_index=True, srid=4326)
+    # path of the thumbnail of the first ready media, kept current by buildings.media so listings never join the media
+    thumbnail = models.CharField(max_length=255, null=True, default=None)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    #image
-    #video
 
     def __str__(self):
         owners = self.profile.all()
         return f'[{self.building.x}, {self.building.y}] - (owners: {", ".join(x.user.username for x in owners)})'
 
     class Meta:
-        db_table = 'building'
\ No newline at end of file
+        db_table = 'building'
+        indexes = [
+            models.Index(fields=['county', 'rent'], condition=models.Q(occupancy=False), name='building_vacant_county_idx'),
+            models.Index(fields=['rent'], condition=models.Q(occupancy=False), name='building_vacant_rent_idx'),
+            models.Index(fields=['county', 'district', 'rent'], name='building_county_district_idx'),
+        ]
+
+class BuildingRentRollup(models.Model):
+    """building count, occupied count and rent total per county, district and rent bucket, kept current by buildings.stats"""
+    county = models.CharField(max_length=255, default='')
+    district = models.CharField(max_length=255, default='')
+    rent_bucket = models.IntegerField()
+    buildings = models.IntegerField(default=0)
+    occupied = models.IntegerField(default=0)
+    rent_sum = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'building_rent_rollup'
+        constraints = [
+            models.UniqueConstraint(fields=['county', 'district', 'rent_bucket'], name='building_rent_rollup_key'),
+        ]
+
+
+class Boundary(models.Model):
+    """administrative area that buildings take their county or district name from"""
+    LEVELS = [('county', 'County'), ('district', 'District')]
+    name = models.CharField(max_length=255)
+    level = models.CharField(max_length=8, choices=LEVELS)
+    geometry = gis_models.MultiPolygonField(spatial_index=True, srid=4326)
+
+    def __str__(self):
+        return f'{self.name} ({self.level})'
+
+    class Meta:
+        db_table = 'boundary'
+        indexes = [
+            models.Index(fields=['level', 'name'], name='boundary_level_name_idx'),
+        ]
+
+
+class BuildingMedia(models.Model):
+    """photo or video of a building, the file is stored once per content hash and shared by every row with that hash"""
+    KINDS = [('image', 'Image'), ('video', 'Video')]
+    STATUSES = [('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')]
+    building = models.ForeignKey(Building, on_delete=models.CASCADE, related_name='media')
+    owner = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='building_media')
+    kind = models.CharField(max_length=5, choices=KINDS)
+    content_type = models.CharField(max_length=100)
+    size = models.BigIntegerField()
+    sha256 = models.CharField(max_length=64, db_index=True)
+    file = models.FileField(max_length=255)
+    thumbnail = models.FileField(max_length=255, blank=True)
+    status = models.CharField(max_length=7, choices=STATUSES, default='pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.kind} {self.sha256[:12]} of building {self.building_id}'
+
+    class Meta:
+        db_table = 'building_media'
+        constraints = [
+            models.UniqueConstraint(fields=['building', 'sha256'], name='building_media_building_sha256_key'),
+        ]
+        indexes = [
+            models.Index(fields=['building', 'status', 'created_at'], name='building_media_status_idx'),
+        ]
+
+
+class MediaUpload(models.Model):
+    """resumable upload of a building media file, received chunk by chunk into a partial file"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    building = models.ForeignKey(Building, on_delete=models.CASCADE, related_name='media_uploads')
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='media_uploads')
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'media_upload'
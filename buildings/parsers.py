@@ -0,0 +1,21 @@
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from RentalsManagement.renderers import loads
+
+
+class NDJSONParser(BaseParser):
+    """parse newline delimited JSON into a list, one item per non-blank line"""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        rows = []
+        for number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                rows.append(loads(line.decode(encoding)))
+            except ValueError as e:
+                raise ParseError(f'NDJSON parse error on line {number} - {e}')
+        return rows
@@ -0,0 +1,60 @@
+from django.db import connection
+from django.db.models import Q, Value
+from buildings.functions import SearchDocument, WordSimilar, WordSimilarity
+from buildings.geojson import building_rows
+from buildings.models import Building
+
+SEARCH_FIELDS = ('county', 'district', 'payment_details')
+MIN_QUERY_LENGTH = 3
+SEARCH_TABLE = 'building_search'
+
+
+def parse_query(value):
+    query = (value or '').strip()
+    if len(query) < MIN_QUERY_LENGTH:
+        raise ValueError(f'q must be at least {MIN_QUERY_LENGTH} characters')
+    return query
+
+def search_buildings(query, limit):
+    """building rows whose county, district or payment details resemble the query, best match first
+
+    every row gets a score between 0 and 1. PostgreSQL answers from the pg_trgm index, SQLite
+    from the FTS5 trigram table kept in sync by triggers.
+    """
+    if connection.vendor == 'postgresql':
+        return _search_postgres(query, limit)
+    if connection.vendor == 'sqlite':
+        return _search_sqlite(query, limit)
+    matches = Q()
+    for field in SEARCH_FIELDS:
+        matches |= Q(**{f'{field}__icontains': query})
+    return [{**row, 'score': None} for row in building_rows(Building.objects.filter(matches).order_by('pk'))[:limit]]
+
+def _search_postgres(query, limit):
+    document = SearchDocument(*SEARCH_FIELDS)
+    buildings = (Building.objects
+        .filter(WordSimilar(Value(query), document))
+        .annotate(score=WordSimilarity(Value(query), document))
+        .order_by('-score', 'pk'))
+    rows = list(building_rows(buildings, 'score')[:limit])
+    for row in rows:
+        row['score'] = round(row['score'], 3)
+    return rows
+
+def _search_sqlite(query, limit):
+    query_trigrams = trigrams(query)
+    match = ' OR '.join('"{}"'.format(trigram.replace('"', '""')) for trigram in sorted(query_trigrams))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s ORDER BY rank LIMIT %s', [match, limit])
+        ids = [pk for pk, in cursor.fetchall()]
+    rows = list(building_rows(Building.objects.filter(pk__in=ids)))
+    for row in rows:
+        document = trigrams(' '.join(row[field] or '' for field in SEARCH_FIELDS))
+        row['score'] = round(len(query_trigrams & document) / len(query_trigrams), 3)
+    rank = {pk: position for position, pk in enumerate(ids)}
+    return sorted(rows, key=lambda row: (-row['score'], rank[row['pk']]))
+
+def trigrams(text):
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
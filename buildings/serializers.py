@@ -1,13 +1,52 @@
 from rest_framework import serializers
-from buildings.models import Building
+from django.urls import reverse
+from buildings.models import Building, BuildingMedia
+from buildings.media import media_url
+from buildings.boundaries import tag_created_buildings
+from buildings.stats import update_rollup
 from django.contrib.gis.geos import Point
 
+BULK_BATCH_SIZE = 500
+MAX_BULK_BUILDINGS = 10000
+
+
+def coordinate_to_point(coord):
+    """(lat, lon) as returned by BuildingsSerializer.validate_building to a WGS84 point"""
+    return Point(float(coord[1]), float(coord[0]), srid=4326)
+
+
+class BulkBuildingsSerializer(serializers.ListSerializer):
+    """validate a list of buildings row by row, keeping the valid rows and reporting the invalid ones"""
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            raise serializers.ValidationError({'non_field_errors': ['expected a list of buildings']})
+        if self.max_length is not None and len(data) > self.max_length:
+            raise serializers.ValidationError({'non_field_errors': [f'cannot create more than {self.max_length} buildings at once']})
+        self.valid_rows = []
+        self.row_errors = []
+        validated = []
+        for index, item in enumerate(data):
+            try:
+                validated.append(self.run_child_validation(item))
+                self.valid_rows.append(index)
+            except serializers.ValidationError as e:
+                self.row_errors.append({'row': index, 'errors': e.detail})
+        return validated
+
+    def create(self, validated_data):
+        buildings = [Building(**{**item, 'building': coordinate_to_point(item['building'])}) for item in validated_data]
+        buildings = Building.objects.bulk_create(buildings, batch_size=BULK_BATCH_SIZE)
+        update_rollup(added=tag_created_buildings(buildings))
+        return buildings
+
 
 class BuildingsSerializer(serializers.ModelSerializer):
     class Meta:
         model = Building
         fields = '__all__'
-        extra_kwargs = {'user_id': {'read_only': True}, 'created_at': {'read_only': True}, 'updated_at': {'read_only': True}}
+        extra_kwargs = {'user_id': {'read_only': True}, 'thumbnail': {'read_only': True}, 'created_at': {'read_only': True}, 'updated_at': {'read_only': True}}
+        list_serializer_class = BulkBuildingsSerializer
     
     def validate_user_id(self, value):
         try:
@@ -29,15 +68,28 @@ class BuildingsSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Coordinate format cannot be parsed. The coordinate should be two floats values separated by a comma.")
     
     def create(self, validated_data):
-        coord = validated_data.get('building')
-        validated_data['building'] = Point(float(coord[1]), float(coord[0]))
+        validated_data['building'] = coordinate_to_point(validated_data.get('building'))
         return Building.objects.create(**validated_data)
 
     def update(self, instance, validated_data):
         for key, val in validated_data.items():
             if hasattr(instance, key):
                 if key == 'building':
-                    val = Point(val[1], val[0])
+                    val = coordinate_to_point(val)
                 setattr(instance, key, val)
         instance.save()
-        return instance
\ No newline at end of file
+        return instance
+
+class BuildingMediaSerializer(serializers.ModelSerializer):
+    url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = BuildingMedia
+        fields = ['id', 'building', 'kind', 'content_type', 'size', 'sha256', 'status', 'url', 'thumbnail_url', 'created_at']
+
+    def get_url(self, obj):
+        return reverse('api-building_media_file', args=[obj.building_id, obj.pk])
+
+    def get_thumbnail_url(self, obj):
+        return media_url(obj.thumbnail.name)
@@ -0,0 +1,111 @@
+import os
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+FILE_BLOCK_SIZE = 256 * 1024
+MEDIA_MAX_AGE = 24 * 60 * 60
+SENDFILE_HEADERS = {'x-accel-redirect': 'X-Accel-Redirect', 'x-sendfile': 'X-Sendfile'}
+
+
+class FileRange:
+    """length bytes of an open file from start on
+
+    reads stop at the end of the range, and fileno() lets a WSGI server's file_wrapper sendfile() the
+    range from the current position, bounded by the Content-Length of the response.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """inclusive (start, end) of a single byte range, None to send the whole file
+
+    malformed headers and multiple ranges are answered with the whole file, which RFC 9110 allows.
+    raises ValueError when the range starts past the end of the file.
+    """
+    match = RANGE_PATTERN.match(header.strip()) if header else None
+    if match is None or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        if int(last) == 0:
+            raise ValueError('range not satisfiable')
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    if start >= size:
+        raise ValueError('range not satisfiable')
+    if last and int(last) < start:
+        return None
+    return start, min(int(last), size - 1) if last else size - 1
+
+def if_range_matches(request, etag, last_modified):
+    """whether a Range request may be answered partially, If-Range must match the current file exactly"""
+    value = request.headers.get('If-Range')
+    if value is None:
+        return True
+    if value.startswith(('"', 'W/')):
+        return value == etag
+    return parse_http_date_safe(value) == last_modified
+
+def sendfile_response(name, path, content_type):
+    """hand the file to the front server, which then also answers Range requests itself"""
+    mode = settings.MEDIA_SENDFILE
+    response = HttpResponse(content_type=content_type)
+    if mode == 'x-accel-redirect':
+        response[SENDFILE_HEADERS[mode]] = settings.MEDIA_ACCEL_REDIRECT_LOCATION + quote(name)
+    else:
+        response[SENDFILE_HEADERS[mode]] = path
+    return response
+
+def serve_file(request, name, content_type, etag):
+    """a stored media file with conditional GET and single byte range support
+
+    raises FileNotFoundError when the file is missing from storage.
+    """
+    path = os.path.join(settings.MEDIA_ROOT, name)
+    stat = os.stat(path)
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None and settings.MEDIA_SENDFILE:
+        response = sendfile_response(name, path, content_type)
+    elif response is None:
+        try:
+            byte_range = parse_range(request.headers.get('Range'), stat.st_size) if if_range_matches(request, etag, last_modified) else None
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+        if byte_range is None:
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+        else:
+            start, end = byte_range
+            response = FileResponse(FileRange(open(path, 'rb'), start, end - start + 1), content_type=content_type, status=206)
+            response['Content-Length'] = end - start + 1
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response.block_size = FILE_BLOCK_SIZE
+        response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=MEDIA_MAX_AGE)
+    return response
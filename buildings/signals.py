@@ -1,14 +1,100 @@
-from django.db.models.signals import pre_delete, post_delete
+import logging
+from functools import partial
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.signals import pre_delete, post_delete, post_init, pre_save, post_save
 from django.dispatch import receiver
-from users.models import Profile
+from users.models import Profile, UserBuilding
+from announcements.models import Notice
+from buildings.models import Building, BuildingMedia
+from buildings.cache import collect_invalidated_points, invalidate_tiles_on_commit
+from buildings.stats import building_state, collect_removed_states, remove_from_rollup, stored_state, update_rollup
+from buildings.boundaries import boundary_names
+from buildings.events import broadcaster, occupancy_event
+from buildings.media import refresh_building_thumbnails, remove_unreferenced_files
 
 
+ORPHAN_CLEANUP_BATCH_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+
+def delete_orphaned_buildings(building_ids):
+    """delete the buildings among building_ids that no profile is linked to anymore
+
+    buildings with notices are protected and kept, with a warning. each batch is one anti-join select of
+    those, one bulk delete and one rollup update per group touched, whatever the number of buildings, and
+    the tiles of every deleted building are dropped together once the transaction commits.
+    """
+    with collect_invalidated_points():
+        for start in range(0, len(building_ids), ORPHAN_CLEANUP_BATCH_SIZE):
+            batch = building_ids[start:start + ORPHAN_CLEANUP_BATCH_SIZE]
+            linked = UserBuilding.objects.filter(building=OuterRef('pk'))
+            noticed = Notice.objects.filter(building=OuterRef('pk'))
+            orphans = Building.objects.filter(pk__in=batch).exclude(Exists(linked))
+            kept = list(orphans.filter(Exists(noticed)).values_list('pk', flat=True))
+            if kept:
+                logger.warning('orphaned buildings with unresolved notices were kept: %s', kept)
+            with collect_removed_states():
+                orphans.exclude(Exists(noticed)).delete()
+
 @receiver(pre_delete, sender=Profile)
 def save_related_buildings_before_profile_delete(sender, instance, **kwargs):
-    instance._related_buildings = list(instance.buildings.all())
+    instance._related_building_ids = list(UserBuilding.objects.filter(profile=instance).values_list('building_id', flat=True))
 
 @receiver(post_delete, sender=Profile)
 def delete_orphaned_buildings_after_profile_delete(sender, instance, **kwargs):
-    for building in instance._related_buildings:
-        if not building.profile.all().exists():
-            building.delete()
+    delete_orphaned_buildings(instance._related_building_ids)
+
+@receiver(post_init, sender=Building)
+def remember_building_location(sender, instance, **kwargs):
+    instance._saved_building = instance.__dict__.get('building')
+    instance._saved_rollup_state = building_state(instance)
+
+@receiver(pre_save, sender=Building)
+def assign_boundaries_before_building_save(sender, instance, **kwargs):
+    if instance._state.adding or instance._saved_building != instance.building:
+        for level, name in boundary_names(instance.building).items():
+            setattr(instance, level, name)
+
+@receiver(pre_save, sender=Building)
+def load_rollup_state_before_building_save(sender, instance, **kwargs):
+    if not instance._state.adding and instance._saved_rollup_state is None:
+        instance._saved_rollup_state = stored_state(instance.pk)
+
+@receiver(post_save, sender=Building)
+def update_rollup_after_building_save(sender, instance, created, **kwargs):
+    state = building_state(instance) or stored_state(instance.pk)
+    update_rollup(added=[state], removed=[] if created else [instance._saved_rollup_state])
+    instance._saved_rollup_state = state
+
+@receiver(post_delete, sender=Building)
+def update_rollup_after_building_delete(sender, instance, **kwargs):
+    remove_from_rollup(building_state(instance) or instance._saved_rollup_state)
+
+@receiver(post_save, sender=Building)
+def invalidate_tiles_after_building_save(sender, instance, **kwargs):
+    # after commit, so a tile rendered meanwhile by another request is not cached from the old rows
+    invalidate_tiles_on_commit(instance._saved_building, instance.building)
+    instance._saved_building = instance.building
+
+@receiver(post_delete, sender=Building)
+def invalidate_tiles_after_building_delete(sender, instance, **kwargs):
+    invalidate_tiles_on_commit(instance.__dict__.get('building'))
+
+@receiver(pre_save, sender=Building)
+def detect_occupancy_change_before_building_save(sender, instance, **kwargs):
+    saved = instance._saved_rollup_state
+    instance._occupancy_changed = not instance._state.adding and saved is not None and saved[3] != instance.occupancy
+
+@receiver(post_save, sender=Building)
+def publish_occupancy_change_after_building_save(sender, instance, **kwargs):
+    if instance._occupancy_changed:
+        event = occupancy_event(instance)
+        transaction.on_commit(lambda: broadcaster.publish(event))
+
+@receiver(post_delete, sender=BuildingMedia)
+def remove_media_files_after_media_delete(sender, instance, **kwargs):
+    if instance.status == 'ready':
+        refresh_building_thumbnails([instance.building_id])
+    transaction.on_commit(partial(remove_unreferenced_files, instance.sha256, [instance.file.name, instance.thumbnail.name]))
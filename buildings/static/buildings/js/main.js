@@ -15,11 +15,52 @@ const baseLayers = {
     "Open Street Maps": osm,
     "Google Hybrid": googleHybrid
 };
+
+const buildingTiles = L.vectorGrid.protobuf('/api/v1/building/tiles/{z}/{x}/{y}.mvt', {
+    vectorTileLayerStyles: {
+        buildings: properties => ({
+            radius: 4,
+            weight: 1,
+            color: properties.occupancy ? '#c0392b' : '#27ae60',
+            fill: true,
+            fillOpacity: 0.8
+        })
+    },
+    interactive: true
+}).on('click', event => {
+    const properties = event.layer.properties;
+    L.popup()
+        .setLatLng(event.latlng)
+        .setContent(`${properties.county || ''} ${properties.district || ''}<br>rent: ${properties.rent ?? 'n/a'}`)
+        .openOn(map);
+});
+
+const overlays = {
+    "Buildings (vector tiles)": buildingTiles
+};
 osm.addTo(map);
-L.control.layers(baseLayers).addTo(map);
+L.control.layers(baseLayers, overlays).addTo(map);
+
+// the view can span more than one world when zoomed out or panned across the antimeridian,
+// the API only accepts a bbox within -180..180 and -90..90
+function viewBBox() {
+  const bounds = map.getBounds();
+  const clamp = (value, limit) => Math.min(Math.max(value, -limit), limit);
+  if (bounds.getEast() - bounds.getWest() >= 360) {
+    return [-180, clamp(bounds.getSouth(), 90), 180, clamp(bounds.getNorth(), 90)].join(',');
+  }
+  const west = L.Util.wrapNum(bounds.getWest(), [-180, 180]);
+  const east = west + bounds.getEast() - bounds.getWest();
+  return [west, clamp(bounds.getSouth(), 90), Math.min(east, 180), clamp(bounds.getNorth(), 90)].join(',');
+}
 
 async function fetchData() {
-  const url = 'http://127.0.0.1:8000/api/v1/building/';
+  const params = new URLSearchParams({
+    geojson: 'true',
+    bbox: viewBBox(),
+    zoom: map.getZoom()
+  });
+  const url = `/api/v1/building/?${params}`;
   try {
     response = await fetch(url, {
       method: 'GET'
@@ -44,10 +85,19 @@ async function main() {
     iconAnchor: [12, 41],
     popupAnchor: [1, -34]
   });
-  const buildingsGeojson = await fetchData().then(result => JSON.parse(result));
-  const tmp = L.geoJSON(buildingsGeojson, {
+  const buildingsLayer = L.geoJSON(null, {
     pointToLayer: (geoJSONPoint, latLng) => L.marker(latLng, {icon: customIcon})
   }).addTo(map);
+
+  async function loadViewport() {
+    const buildingsGeojson = await fetchData();
+    if (typeof buildingsGeojson === 'object') {
+      buildingsLayer.clearLayers();
+      buildingsLayer.addData(buildingsGeojson);
+    }
+  }
+  map.on('moveend', loadViewport);
+  await loadViewport();
 }
 console.log( L.Icon.Default.prototype.options);
 main();
\ No newline at end of file
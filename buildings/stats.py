@@ -0,0 +1,147 @@
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, IntegerField, Q, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Floor
+from buildings.models import Building, BuildingRentRollup
+
+RENT_BUCKET_WIDTH = 500
+NO_RENT = -1
+GROUP_BY = ('county', 'district')
+PERCENTILES = (25, 50, 75, 90)
+ROLLUP_FIELDS = ('county', 'district', 'rent', 'occupancy')
+
+logger = logging.getLogger(__name__)
+# states removed inside collect_removed_states(), None outside of it
+_removed_states = ContextVar('removed_rollup_states', default=None)
+
+
+def rent_bucket(rent):
+    return NO_RENT if rent is None else int(Decimal(str(rent)) // RENT_BUCKET_WIDTH)
+
+def building_state(building):
+    """(county, district, rent, occupancy) of a building instance, None when some of them are deferred"""
+    if any(field not in building.__dict__ for field in ROLLUP_FIELDS):
+        return None
+    return tuple(building.__dict__[field] for field in ROLLUP_FIELDS)
+
+def stored_state(pk):
+    return Building.objects.filter(pk=pk).values_list(*ROLLUP_FIELDS).first()
+
+@contextmanager
+def collect_removed_states():
+    """apply the rollup removals of the building deletes inside the block as one update_rollup at its end"""
+    states = []
+    token = _removed_states.set(states)
+    try:
+        yield
+    finally:
+        _removed_states.reset(token)
+    update_rollup(removed=states)
+
+def remove_from_rollup(state):
+    """remove one building state from the rollup, or leave it to the enclosing collect_removed_states()"""
+    states = _removed_states.get()
+    if states is None:
+        update_rollup(removed=[state])
+    else:
+        states.append(state)
+
+def update_rollup(added=(), removed=()):
+    """add and remove building states from the rollup, one update per (county, district, rent bucket) touched"""
+    deltas = {}
+    for sign, states in ((1, added), (-1, removed)):
+        for county, district, rent, occupancy in filter(None, states):
+            delta = deltas.setdefault((county or '', district or '', rent_bucket(rent)), [0, 0, Decimal(0)])
+            delta[0] += sign
+            delta[1] += sign if occupancy else 0
+            delta[2] += sign * Decimal(str(rent)) if rent is not None else 0
+    for (county, district, bucket), (buildings, occupied, rent_sum) in deltas.items():
+        if buildings or occupied or rent_sum:
+            _apply_delta(county, district, bucket, buildings, occupied, rent_sum)
+
+def _apply_delta(county, district, bucket, buildings, occupied, rent_sum):
+    rollup = BuildingRentRollup.objects.filter(county=county, district=district, rent_bucket=bucket)
+    changes = {'buildings': F('buildings') + buildings, 'occupied': F('occupied') + occupied, 'rent_sum': F('rent_sum') + rent_sum}
+    if rollup.filter(buildings__gte=-buildings, occupied__gte=-occupied, rent_sum__gte=-rent_sum).update(**changes):
+        return
+    if buildings < 0 or occupied < 0 or rent_sum < 0:
+        # buildings added without signals (bulk_create, fixtures) were never counted, so removing them has
+        # too little or nothing to subtract from; rebuild instead of storing negative counts
+        logger.warning('rent rollup row for %s/%s/%s is missing or too small to remove buildings from, rebuilding the rollup', county, district, bucket)
+        transaction.on_commit(rebuild_rollup)
+        return
+    try:
+        with transaction.atomic():
+            BuildingRentRollup.objects.create(
+                county=county, district=district, rent_bucket=bucket, buildings=buildings, occupied=occupied, rent_sum=rent_sum)
+    except IntegrityError:
+        # another request created the row in the meantime
+        rollup.update(**changes)
+
+def rebuild_rollup(building_model=Building, rollup_model=BuildingRentRollup):
+    """recompute the whole rollup from the building table, the models can be historical ones in migrations"""
+    rows = (building_model.objects
+        .annotate(
+            group_county=Coalesce('county', Value('')),
+            group_district=Coalesce('district', Value('')),
+            bucket=Coalesce(Cast(Floor(F('rent') / RENT_BUCKET_WIDTH), IntegerField()), Value(NO_RENT)))
+        .values('group_county', 'group_district', 'bucket')
+        .annotate(buildings=Count('pk'), occupied=Count('pk', filter=Q(occupancy=True)), rent_sum=Sum('rent'))
+        .order_by())
+    with transaction.atomic():
+        rollup_model.objects.all().delete()
+        rollups = rollup_model.objects.bulk_create([
+            rollup_model(
+                county=row['group_county'], district=row['group_district'], rent_bucket=row['bucket'],
+                buildings=row['buildings'], occupied=row['occupied'], rent_sum=row['rent_sum'] or 0)
+            for row in rows
+        ], batch_size=1000)
+    return len(rollups)
+
+def rent_statistics(group_by='county'):
+    """occupancy and rent statistics per county, or per county and district, read from the rollup only
+
+    averages are exact, percentiles are interpolated inside RENT_BUCKET_WIDTH wide buckets.
+    """
+    if group_by not in GROUP_BY:
+        raise ValueError(f'group_by must be one of {", ".join(GROUP_BY)}')
+    fields = GROUP_BY[:GROUP_BY.index(group_by) + 1]
+    groups = {}
+    for row in BuildingRentRollup.objects.filter(buildings__gt=0).values(*fields, 'rent_bucket', 'buildings', 'occupied', 'rent_sum'):
+        group = groups.setdefault(tuple(row[field] for field in fields), {'buildings': 0, 'occupied': 0, 'rent_sum': Decimal(0), 'histogram': {}})
+        group['buildings'] += row['buildings']
+        group['occupied'] += row['occupied']
+        if row['rent_bucket'] != NO_RENT:
+            group['rent_sum'] += row['rent_sum']
+            group['histogram'][row['rent_bucket']] = group['histogram'].get(row['rent_bucket'], 0) + row['buildings']
+    results = []
+    for key in sorted(groups):
+        group = groups[key]
+        histogram = sorted(group['histogram'].items())
+        with_rent = sum(count for _, count in histogram)
+        result = {field: value or None for field, value in zip(fields, key)}
+        result.update({
+            'buildings': group['buildings'],
+            'occupied': group['occupied'],
+            'occupancy_rate': round(group['occupied'] / group['buildings'], 4),
+            'buildings_with_rent': with_rent,
+            'avg_rent': round(group['rent_sum'] / with_rent, 2) if with_rent else None,
+        })
+        for percentile in PERCENTILES:
+            name = 'median_rent' if percentile == 50 else f'p{percentile}_rent'
+            result[name] = _percentile(histogram, with_rent, percentile)
+        results.append(result)
+    return results
+
+def _percentile(histogram, total, percentile):
+    if not total:
+        return None
+    target = total * percentile / 100
+    seen = 0
+    for bucket, count in histogram:
+        if seen + count >= target:
+            return round(Decimal((bucket + (target - seen) / count) * RENT_BUCKET_WIDTH), 2)
+        seen += count
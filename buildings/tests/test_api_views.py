@@ -4,6 +4,10 @@ from django.urls import reverse
 import json
 from announcements.models import Notice
 from buildings.models import Building
+from django.contrib.gis.geos import Point
+from django.core.cache import caches
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 
 class TestBuildings(APITestCase):
     @classmethod
@@ -38,12 +42,12 @@ class TestBuildings(APITestCase):
     def test_get_building_unauthenticated_user(self):
         response = self.client.get(self.building_retrieve_update_url())
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(int(json.loads(response.json())['features'][0]['properties']['pk']), self.building_id)
+        self.assertEqual(int(response.json()['features'][0]['properties']['pk']), self.building_id)
     
     def test_get_building_authenticated_user(self):
         response = self.client.get(self.building_retrieve_update_url(), headers={'Authorization': f'Bearer {self.owner_token}'})
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(int(json.loads(response.json())['features'][0]['properties']['pk']), self.building_id)
+        self.assertEqual(int(response.json()['features'][0]['properties']['pk']), self.building_id)
     
     def test_create_building_unauthenticated_user(self):
         data = {
@@ -101,14 +105,14 @@ class TestBuildings(APITestCase):
     def test_create_building_for_another_user_with_admin(self):
         data = {
             'user_id': self.owner.pk,
-            'building': '-4.0, 32.5',
+            'building': '-4.1, 32.5',
         }
         response = self.client.put(self.building_list_create_url, data, headers={'Authorization': f'Bearer {self.admin_token}'})
         self.assertEqual(response.status_code, 201)
         building_id = response.json().get('id')
         building = self.client.get(reverse('api-building_retrieve_update', args=[building_id]))
         self.assertEqual(building.status_code, 200)
-        self.assertEqual(int(json.loads(building.json())['features'][0]['properties']['pk']), building_id)
+        self.assertEqual(int(building.json()['features'][0]['properties']['pk']), building_id)
 
     def test_create_building_with_authenticated_user_and_query_all_buildings(self):
         data = {
@@ -120,11 +124,118 @@ class TestBuildings(APITestCase):
         building_id = response.json().get('id')
         building = self.client.get(reverse('api-building_retrieve_update', args=[building_id]))
         self.assertEqual(building.status_code, 200)
-        self.assertEqual(int(json.loads(building.json())['features'][0]['properties']['pk']), building_id)
+        self.assertEqual(int(building.json()['features'][0]['properties']['pk']), building_id)
         all_buildings = self.client.get(self.building_list_create_url)
         self.assertEqual(all_buildings.status_code, 200)
-        self.assertEqual(len(all_buildings.json().get('results')), 2)
-    
+        self.assertEqual(len(all_buildings.json().get('features')), 2)
+
+    def test_query_buildings_page_is_one_feature_collection(self):
+        Building.objects.create(building=Point(42.5, -3.0), rent=800)
+        response = self.client.get(self.building_list_create_url, data={'page_size': 1, 'count': 'true'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/geo+json')
+        page = response.json()
+        self.assertEqual(page['type'], 'FeatureCollection')
+        self.assertEqual(page['count'], 2)
+        self.assertTrue(page['next'])
+        self.assertIsNone(page['previous'])
+        self.assertEqual(len(page['features']), 1)
+        self.assertEqual(page['features'][0]['id'], self.building_id)
+        self.assertEqual(page['features'][0]['geometry']['coordinates'], [32.5, -4.0])
+        next_page = self.client.get(page['next']).json()
+        self.assertNotIn('count', next_page)
+        self.assertEqual(next_page['features'][0]['properties']['rent'], '800.00')
+        self.assertTrue(next_page['previous'])
+        self.assertIsNone(next_page['next'])
+
+    def test_query_buildings_in_bbox(self):
+        inside = Building.objects.create(building=Point(32.512345678, -4.012345678))
+        outside = Building.objects.create(building=Point(36.8, -1.3))
+        response = self.client.get(self.building_list_create_url, data={'geojson': 'true', 'bbox': '32.0,-4.5,33.0,-3.5'})
+        self.assertEqual(response.status_code, 200)
+        features = json.loads(b''.join(response.streaming_content))['features']
+        self.assertEqual(sorted(x['id'] for x in features), [self.building_id, inside.pk])
+        response = self.client.get(self.building_list_create_url, data={'bbox': '36.0,-2.0,37.0,-1.0'})
+        self.assertEqual([x['id'] for x in response.json()['features']], [outside.pk])
+
+    def test_query_buildings_in_bbox_zoom_rounds_coordinates(self):
+        inside = Building.objects.create(building=Point(32.512345678, -4.012345678))
+        response = self.client.get(self.building_list_create_url, data={'bbox': '32.5,-4.5,33.0,-4.0', 'zoom': 10})
+        self.assertEqual(response.status_code, 200)
+        feature = next(x for x in response.json()['features'] if x['id'] == inside.pk)
+        self.assertEqual(feature['geometry']['coordinates'], [32.512, -4.012])
+
+    def test_query_buildings_precision_rounds_coordinates(self):
+        inside = Building.objects.create(building=Point(32.512345678, -4.012345678))
+        response = self.client.get(self.building_list_create_url, data={'bbox': '32.5,-4.5,33.0,-4.0', 'zoom': 10, 'precision': 2})
+        feature = next(x for x in response.json()['features'] if x['id'] == inside.pk)
+        self.assertEqual(feature['geometry']['coordinates'], [32.51, -4.01])
+        response = self.client.get(self.building_retrieve_update_url(), data={'precision': 0})
+        self.assertEqual(response.json()['features'][0]['geometry']['coordinates'], [32, -4])
+        self.assertNotEqual(response['ETag'], self.client.get(self.building_retrieve_update_url())['ETag'])
+        response = self.client.get(self.building_list_create_url, data={'precision': 12})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'precision must be an integer between 0 and 9')
+
+    def test_query_buildings_delta_encoding(self):
+        second = Building.objects.create(building=Point(32.512345678, -4.012345678), rent=800)
+        response = self.client.get(self.building_list_create_url, data={'encoding': 'delta', 'precision': 5, 'page_size': 20})
+        self.assertEqual(response['Content-Type'], 'application/json')
+        page = response.json()
+        self.assertEqual((page['encoding'], page['precision']), ('delta', 5))
+        self.assertEqual(page['columns'][:3], ['pk', 'lon', 'lat'])
+        rows = page['rows']
+        self.assertEqual(rows[0][:3], [self.building_id, 3250000, -400000])
+        self.assertEqual(rows[1][:3], [second.pk - self.building_id, 1235, -1235])
+        self.assertEqual(dict(zip(page['columns'], rows[1]))['rent'], '800.00')
+
+    def test_query_buildings_polyline_encoding_is_streamed(self):
+        Building.objects.create(building=Point(32.6, -4.1))
+        response = self.client.get(self.building_list_create_url, data={'encoding': 'polyline', 'geojson': 'true'})
+        self.assertTrue(response.streaming)
+        collection = json.loads(b''.join(response.streaming_content))
+        self.assertEqual((collection['encoding'], collection['precision'], len(collection['rows'])), ('polyline', 6, 2))
+        self.assertEqual(collection['coordinates'], '~ncsF_qs~|@~hbE_ibE')
+        response = self.client.get(self.building_list_create_url, data={'encoding': 'wkb'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_query_buildings_by_attributes_and_bbox(self):
+        match = Building.objects.create(building=Point(32.6, -4.1), county='Kisumu', district='Nyando', rent=12000)
+        Building.objects.create(building=Point(32.6, -4.1), county='Kisumu', district='Nyando', rent=12000, occupancy=True)
+        Building.objects.create(building=Point(32.6, -4.1), county='Kisumu', district='Muhoroni', rent=12000)
+        Building.objects.create(building=Point(32.6, -4.1), county='Kisumu', district='Nyando', rent=25000)
+        Building.objects.create(building=Point(36.8, -1.3), county='Kisumu', district='Nyando', rent=12000)
+        params = {'county': 'Kisumu', 'district': 'Nyando', 'occupancy': 'false', 'min_rent': 10000, 'max_rent': 20000, 'bbox': '32.0,-4.5,33.0,-3.5'}
+        response = self.client.get(self.building_list_create_url, data=params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([x['id'] for x in response.json()['features']], [match.pk])
+        response = self.client.get(self.building_list_create_url, data={'min_rent': 20000, 'max_rent': 10000})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'min_rent cannot be greater than max_rent')
+        response = self.client.get(self.building_list_create_url, data={'min_rent': 'cheap'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'min_rent must be a number')
+
+    def test_query_buildings_invalid_bbox_or_zoom(self):
+        for bbox in ['32.0,-4.5,33.0', '33.0,-4.5,32.0,-3.5', '32.0,-95,33.0,-3.5', 'a,b,c,d']:
+            response = self.client.get(self.building_list_create_url, data={'bbox': bbox})
+            self.assertEqual(response.status_code, 400)
+        response = self.client.get(self.building_list_create_url, data={'bbox': '32.0,-4.5,33.0,-3.5', 'zoom': 30})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'zoom must be an integer between 0 and 22')
+
+    def test_query_all_buildings_geojson_is_streamed(self):
+        response = self.client.get(self.building_list_create_url, data={'geojson': 'true'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/geo+json')
+        collection = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(collection['type'], 'FeatureCollection')
+        self.assertEqual(len(collection['features']), 1)
+        self.assertEqual(collection['features'][0]['id'], self.building_id)
+        self.assertEqual(collection['features'][0]['properties']['pk'], str(self.building_id))
+        self.assertEqual(collection['features'][0]['geometry']['coordinates'], [32.5, -4.0])
+
     def test_update_building_unauthenticated_user(self):
         response = self.client.patch(self.building_retrieve_update_url(), data={'building': '5.3, 42.1'})
         self.assertEqual(response.status_code, 401)
@@ -142,14 +253,14 @@ class TestBuildings(APITestCase):
     def test_update_building_user_not_owner_but_is_admin(self):
         response = self.client.patch(self.building_retrieve_update_url(), data={'building': '5.3, 42.1', 'rent': 800}, headers={'Authorization': f'Bearer {self.admin_token}'})
         self.assertEqual(response.status_code, 200)
-        building = json.loads(self.client.get(self.building_retrieve_update_url()).json())
+        building = self.client.get(self.building_retrieve_update_url()).json()
         self.assertEqual(building['features'][0]['geometry']['coordinates'][0], 42.1)
         self.assertEqual(building['features'][0]['geometry']['coordinates'][1], 5.3)
     
     def test_update_building_authenticated_owner(self):
         response = self.client.patch(self.building_retrieve_update_url(), data={'building': '5.3, 42.1'},headers={'Authorization': f'Bearer {self.owner_token}'})
         self.assertEqual(response.status_code, 200)
-        building = json.loads(self.client.get(self.building_retrieve_update_url(), data={'geojson': 'true'}).json())
+        building = self.client.get(self.building_retrieve_update_url(), data={'geojson': 'true'}).json()
         self.assertEqual(building['features'][0]['geometry']['coordinates'][0], 42.1)
         self.assertEqual(building['features'][0]['geometry']['coordinates'][1], 5.3)
     
@@ -259,4 +370,203 @@ class TestBuildings(APITestCase):
 
 
 
-        
\ No newline at end of file
+        
+
+    def test_get_building_conditional(self):
+        response = self.client.get(self.building_retrieve_update_url())
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.building_retrieve_update_url(), headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.client.patch(self.building_retrieve_update_url(), {'rent': 25000}, headers={'Authorization': f'Bearer {self.owner_token}'})
+        response = self.client.get(self.building_retrieve_update_url(), headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_get_buildings_list_weak_etag(self):
+        response = self.client.get(self.building_list_create_url, data={'county': 'Nairobi'})
+        self.assertTrue(response['ETag'].startswith('W/'))
+        response = self.client.get(self.building_list_create_url, data={'county': 'Nairobi'}, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+        etag = response['ETag']
+        Building.objects.filter(pk=self.building_id).update(county='Nairobi')
+        response = self.client.get(self.building_list_create_url, data={'county': 'Nairobi'}, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['features']), 1)
+
+
+class TestBuildingBulkCreate(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', password='Yyugbcdasdd@134')
+        cls.regular_user = User.objects.create_user(username='regular_user', password='Gyuxxcdasdd@579')
+        cls.owner_token = APIClient().post(reverse('api-user_login'), {'username': 'owner', 'password': 'Yyugbcdasdd@134'}).json().get('access')
+        cls.bulk_url = reverse('api-building_bulk_create') + f'?user_id={cls.owner.pk}'
+
+    def rows(self, n, lon=36.8):
+        return [{'building': f'-1.{i:03d}, {lon}', 'rent': 1000 + i, 'county': 'Nairobi'} for i in range(n)]
+
+    def test_bulk_create_json_array_reports_invalid_rows(self):
+        rows = self.rows(3)
+        rows[1]['building'] = '-1.0 36.8'
+        response = self.client.put(self.bulk_url, rows, format='json', headers={'Authorization': f'Bearer {self.owner_token}'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([x['row'] for x in response.json()['created']], [0, 2])
+        self.assertEqual(response.json()['errors'][0]['row'], 1)
+        self.assertIn('building', response.json()['errors'][0]['errors'])
+        created = [x['id'] for x in response.json()['created']]
+        self.assertEqual(self.owner.profile.userbuilding_set.filter(building__in=created, relationship='owner').count(), 2)
+
+    def test_bulk_create_ndjson(self):
+        body = '\n'.join(json.dumps(row) for row in self.rows(2)) + '\n'
+        response = self.client.put(self.bulk_url, body, content_type='application/x-ndjson', headers={'Authorization': f'Bearer {self.owner_token}'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()['created']), 2)
+        self.assertEqual(Building.objects.filter(county='Nairobi').count(), 2)
+
+    def test_bulk_create_invalid_ndjson(self):
+        response = self.client.put(self.bulk_url, '{"building": "-1.0, 36.8"}\nnot json\n', content_type='application/x-ndjson', headers={'Authorization': f'Bearer {self.owner_token}'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Building.objects.exists())
+
+    def test_bulk_create_all_rows_invalid(self):
+        response = self.client.put(self.bulk_url, [{'building': 'x'}], format='json', headers={'Authorization': f'Bearer {self.owner_token}'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['created'], [])
+
+    def test_bulk_create_for_another_user_with_non_admin(self):
+        url = reverse('api-building_bulk_create') + f'?user_id={self.regular_user.pk}'
+        response = self.client.put(url, self.rows(1), format='json', headers={'Authorization': f'Bearer {self.owner_token}'})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()['error'], 'user does not have permission to perform this action')
+
+    def test_bulk_create_query_count_does_not_grow_with_rows(self):
+        def count_queries(n, lon):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.put(self.bulk_url, self.rows(n, lon), format='json', headers={'Authorization': f'Bearer {self.owner_token}'})
+            self.assertEqual(response.status_code, 201)
+            return len(queries)
+        self.assertEqual(count_queries(2, 36.8), count_queries(20, 36.9))
+
+
+class TestBuildingNearest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.nearest_url = reverse('api-building_nearest')
+        cls.near = Building.objects.create(building=Point(36.8220, -1.2920), rent=30000)
+        cls.middle = Building.objects.create(building=Point(36.8300, -1.2900), rent=20000, occupancy=True)
+        cls.far = Building.objects.create(building=Point(36.9000, -1.2000), rent=15000)
+
+    def test_nearest_buildings_are_ordered_by_distance(self):
+        response = self.client.get(self.nearest_url, data={'lat': -1.2921, 'lon': 36.8219, 'k': 2})
+        self.assertEqual(response.status_code, 200)
+        features = response.json()['features']
+        self.assertEqual([x['id'] for x in features], [self.near.pk, self.middle.pk])
+        self.assertLess(features[0]['properties']['distance'], 20)
+        self.assertGreater(features[1]['properties']['distance'], features[0]['properties']['distance'])
+
+    def test_nearest_vacant_buildings_under_max_rent(self):
+        response = self.client.get(self.nearest_url, data={'lat': -1.2921, 'lon': 36.8219, 'occupancy': 'false', 'max_rent': 25000})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([x['id'] for x in response.json()['features']], [self.far.pk])
+
+    def test_nearest_invalid_parameters(self):
+        response = self.client.get(self.nearest_url, data={'lon': 36.8219})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'lat and lon are required and must be numbers')
+        response = self.client.get(self.nearest_url, data={'lat': -1.2921, 'lon': 36.8219, 'k': 0})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'k must be an integer between 1 and 100')
+        response = self.client.get(self.nearest_url, data={'lat': -1.2921, 'lon': 36.8219, 'occupancy': 'vacant'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], "occupancy must be 'true' or 'false'")
+
+
+class TestBuildingSearch(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.search_url = reverse('api-building_search')
+        cls.westlands = Building.objects.create(building=Point(36.80, -1.26), county='Nairobi', district='Westlands')
+        cls.nyali = Building.objects.create(building=Point(39.70, -4.04), county='Mombasa', district='Nyali', payment_details='M-Pesa paybill 400200')
+        cls.kisumu = Building.objects.create(building=Point(34.76, -0.09), county='Kisumu', district='Milimani')
+
+    def test_search_tolerates_misspelling(self):
+        response = self.client.get(self.search_url, data={'q': 'Nairbi'})
+        self.assertEqual(response.status_code, 200)
+        features = response.json()['features']
+        self.assertEqual(features[0]['id'], self.westlands.pk)
+        self.assertGreaterEqual(features[0]['properties']['score'], 0.5)
+        self.assertNotIn(self.kisumu.pk, [x['id'] for x in features])
+
+    def test_search_partial_district_and_payment_details(self):
+        response = self.client.get(self.search_url, data={'q': 'westl'})
+        self.assertEqual(response.json()['features'][0]['id'], self.westlands.pk)
+        response = self.client.get(self.search_url, data={'q': 'paybill'})
+        self.assertEqual(response.json()['features'][0]['id'], self.nyali.pk)
+
+    def test_search_follows_updates(self):
+        Building.objects.filter(pk=self.kisumu.pk).update(district='Kondele')
+        response = self.client.get(self.search_url, data={'q': 'Kondele'})
+        self.assertEqual([x['id'] for x in response.json()['features']], [self.kisumu.pk])
+
+    def test_search_invalid_parameters(self):
+        response = self.client.get(self.search_url, data={'q': 'Na'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'q must be at least 3 characters')
+        response = self.client.get(self.search_url, data={'q': 'Nairobi', 'limit': 500})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'limit must be an integer between 1 and 100')
+
+
+class TestBuildingClusters(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.clusters_url = reverse('api-building_clusters')
+        Building.objects.create(building=Point(36.8210, -1.2910), rent=10000, occupancy=True)
+        Building.objects.create(building=Point(36.8220, -1.2920), rent=20000)
+        Building.objects.create(building=Point(36.8230, -1.2930), rent=30000)
+        Building.objects.create(building=Point(39.6680, -4.0430), rent=50000)
+
+    def setUp(self):
+        caches['tiles'].clear()
+
+    def test_clusters_by_grid_cell(self):
+        response = self.client.get(self.clusters_url, data={'bbox': '33.0,-5.0,42.0,1.0', 'zoom': 8})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/geo+json')
+        clusters = sorted(response.json()['features'], key=lambda x: x['properties']['count'])
+        self.assertEqual(len(clusters), 2)
+        self.assertEqual(clusters[0]['properties']['count'], 1)
+        nairobi = clusters[1]['properties']
+        self.assertEqual(nairobi['count'], 3)
+        self.assertEqual(nairobi['occupied'], 1)
+        self.assertEqual(nairobi['vacant'], 2)
+        self.assertEqual(nairobi['min_rent'], '10000.00')
+        self.assertEqual(nairobi['avg_rent'], '20000.00')
+        self.assertEqual(nairobi['max_rent'], '30000.00')
+        self.assertAlmostEqual(clusters[1]['geometry']['coordinates'][0], 36.822)
+        self.assertAlmostEqual(clusters[1]['geometry']['coordinates'][1], -1.292)
+
+    def test_clusters_split_at_high_zoom(self):
+        response = self.client.get(self.clusters_url, data={'bbox': '36.820,-1.294,36.824,-1.290', 'zoom': 18})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['features']), 3)
+
+    def test_clusters_are_cached_until_a_building_in_the_tile_changes(self):
+        params = {'bbox': '36.0,-2.0,37.0,-1.0', 'zoom': 8}
+        self.assertEqual(self.client.get(self.clusters_url, data=params).json()['features'][0]['properties']['count'], 3)
+        with self.assertNumQueries(0):
+            self.client.get(self.clusters_url, data=params)
+        with self.captureOnCommitCallbacks(execute=True):
+            Building.objects.create(building=Point(36.8240, -1.2940), rent=40000)
+        self.assertEqual(self.client.get(self.clusters_url, data=params).json()['features'][0]['properties']['count'], 4)
+
+    def test_clusters_bbox_too_large_for_zoom(self):
+        response = self.client.get(self.clusters_url, data={'bbox': '36.8,-1.3,36.9,-1.2', 'zoom': 18})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'bbox covers too many tiles for this zoom level')
+
+    def test_clusters_require_bbox_and_zoom(self):
+        response = self.client.get(self.clusters_url, data={'bbox': '36.8,-1.3,36.9,-1.2'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'bbox and zoom query parameters are required')
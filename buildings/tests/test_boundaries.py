@@ -0,0 +1,85 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import MultiPolygon, Point, Polygon
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APIClient, APITestCase
+from buildings.ingest import open_layer
+from buildings.models import Boundary, Building
+from buildings.stats import rent_statistics
+
+
+def square(min_lon, min_lat, max_lon, max_lat):
+    return MultiPolygon(Polygon.from_bbox((min_lon, min_lat, max_lon, max_lat)), srid=4326)
+
+
+class TestBoundaries(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', password='Yyugbcdasdd@134')
+        cls.owner_token = APIClient().post(reverse('api-user_login'), {'username': 'owner', 'password': 'Yyugbcdasdd@134'}).json()['access']
+        cls.untagged = Building.objects.create(building=Point(36.82, -1.29), county='nairobi city')
+        cls.outside = Building.objects.create(building=Point(10.0, 10.0), county='Elsewhere')
+        Boundary.objects.create(name='Nairobi', level='county', geometry=square(36.6, -1.45, 37.1, -1.15))
+        Boundary.objects.create(name='Westlands', level='district', geometry=square(36.75, -1.30, 36.85, -1.20))
+        Boundary.objects.create(name='Kibra', level='district', geometry=square(36.75, -1.40, 36.85, -1.30))
+
+    def test_create_building_gets_county_and_district(self):
+        response = self.client.put(reverse('api-building_list_create'), {'user_id': self.owner.pk, 'building': '-1.25, 36.80', 'county': 'Nbi'}, headers={'Authorization': f'Bearer {self.owner_token}'})
+        self.assertEqual(response.status_code, 201)
+        building = Building.objects.get(pk=response.json()['id'])
+        self.assertEqual((building.county, building.district), ('Nairobi', 'Westlands'))
+
+    def test_moved_building_is_reassigned(self):
+        building = Building.objects.create(building=Point(36.80, -1.25))
+        building.building = Point(36.80, -1.35)
+        building.save()
+        building.refresh_from_db()
+        self.assertEqual(building.district, 'Kibra')
+
+    def test_bulk_created_buildings_are_tagged(self):
+        url = reverse('api-building_bulk_create') + f'?user_id={self.owner.pk}'
+        rows = [{'building': '-1.25, 36.80', 'rent': 10000}, {'building': '-1.35, 36.80', 'rent': 20000}]
+        response = self.client.put(url, rows, format='json', headers={'Authorization': f'Bearer {self.owner_token}'})
+        created = [x['id'] for x in response.json()['created']]
+        self.assertEqual(list(Building.objects.filter(pk__in=created).order_by('pk').values_list('district', flat=True)), ['Westlands', 'Kibra'])
+        districts = {x['district']: x for x in rent_statistics('district')}
+        self.assertEqual(districts['Kibra']['buildings'], 1)
+
+    def test_assign_boundaries_backfill(self):
+        out = StringIO()
+        call_command('assign_boundaries', '--chunk-size', '1', stdout=out)
+        self.assertIn('tagged', out.getvalue())
+        self.untagged.refresh_from_db()
+        self.outside.refresh_from_db()
+        self.assertEqual((self.untagged.county, self.untagged.district), ('Nairobi', 'Westlands'))
+        self.assertEqual(self.outside.county, 'Elsewhere')
+        self.assertIn(('Nairobi',), [(x['county'],) for x in rent_statistics('county')])
+
+    def test_assign_boundaries_changes_the_etag_of_retagged_buildings(self):
+        untagged_url = reverse('api-building_retrieve_update', args=[self.untagged.pk])
+        outside_url = reverse('api-building_retrieve_update', args=[self.outside.pk])
+        untagged_etag, outside_etag = self.client.get(untagged_url)['ETag'], self.client.get(outside_url)['ETag']
+        call_command('assign_boundaries', stdout=StringIO())
+        response = self.client.get(untagged_url, headers={'If-None-Match': untagged_etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['features'][0]['properties']['district'], 'Westlands')
+        self.assertEqual(self.client.get(outside_url, headers={'If-None-Match': outside_etag}).status_code, 304)
+
+    def test_load_boundaries_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'counties.geojson')
+            with open(path, 'w') as f:
+                json.dump({'type': 'FeatureCollection', 'features': [
+                    {'type': 'Feature', 'properties': {'NAME': 'Mombasa'}, 'geometry': json.loads(Polygon.from_bbox((39.5, -4.2, 39.8, -3.9)).geojson)},
+                ]}, f)
+            out = StringIO()
+            call_command('load_boundaries', path, '--level', 'county', '--name-field', 'NAME', '--replace', stdout=out)
+            open_layer.cache_clear()
+        self.assertIn('loaded 1 county boundaries', out.getvalue())
+        self.assertEqual(list(Boundary.objects.filter(level='county').values_list('name', flat=True)), ['Mombasa'])
+        building = Building.objects.create(building=Point(39.66, -4.04))
+        self.assertEqual(building.county, 'Mombasa')
@@ -0,0 +1,110 @@
+import gzip
+import json
+from unittest import skipIf
+from rest_framework.test import APITestCase
+from django.core.cache import caches
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase
+from django.urls import reverse
+from django.contrib.gis.geos import Point
+from buildings.cache import tile_key, LAYER_VERSION
+from buildings.models import Building
+from buildings.tiles import tile_for_point
+from RentalsManagement import compression
+from RentalsManagement.compression import CompressionMiddleware, negotiate_encoding
+
+
+class NegotiationTestCase(SimpleTestCase):
+    def test_negotiate_encoding(self):
+        self.assertEqual(negotiate_encoding('gzip, deflate'), 'gzip')
+        self.assertIsNone(negotiate_encoding(''))
+        self.assertIsNone(negotiate_encoding('identity'))
+        self.assertIsNone(negotiate_encoding('gzip;q=0'))
+        self.assertIsNone(negotiate_encoding('*;q=0'))
+
+    @skipIf(compression.brotli is None, 'brotli is not installed')
+    def test_brotli_is_preferred_on_equal_weights(self):
+        self.assertEqual(negotiate_encoding('gzip, deflate, br'), 'br')
+        self.assertEqual(negotiate_encoding('*'), 'br')
+        self.assertEqual(negotiate_encoding('br;q=0.5, gzip'), 'gzip')
+
+
+class MiddlewareTestCase(SimpleTestCase):
+    body = b'{"type":"FeatureCollection","features":[' + b','.join([b'{"type":"Feature","properties":{"county":"Nairobi"}}'] * 100) + b']}'
+
+    def get(self, response, accept_encoding='gzip'):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_compresses_json(self):
+        response = HttpResponse(self.body, content_type='application/geo+json')
+        response['ETag'] = '"building.1.1"'
+        response = self.get(response)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['ETag'], 'W/"building.1.1"')
+        self.assertEqual(gzip.decompress(response.content), self.body)
+
+    def test_compresses_streams(self):
+        response = self.get(StreamingHttpResponse(iter([self.body[:100], self.body[100:]]), content_type='application/geo+json'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), self.body)
+
+    def test_leaves_small_encoded_and_other_responses(self):
+        self.assertFalse(self.get(HttpResponse(b'{"id":1}', content_type='application/json')).has_header('Content-Encoding'))
+        self.assertFalse(self.get(HttpResponse(self.body, content_type='image/jpeg')).has_header('Content-Encoding'))
+        self.assertFalse(self.get(HttpResponse(self.body, content_type='application/json', status=206)).has_header('Content-Encoding'))
+        response = HttpResponse(self.body, content_type='application/json')
+        response['Content-Encoding'] = 'br'
+        self.assertEqual(self.get(response).content, self.body)
+
+    def test_identity_varies_on_accept_encoding(self):
+        response = self.get(HttpResponse(self.body, content_type='application/json'), accept_encoding='')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response.content, self.body)
+
+
+class TestPrecompressed(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.building = Building.objects.create(building=Point(36.8219, -1.2921), rent=45000, county='Nairobi')
+
+    def setUp(self):
+        caches['tiles'].clear()
+
+    def test_tile_is_compressed_once(self):
+        x, y = tile_for_point(36.8219, -1.2921, 14)
+        identity = self.client.get(reverse('api-building_tile', args=[14, x, y]))
+        first = self.client.get(reverse('api-building_tile', args=[14, x, y]), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(first['Content-Encoding'], 'gzip')
+        self.assertEqual(first['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(first.content), identity.content)
+        self.assertEqual(caches['tiles'].get(tile_key('mvt', 14, x, y) + ':gzip', version=LAYER_VERSION), first.content)
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('api-building_tile', args=[14, x, y]), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(second.content, first.content)
+
+    def test_invalidation_drops_compressed_tiles(self):
+        x, y = tile_for_point(36.8219, -1.2921, 14)
+        self.client.get(reverse('api-building_tile', args=[14, x, y]), HTTP_ACCEPT_ENCODING='gzip')
+        self.building.building = Point(39.6680, -4.0430)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.building.save()
+        self.assertIsNone(caches['tiles'].get(tile_key('mvt', 14, x, y) + ':gzip', version=LAYER_VERSION))
+
+    def test_layer_is_streamed_compressed(self):
+        url = reverse('api-building_list_create') + '?geojson=true'
+        identity = self.client.get(url)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['ETag'], 'W/' + identity['ETag'])
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b''.join(identity.streaming_content))
+
+    def test_filtered_layer_is_streamed_compressed(self):
+        response = self.client.get(reverse('api-building_list_create') + '?geojson=true&county=Nairobi', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(b''.join(response.streaming_content)))['features']), 1)
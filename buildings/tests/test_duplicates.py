@@ -0,0 +1,93 @@
+from io import StringIO
+from rest_framework.test import APIClient, APITestCase
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import Point
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from buildings.duplicates import bulk_duplicates, haversine, radius_degrees, upload_matches
+from buildings.models import Building
+
+
+class UploadMatchesTestCase(SimpleTestCase):
+    def test_radius_degrees_widen_away_from_the_equator(self):
+        self.assertAlmostEqual(radius_degrees(111320, 0), 1)
+        self.assertAlmostEqual(radius_degrees(111320, 60), 2)
+
+    def test_upload_matches_compare_neighbouring_cells(self):
+        points = [Point(36.8, -1.29), Point(36.80001, -1.29001), Point(36.9, -1.29), Point(36.8, -1.2901)]
+        matches = upload_matches(points, 25)
+        self.assertEqual(sorted(matches), [1, 3])
+        self.assertEqual([earlier for earlier, distance in matches[3]], [0, 1])
+        self.assertAlmostEqual(matches[3][0][1], haversine(points[0], points[3]))
+        self.assertAlmostEqual(haversine(points[0], points[3]), 11.1, places=1)
+        self.assertEqual(upload_matches([], 25), {})
+
+
+@override_settings(BUILDING_DUPLICATE_RADIUS=25)
+class TestDuplicateBuildings(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', password='Yyugbcdasdd@134')
+        cls.owner_token = APIClient().post(reverse('api-user_login'), {'username': 'owner', 'password': 'Yyugbcdasdd@134'}).json()['access']
+        cls.stored = Building.objects.create(building=Point(36.8219, -1.2921), rent=45000, county='Nairobi')
+        cls.bulk_url = reverse('api-building_bulk_create') + f'?user_id={cls.owner.pk}'
+
+    def put(self, url, data, **kwargs):
+        return self.client.put(url, data, headers={'Authorization': f'Bearer {self.owner_token}'}, **kwargs)
+
+    def test_create_near_a_stored_building_conflicts(self):
+        response = self.put(reverse('api-building_list_create'), {'user_id': self.owner.pk, 'building': '-1.29215, 36.82195'})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['error'], 'building is within 25 m of existing buildings')
+        candidate = response.json()['candidates'][0]
+        self.assertEqual(candidate['id'], self.stored.pk)
+        self.assertLess(candidate['properties']['distance'], 25)
+        self.assertEqual(Building.objects.count(), 1)
+
+    def test_create_away_from_stored_buildings_or_with_duplicates_allowed(self):
+        response = self.put(reverse('api-building_list_create'), {'user_id': self.owner.pk, 'building': '-1.2930, 36.8219'})
+        self.assertEqual(response.status_code, 201)
+        response = self.put(reverse('api-building_list_create') + '?allow_duplicates=true', {'user_id': self.owner.pk, 'building': '-1.2921, 36.8219'})
+        self.assertEqual(response.status_code, 201)
+
+    @override_settings(BUILDING_DUPLICATE_RADIUS=0)
+    def test_zero_radius_turns_the_check_off(self):
+        response = self.put(reverse('api-building_list_create'), {'user_id': self.owner.pk, 'building': '-1.2921, 36.8219'})
+        self.assertEqual(response.status_code, 201)
+
+    def test_bulk_create_reports_stored_and_upload_duplicates(self):
+        rows = [
+            {'building': '-1.2921, 36.82191'},
+            {'building': 'x'},
+            {'building': '-1.5, 36.9'},
+            {'building': '-1.50001, 36.9'},
+        ]
+        response = self.put(self.bulk_url, rows, format='json')
+        self.assertEqual(response.status_code, 409)
+        duplicates = response.json()['duplicates']
+        self.assertEqual([x['row'] for x in duplicates], [0, 3])
+        self.assertEqual(duplicates[0]['candidates'][0]['id'], self.stored.pk)
+        self.assertEqual(duplicates[1]['candidates'][0]['row'], 2)
+        self.assertEqual(response.json()['errors'][0]['row'], 1)
+        self.assertEqual(Building.objects.count(), 1)
+        response = self.put(self.bulk_url + '&allow_duplicates=true', rows, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()['created']), 3)
+
+    def test_bulk_duplicates_are_joined_in_batches(self):
+        points = [Point(36.8219, -1.2921 - i / 1000) for i in range(3)]
+        # one spatial join on PostGIS, one query per point on the other spatial backends
+        with self.assertNumQueries(1 if connection.ops.postgis else len(points)):
+            duplicates = bulk_duplicates(points, [0, 1, 2], 25)
+        self.assertEqual(duplicates, [{'row': 0, 'candidates': [{'id': self.stored.pk, 'distance': 0.0}]}])
+
+    def test_dedupe_report(self):
+        near = Building.objects.create(building=Point(36.82191, -1.2921))
+        Building.objects.create(building=Point(36.9, -1.5))
+        out = StringIO()
+        call_command('dedupe_report', '--chunk-size', '1', stdout=out, stderr=StringIO())
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], 'building,duplicate,distance')
+        self.assertEqual([line.split(',')[:2] for line in lines[1:]], [[str(self.stored.pk), str(near.pk)]])
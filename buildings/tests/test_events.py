@@ -0,0 +1,104 @@
+import asyncio
+import json
+from unittest import mock
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import Point
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from announcements.models import Notice
+from buildings.events import Broadcaster, broadcaster, format_event
+from buildings.models import Building
+from users.models import Profile
+
+
+class BroadcasterTestCase(TestCase):
+
+    def test_publish_reaches_matching_subscriptions(self):
+        async def run():
+            hub = Broadcaster()
+            by_building = hub.subscribe(building_ids=[1])
+            by_bbox = hub.subscribe(bbox=(36.0, -2.0, 37.0, -1.0))
+            hub.publish({'type': 'occupancy', 'building': 2, 'lon': 36.8, 'lat': -1.3, 'occupancy': True})
+            hub.publish({'type': 'notice', 'building': 1, 'notice': {}})
+            hub.publish({'type': 'occupancy', 'building': 3, 'lon': 10.0, 'lat': 10.0, 'occupancy': False})
+            await asyncio.sleep(0)
+            return [x['building'] for x in by_building.queue._queue], [x['building'] for x in by_bbox.queue._queue]
+        self.assertEqual(asyncio.run(run()), ([1], [2]))
+
+    def test_full_queue_marks_overflow(self):
+        async def run():
+            hub = Broadcaster()
+            subscription = hub.subscribe(building_ids=[1])
+            for _ in range(subscription.queue.maxsize + 1):
+                hub.publish({'type': 'notice', 'building': 1, 'notice': {}})
+            await asyncio.sleep(0)
+            return subscription.overflowed
+        self.assertTrue(asyncio.run(run()))
+
+    def test_format_event(self):
+        self.assertEqual(format_event({'type': 'notice', 'building': 1}), 'event: notice\ndata: {"type":"notice","building":1}\n\n')
+
+
+class BuildingEventsTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', password='Yyugbcdasdd@134')
+        cls.other = User.objects.create_user(username='other', password='Yyugbcdasdd@134')
+        cls.building = Building.objects.create(building=Point(36.82, -1.29))
+        cls.unlinked = Building.objects.create(building=Point(36.83, -1.29))
+        Profile.objects.get(user=cls.owner).buildings.add(cls.building, through_defaults={'relationship': 'Owner'})
+        cls.token = APIClient().post(reverse('api-user_login'), {'username': 'owner', 'password': 'Yyugbcdasdd@134'}).json()['access']
+        cls.events_url = reverse('api-building_events')
+
+    def test_occupancy_change_is_published_after_commit(self):
+        with mock.patch.object(broadcaster, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.building.occupancy = not self.building.occupancy
+                self.building.save()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.building.rent = 12000
+                self.building.save()
+        publish.assert_called_once()
+        self.assertEqual(publish.call_args.args[0]['building'], self.building.pk)
+        self.assertEqual(publish.call_args.args[0]['occupancy'], self.building.occupancy)
+
+    def test_new_notice_is_published_after_commit(self):
+        with mock.patch.object(broadcaster, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                notice = Notice.objects.create(owner=self.owner, building=self.building, notice='water off')
+        event = publish.call_args.args[0]
+        self.assertEqual((event['type'], event['building'], event['notice']['pk']), ('notice', self.building.pk, notice.pk))
+
+    async def test_stream_delivers_events_of_linked_buildings(self):
+        response = await self.async_client.get(self.events_url, headers={'Authorization': f'Bearer {self.token}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+        self.assertTrue((await anext(stream)).startswith(b'retry:'))
+        pending = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        broadcaster.publish({'type': 'occupancy', 'building': self.building.pk, 'lon': 36.82, 'lat': -1.29, 'occupancy': True})
+        chunk = (await pending).decode()
+        await stream.aclose()
+        self.assertTrue(chunk.startswith('event: occupancy\n'))
+        self.assertEqual(json.loads(chunk.split('data: ')[1])['building'], self.building.pk)
+
+    async def test_stream_accepts_token_query_parameter(self):
+        response = await self.async_client.get(self.events_url, {'token': self.token, 'bbox': '36.0,-2.0,37.0,-1.0'})
+        self.assertEqual(response.status_code, 200)
+        await response.streaming_content.aclose()
+
+    async def test_stream_requires_authentication(self):
+        response = await self.async_client.get(self.events_url)
+        self.assertEqual(response.status_code, 401)
+
+    async def test_stream_rejects_unlinked_buildings(self):
+        response = await self.async_client.get(self.events_url, {'buildings': str(self.unlinked.pk)}, headers={'Authorization': f'Bearer {self.token}'})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()['error'], 'user profile not linked to building')
+
+    def test_stream_needs_asgi(self):
+        response = self.client.get(self.events_url, headers={'Authorization': f'Bearer {self.token}'})
+        self.assertEqual(response.status_code, 501)
@@ -0,0 +1,80 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import Point
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APIClient, APITestCase
+from announcements.models import Notice
+from buildings.models import Building
+from RentalsManagement import exports
+
+
+class TestExports(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin_user', password='Yyugbcdasdd@134')
+        cls.owner = User.objects.create_user(username='owner', password='Yyugbcdasdd@134')
+        cls.admin_token = APIClient().post(reverse('api-user_login'), {'username': 'admin_user', 'password': 'Yyugbcdasdd@134'}).json()['access']
+        cls.owner_token = APIClient().post(reverse('api-user_login'), {'username': 'owner', 'password': 'Yyugbcdasdd@134'}).json()['access']
+        cls.buildings = [Building.objects.create(building=Point(36.8 + i / 100, -1.29), rent=1000 + i, county='Nairobi') for i in range(5)]
+        cls.owner.profile.buildings.add(cls.buildings[0], through_defaults={'relationship': 'owner'})
+        Notice.objects.create(owner=cls.owner, building=cls.buildings[0], notice='water outage')
+
+    def export(self, name, export_format, **params):
+        url = reverse('api-export_data', kwargs={'name': name, 'export_format': export_format})
+        response = self.client.get(url, data=params, headers={'Authorization': f'Bearer {self.admin_token}'})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_export_buildings_csv(self):
+        response = self.export('buildings', 'csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="buildings.csv"')
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([int(x['id']) for x in rows], [x.pk for x in self.buildings])
+        self.assertEqual(rows[1]['rent'], '1001.00')
+        self.assertAlmostEqual(float(rows[1]['lon']), 36.81)
+
+    def test_export_user_buildings_ndjson_gzip(self):
+        response = self.export('user_buildings', 'ndjson', gzip='true')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEqual([json.loads(x) for x in lines], [{
+            'id': self.owner.profile.userbuilding_set.get().pk,
+            'profile_id': self.owner.profile.pk,
+            'profile__user__username': 'owner',
+            'building_id': self.buildings[0].pk,
+            'relationship': 'owner',
+        }])
+
+    def test_export_is_streamed_in_chunks(self):
+        columns, rows = exports.export_rows('buildings', chunk_size=2)
+        chunks = list(exports.csv_chunks(columns, rows))
+        self.assertEqual(''.join(chunks).count('\n'), 6)
+
+    def test_export_requires_admin(self):
+        url = reverse('api-export_data', kwargs={'name': 'notices', 'export_format': 'csv'})
+        response = self.client.get(url, headers={'Authorization': f'Bearer {self.owner_token}'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_export_unknown_name_or_format(self):
+        url = reverse('api-export_data', kwargs={'name': 'payments', 'export_format': 'csv'})
+        response = self.client.get(url, headers={'Authorization': f'Bearer {self.admin_token}'})
+        self.assertEqual(response.status_code, 404)
+        url = reverse('api-export_data', kwargs={'name': 'notices', 'export_format': 'xml'})
+        response = self.client.get(url, headers={'Authorization': f'Bearer {self.admin_token}'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_export_data_command(self):
+        out = io.StringIO()
+        call_command('export_data', 'notices', '--format', 'ndjson', stdout=out)
+        self.assertEqual(json.loads(out.getvalue())['notice'], 'water outage')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'profiles.csv.gz')
+            call_command('export_data', 'profiles', '--gzip', '--output', path, stderr=io.StringIO())
+            with gzip.open(path, 'rt') as f:
+                self.assertEqual(next(csv.reader(f)), ['id', 'user_id', 'user__username', 'user__email', 'phone', 'address'])
@@ -0,0 +1,92 @@
+import base64
+import io
+import numpy as np
+from PIL import Image
+from rest_framework.test import APITestCase
+from django.contrib.gis.geos import Point
+from django.test import SimpleTestCase
+from django.urls import reverse
+from buildings.heatmap import bin_grid, gaussian_blur, grid_shape, heatmap_png
+from buildings.models import Building
+
+
+class HeatmapGridTestCase(SimpleTestCase):
+    extent = (0.0, 0.0, 4.0, 2.0)
+
+    def test_grid_shape_follows_the_bbox(self):
+        self.assertEqual(grid_shape(self.extent, 4), (2, 4))
+        self.assertEqual(grid_shape((0.0, 0.0, 4.0, 0.01), 4), (1, 4))
+
+    def test_bin_grid_averages_per_cell_north_row_first(self):
+        lon = np.array([0.5, 0.6, 3.5, 4.0, 9.0])
+        lat = np.array([0.5, 0.4, 1.5, 2.0, 1.0])
+        rent = np.array([1000.0, 3000.0, 500.0, 700.0, 99.0])
+        means, counts = bin_grid(lon, lat, rent, self.extent, (2, 4))
+        self.assertEqual(counts.tolist(), [[0, 0, 0, 2], [2, 0, 0, 0]])
+        self.assertEqual(means[1, 0], 2000.0)
+        self.assertEqual(means[0, 3], 600.0)
+        self.assertTrue(np.isnan(means[0, 0]))
+
+    def test_smoothing_keeps_a_weighted_average(self):
+        grid = np.zeros((9, 9))
+        grid[4, 4] = 1
+        blurred = gaussian_blur(grid, 1.0)
+        self.assertAlmostEqual(blurred.sum(), 1.0)
+        self.assertEqual(np.unravel_index(blurred.argmax(), blurred.shape), (4, 4))
+        means, _ = bin_grid(np.array([0.5, 3.5]), np.array([0.5, 0.5]), np.array([100.0, 100.0]), self.extent, (2, 4), smooth=1.0)
+        self.assertTrue(np.allclose(means[np.isfinite(means)], 100.0))
+
+    def test_png_is_transparent_where_empty(self):
+        means = np.array([[np.nan, 1.0], [2.0, 3.0]])
+        image = Image.open(io.BytesIO(heatmap_png(means)))
+        self.assertEqual((image.mode, image.size), ('RGBA', (2, 2)))
+        self.assertEqual(image.getpixel((0, 0))[3], 0)
+        self.assertNotEqual(image.getpixel((0, 1))[:3], image.getpixel((1, 1))[:3])
+
+
+class TestBuildingHeatmap(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.heatmap_url = reverse('api-building_heatmap')
+        Building.objects.create(building=Point(36.815, -1.295), rent=30000)
+        Building.objects.create(building=Point(36.8155, -1.2955), rent=10000, occupancy=True)
+        Building.objects.create(building=Point(36.895, -1.205), rent=50000)
+        Building.objects.create(building=Point(39.66, -4.04), rent=90000)
+
+    def test_rent_heatmap(self):
+        response = self.client.get(self.heatmap_url, data={'bbox': '36.8,-1.3,36.9,-1.2', 'res': 10})
+        self.assertEqual(response.status_code, 200)
+        heatmap = response.json()
+        self.assertEqual((heatmap['rows'], heatmap['columns'], heatmap['count']), (10, 10, 3))
+        self.assertEqual((heatmap['min'], heatmap['max']), (20000.0, 50000.0))
+        values = np.frombuffer(base64.b64decode(heatmap['values']), dtype='<f4').reshape(10, 10)
+        self.assertEqual(values[9, 1], 20000.0)
+        self.assertEqual(values[0, 9], 50000.0)
+
+    def test_vacancy_heatmap_as_png(self):
+        response = self.client.get(self.heatmap_url, data={'bbox': '36.8,-1.3,36.9,-1.2', 'res': 10, 'metric': 'vacancy', 'output': 'png'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(Image.open(io.BytesIO(response.content)).size, (10, 10))
+
+    def test_heatmap_is_cached_until_a_building_changes(self):
+        params = {'bbox': '36.8,-1.3,36.9,-1.2', 'res': 10}
+        first = self.client.get(self.heatmap_url, data=params)
+        with self.assertNumQueries(1):
+            self.client.get(self.heatmap_url, data=params)
+        self.assertEqual(self.client.get(self.heatmap_url, data=params, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        Building.objects.create(building=Point(36.85, -1.25), rent=40000)
+        self.assertEqual(self.client.get(self.heatmap_url, data=params).json()['count'], 4)
+
+    def test_invalid_parameters(self):
+        response = self.client.get(self.heatmap_url, data={'res': 10})
+        self.assertEqual(response.json()['error'], 'bbox query parameter is required')
+        for params, error in [
+            ({'res': 0}, 'res must be an integer between 1 and 1024'),
+            ({'metric': 'price'}, 'metric must be one of rent, vacancy'),
+            ({'smooth': -1}, 'smooth must be a number between 0 and 10'),
+            ({'output': 'tiff'}, 'output must be one of array, png'),
+        ]:
+            response = self.client.get(self.heatmap_url, data={'bbox': '36.8,-1.3,36.9,-1.2', **params})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()['error'], error)
@@ -0,0 +1,60 @@
+import json
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from buildings.ingest import open_layer, write_checkpoint
+from buildings.models import Building
+
+
+def web_mercator_feature(x, y, **properties):
+    return {'type': 'Feature', 'properties': properties, 'geometry': {'type': 'Point', 'coordinates': [x, y]}}
+
+
+class TestImportBuildings(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(open_layer.cache_clear)
+        self.path = os.path.join(directory.name, 'buildings.geojson')
+        features = [web_mercator_feature(4098000 + i * 100, -144000, COUNTY='Nairobi', Rent=str(1000 + i), occupancy='yes' if i % 2 else 'no') for i in range(6)]
+        features[3]['properties']['Rent'] = 'unknown'
+        features.append({'type': 'Feature', 'properties': {'COUNTY': 'Kisumu', 'Rent': 500},
+                         'geometry': {'type': 'Polygon', 'coordinates': [[[0, 0], [200, 0], [200, 200], [0, 200], [0, 0]]]}})
+        with open(self.path, 'w') as f:
+            json.dump({'type': 'FeatureCollection', 'crs': {'type': 'name', 'properties': {'name': 'urn:ogc:def:crs:EPSG::3857'}}, 'features': features}, f)
+
+    def import_buildings(self, *args):
+        out = StringIO()
+        call_command('import_buildings', self.path, '--batch-size', '2', *args, stdout=out)
+        return out.getvalue()
+
+    def test_import_reprojects_and_maps_attributes(self):
+        out = self.import_buildings()
+        self.assertIn('imported 6 buildings', out)
+        self.assertIn('1 features skipped', out)
+        building = Building.objects.get(rent=Decimal('1001.00'))
+        self.assertEqual(building.county, 'Nairobi')
+        self.assertTrue(building.occupancy)
+        self.assertAlmostEqual(building.building.x, 36.8139, places=4)
+        self.assertAlmostEqual(building.building.y, -1.2935, places=4)
+        self.assertAlmostEqual(Building.objects.get(county='Kisumu').building.x, 0.0009, places=4)
+        self.assertFalse(os.path.exists(f'{self.path}.checkpoint'))
+
+    def test_import_resumes_from_checkpoint(self):
+        write_checkpoint(f'{self.path}.checkpoint', path=self.path, layer=0, next_fid=4, seen=4, imported=3, skipped=1)
+        out = self.import_buildings('--resume')
+        self.assertIn('resuming at feature 4', out)
+        self.assertEqual(Building.objects.count(), 3)
+        self.assertIn('imported 6 buildings', out)
+
+    def test_import_with_field_mapping(self):
+        self.import_buildings('--map', 'district=COUNTY')
+        self.assertEqual(Building.objects.filter(district='Nairobi').count(), 5)
+
+    def test_import_unknown_mapped_field(self):
+        with self.assertRaisesMessage(CommandError, 'field RENT_KES does not exist'):
+            self.import_buildings('--map', 'rent=RENT_KES')
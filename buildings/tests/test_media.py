@@ -0,0 +1,211 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import Point
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient, APITestCase
+from buildings.models import Building, BuildingMedia
+from buildings.thumbnails import render_thumbnail
+
+
+def png_bytes(size=(1200, 800), color='teal'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class RenderThumbnailTestCase(SimpleTestCase):
+
+    def test_image_thumbnail_fits_the_box(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'photo.png')
+            with open(source, 'wb') as f:
+                f.write(png_bytes())
+            target = render_thumbnail(source, os.path.join(directory, 'thumbs', 'photo.jpg'), 'image', (320, 320))
+            with Image.open(target) as thumbnail:
+                self.assertEqual((thumbnail.format, thumbnail.size), ('JPEG', (320, 213)))
+            self.assertEqual(os.listdir(os.path.dirname(target)), ['photo.jpg'])
+
+
+class TestBuildingMedia(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', password='Yyugbcdasdd@134')
+        cls.tenant = User.objects.create_user(username='tenant', password='Yyugbcdasdd@134')
+        cls.building = Building.objects.create(building=Point(36.82, -1.29), county='Nairobi')
+        cls.other_building = Building.objects.create(building=Point(36.83, -1.29), county='Nairobi')
+        cls.owner.profile.buildings.add(cls.building, cls.other_building, through_defaults={'relationship': 'owner'})
+        cls.tenant.profile.buildings.add(cls.building, through_defaults={'relationship': 'tenant'})
+        cls.owner_token = APIClient().post(reverse('api-user_login'), {'username': 'owner', 'password': 'Yyugbcdasdd@134'}).json()['access']
+        cls.tenant_token = APIClient().post(reverse('api-user_login'), {'username': 'tenant', 'password': 'Yyugbcdasdd@134'}).json()['access']
+        cls.photo = png_bytes()
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(MEDIA_ROOT=self.media_root, MEDIA_THUMBNAIL_WORKERS=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.owner_token}')
+
+    def start_upload(self, building, content=None):
+        content = self.photo if content is None else content
+        url = reverse('api-building_media_list_create', args=[building.pk])
+        return self.client.post(url, {'filename': 'front.png', 'content_type': 'image/png', 'size': len(content)}, format='json')
+
+    def send_chunk(self, upload_url, offset, chunk):
+        return self.client.patch(upload_url, chunk, content_type='application/offset+octet-stream', headers={'Upload-Offset': str(offset)})
+
+    def upload(self, building, content=None):
+        content = self.photo if content is None else content
+        upload_url = self.start_upload(building, content).json()['upload_url']
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.send_chunk(upload_url, 0, content)
+        return BuildingMedia.objects.get(pk=response.json()['id'])
+
+    def test_chunked_upload_resumes_from_offset(self):
+        response = self.start_upload(self.building)
+        self.assertEqual(response.status_code, 201)
+        upload_url = response['Location']
+        half = len(self.photo) // 2
+        response = self.send_chunk(upload_url, 0, self.photo[:half])
+        self.assertEqual((response.status_code, response.json()['offset']), (200, half))
+        self.assertEqual(self.client.get(upload_url)['Upload-Offset'], str(half))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.send_chunk(upload_url, half, self.photo[half:])
+        self.assertEqual(response.status_code, 201)
+        media = BuildingMedia.objects.get(pk=response.json()['id'])
+        self.assertEqual((media.kind, media.size, media.status), ('image', len(self.photo), 'ready'))
+        with open(media.file.path, 'rb') as f:
+            self.assertEqual(f.read(), self.photo)
+        with Image.open(media.thumbnail.path) as thumbnail:
+            self.assertLessEqual(max(thumbnail.size), 320)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'uploads')), [])
+
+    def test_chunk_at_wrong_offset_conflicts(self):
+        upload_url = self.start_upload(self.building).json()['upload_url']
+        self.send_chunk(upload_url, 0, self.photo[:100])
+        response = self.send_chunk(upload_url, 0, self.photo[:100])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 100)
+
+    def test_identical_files_are_stored_once(self):
+        first = self.upload(self.building)
+        with mock.patch('buildings.media.render_thumbnail') as render:
+            second = self.upload(self.other_building)
+        render.assert_not_called()
+        self.assertEqual((second.file.name, second.thumbnail.name, second.status), (first.file.name, first.thumbnail.name, 'ready'))
+        self.assertEqual(os.listdir(os.path.dirname(first.file.path)), [os.path.basename(first.file.name)])
+
+    def test_geojson_lists_only_the_thumbnail(self):
+        media = self.upload(self.building)
+        features = self.client.get(reverse('api-building_list_create')).json()['features']
+        properties = {int(x['properties']['pk']): x['properties'] for x in features}
+        self.assertEqual(properties[self.building.pk]['thumbnail'], media.thumbnail.url)
+        self.assertIsNone(properties[self.other_building.pk]['thumbnail'])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('api-building_list_create'))
+        self.assertFalse(any('building_media' in query['sql'] for query in queries))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('api-building_media_delete', args=[self.building.pk, media.pk]))
+        self.building.refresh_from_db()
+        self.assertIsNone(self.building.thumbnail)
+
+    def test_failed_thumbnail_is_marked(self):
+        self.assertEqual(self.upload(self.building, b'not an image').status, 'failed')
+
+    def test_tenant_cannot_upload(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.tenant_token}')
+        response = self.start_upload(self.building)
+        self.assertEqual(response.status_code, 403)
+
+    def test_unsupported_content_type(self):
+        url = reverse('api-building_media_list_create', args=[self.building.pk])
+        response = self.client.post(url, {'filename': 'plan.pdf', 'content_type': 'application/pdf', 'size': 10}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_deleting_last_reference_removes_files(self):
+        media = self.upload(self.building)
+        self.upload(self.other_building)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('api-building_media_delete', args=[self.building.pk, media.pk]))
+        self.assertTrue(os.path.exists(media.file.path))
+        with self.captureOnCommitCallbacks(execute=True):
+            BuildingMedia.objects.filter(building=self.other_building).delete()
+        self.assertFalse(os.path.exists(media.file.path))
+        self.assertFalse(os.path.exists(media.thumbnail.path))
+
+
+class TestMediaFile(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.building = Building.objects.create(building=Point(36.82, -1.29))
+        cls.video = bytes(range(256)) * 40
+        cls.media = BuildingMedia.objects.create(
+            building=cls.building, kind='video', content_type='video/mp4', size=len(cls.video), sha256='ab' * 32, file='buildings/ab/walkthrough.mp4')
+        cls.url = reverse('api-building_media_file', args=[cls.building.pk, cls.media.pk])
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        os.makedirs(os.path.join(self.media_root, 'buildings', 'ab'))
+        with open(os.path.join(self.media_root, self.media.file.name), 'wb') as f:
+            f.write(self.video)
+
+    def test_whole_file(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response['Content-Type'], response['Accept-Ranges'], response['ETag']), ('video/mp4', 'bytes', f'"{"ab" * 32}"'))
+        self.assertEqual(b''.join(response.streaming_content), self.video)
+
+    def test_byte_range(self):
+        response = self.client.get(self.url, headers={'Range': 'bytes=1000-1999'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 1000-1999/{len(self.video)}')
+        self.assertEqual(response['Content-Length'], '1000')
+        self.assertEqual(b''.join(response.streaming_content), self.video[1000:2000])
+
+    def test_suffix_range(self):
+        response = self.client.get(self.url, headers={'Range': 'bytes=-100'})
+        self.assertEqual(b''.join(response.streaming_content), self.video[-100:])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, headers={'Range': f'bytes={len(self.video)}-'})
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.video)}')
+
+    def test_stale_if_range_sends_whole_file(self):
+        response = self.client.get(self.url, headers={'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_not_modified(self):
+        response = self.client.get(self.url, headers={'If-None-Match': f'"{"ab" * 32}"'})
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(MEDIA_SENDFILE='x-accel-redirect')
+    def test_accel_redirect(self):
+        response = self.client.get(self.url, headers={'Range': 'bytes=0-9'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/buildings/ab/walkthrough.mp4')
+        self.assertEqual(response.content, b'')
+
+    @override_settings(MEDIA_SENDFILE='x-sendfile')
+    def test_sendfile(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], os.path.join(self.media_root, 'buildings', 'ab', 'walkthrough.mp4'))
+
+    def test_missing_file(self):
+        os.remove(os.path.join(self.media_root, self.media.file.name))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
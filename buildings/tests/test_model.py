@@ -1,6 +1,10 @@
+from unittest import mock
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from buildings.models import Building
 from users.models import Profile, UserBuilding
+from announcements.models import Notice
 from django.contrib.auth.models import User
 from django.contrib.gis.geos import Point
 
@@ -59,4 +63,52 @@ class UserBuildingTestCase(TestCase):
         self.assertEqual(self.building1.created_at, created_at)
         self.assertGreater(self.building1.updated_at, last_update)
         
-        
\ No newline at end of file
+        
+
+class OrphanCleanupTestCase(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create(username='landlord', password='landlord@123')
+        self.tenant = User.objects.create(username='tenant', password='tenant@123')
+
+    def add_buildings(self, n):
+        buildings = Building.objects.bulk_create([Building(building=Point(34.5 + i / 1000, -4.0)) for i in range(n)])
+        UserBuilding.objects.bulk_create([UserBuilding(profile=self.owner.profile, building=x, relationship='owner') for x in buildings])
+        return buildings
+
+    def delete_profile_queries(self):
+        profile = Profile.objects.get(user=self.owner)
+        with CaptureQueriesContext(connection) as queries:
+            profile.delete()
+        return len(queries)
+
+    def test_orphan_cleanup_query_count_does_not_grow_with_buildings(self):
+        self.add_buildings(2)
+        few = self.delete_profile_queries()
+        self.owner.profile = Profile.objects.create(user=self.owner)
+        self.add_buildings(40)
+        self.assertEqual(self.delete_profile_queries(), few)
+        self.assertFalse(Building.objects.exists())
+
+    def test_orphan_cleanup_invalidates_tiles_once(self):
+        buildings = self.add_buildings(40)
+        with mock.patch('buildings.cache.invalidate_tiles') as invalidate:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.owner.profile.delete()
+        invalidate.assert_called_once()
+        self.assertEqual(invalidate.call_args.args, tuple(x.building for x in buildings))
+
+    def test_orphan_cleanup_keeps_shared_and_unlinked_buildings(self):
+        shared, orphan = self.add_buildings(2)
+        self.tenant.profile.buildings.add(shared, through_defaults={'relationship': 'tenant'})
+        unlinked = Building.objects.create(building=Point(36.8, -1.3))
+        self.owner.profile.delete()
+        self.assertEqual(set(Building.objects.values_list('pk', flat=True)), {shared.pk, unlinked.pk})
+
+    def test_orphan_cleanup_keeps_buildings_with_notices(self):
+        noticed, orphan, other = self.add_buildings(3)
+        Notice.objects.create(owner=self.tenant, building=noticed, notice='water is off on Saturday')
+        with self.assertLogs('buildings.signals', 'WARNING') as logs:
+            self.owner.profile.delete()
+        self.assertEqual(list(Building.objects.values_list('pk', flat=True)), [noticed.pk])
+        self.assertIn(str([noticed.pk]), logs.output[0])
@@ -0,0 +1,48 @@
+from unittest import skipUnless
+from django.test import TestCase
+from django.db.models import Value
+from django.db import connection
+from django.contrib.gis.geos import Point
+from buildings.filters import filter_buildings
+from buildings.functions import SearchDocument, WordSimilar
+from buildings.search import SEARCH_FIELDS
+from buildings.models import Building
+
+
+class TestBuildingQueryPlans(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        counties = ['Nairobi', 'Mombasa', 'Kisumu', 'Nakuru']
+        Building.objects.bulk_create([
+            Building(
+                building=Point(36.8 + i / 1000, -1.29),
+                county=counties[i % 4],
+                district=f'district {i % 10}',
+                rent=5000 + 250 * i,
+                occupancy=i % 3 != 0)
+            for i in range(200)])
+
+    def explain(self, params):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return filter_buildings(Building.objects.all(), params).explain()
+
+    def test_vacancy_search_by_county_and_rent_uses_partial_index(self):
+        plan = self.explain({'occupancy': 'false', 'county': 'Nairobi', 'min_rent': '10000', 'max_rent': '30000'})
+        self.assertIn('building_vacant_county_idx', plan)
+
+    def test_vacancy_search_by_rent_uses_partial_index(self):
+        plan = self.explain({'occupancy': 'false', 'max_rent': '20000'})
+        self.assertIn('building_vacant_rent_idx', plan)
+
+    def test_county_and_district_search_uses_composite_index(self):
+        plan = self.explain({'county': 'Kisumu', 'district': 'district 2'})
+        self.assertIn('building_county_district_idx', plan)
+
+    @skipUnless(connection.vendor == 'postgresql', 'trigram index is PostgreSQL only')
+    def test_fuzzy_search_uses_trigram_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = Building.objects.filter(WordSimilar(Value('nairbi'), SearchDocument(*SEARCH_FIELDS))).explain()
+        self.assertIn('building_search_trgm_idx', plan)
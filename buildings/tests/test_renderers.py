@@ -0,0 +1,48 @@
+import datetime
+import json
+from decimal import Decimal
+from io import BytesIO
+from unittest import skipIf
+from django.contrib.gis.geos import MultiPolygon, Point, Polygon
+from django.test import SimpleTestCase
+from rest_framework.exceptions import ParseError
+from RentalsManagement import renderers
+from RentalsManagement.renderers import FastJSONParser, FastJSONRenderer
+
+
+class FastJSONTestCase(SimpleTestCase):
+    data = {
+        'rent': Decimal('15000.50'),
+        'created_at': datetime.datetime(2024, 5, 1, 8, 30, 0, 123456, tzinfo=datetime.timezone.utc),
+        'day': datetime.date(2024, 5, 1),
+        'building': Point(36.82, -1.29, srid=4326),
+        'area': MultiPolygon(Polygon.from_bbox((0, 0, 1, 1))),
+        'county': 'Murang’a',
+        1: None,
+    }
+    expected = {
+        'rent': '15000.50',
+        'created_at': '2024-05-01T08:30:00.123456Z',
+        'day': '2024-05-01',
+        'building': {'type': 'Point', 'coordinates': [36.82, -1.29]},
+        'area': {'type': 'MultiPolygon', 'coordinates': [[[[0.0, 0.0], [0.0, 1.0], [1.0, 1.0], [1.0, 0.0], [0.0, 0.0]]]]},
+        'county': 'Murang’a',
+        '1': None,
+    }
+
+    def test_stdlib_encoding(self):
+        self.assertEqual(json.loads(renderers.stdlib_dumps(self.data)), self.expected)
+
+    @skipIf(renderers.orjson is None, 'orjson is not installed')
+    def test_orjson_matches_stdlib(self):
+        self.assertEqual(renderers.orjson_dumps(self.data), renderers.stdlib_dumps(self.data))
+
+    def test_renderer_indents_for_the_browsable_api(self):
+        self.assertEqual(FastJSONRenderer().render({'a': 1}), b'{"a":1}')
+        self.assertEqual(FastJSONRenderer().render({'a': 1}, 'application/json; indent=2'), b'{\n  "a": 1\n}')
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_parser(self):
+        self.assertEqual(FastJSONParser().parse(BytesIO(b'{"rent": 800, "county": "Nairobi"}')), {'rent': 800, 'county': 'Nairobi'})
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(BytesIO(b'{"rent": }'))
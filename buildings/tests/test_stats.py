@@ -0,0 +1,96 @@
+from io import StringIO
+from decimal import Decimal
+from django.contrib.gis.geos import Point
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from buildings.models import Building, BuildingRentRollup
+from buildings.stats import rent_statistics
+
+
+class TestRentStatistics(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.stats_url = reverse('api-building_stats')
+
+    def setUp(self):
+        self.buildings = [
+            Building.objects.create(building=Point(36.82, -1.29), county='Nairobi', district='Westlands', rent=10000, occupancy=True),
+            Building.objects.create(building=Point(36.83, -1.29), county='Nairobi', district='Westlands', rent=20000),
+            Building.objects.create(building=Point(36.84, -1.29), county='Nairobi', district='Kibra', rent=30000, occupancy=True),
+            Building.objects.create(building=Point(36.85, -1.29), county='Nairobi', district='Kibra'),
+            Building.objects.create(building=Point(39.66, -4.04), county='Mombasa', rent=50000),
+        ]
+
+    def stats(self, group_by='county'):
+        return {tuple(x.get(field) for field in ('county', 'district') if field in x): x for x in rent_statistics(group_by)}
+
+    def test_stats_by_county(self):
+        response = self.client.get(self.stats_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['group_by'], 'county')
+        nairobi = self.stats()[('Nairobi',)]
+        self.assertEqual(nairobi['buildings'], 4)
+        self.assertEqual(nairobi['occupied'], 2)
+        self.assertEqual(nairobi['occupancy_rate'], 0.5)
+        self.assertEqual(nairobi['buildings_with_rent'], 3)
+        self.assertEqual(nairobi['avg_rent'], Decimal('20000.00'))
+        self.assertAlmostEqual(float(nairobi['median_rent']), 20000, delta=500)
+        self.assertEqual(self.stats()[('Mombasa',)]['buildings'], 1)
+
+    def test_stats_by_district(self):
+        stats = self.stats('district')
+        self.assertEqual(stats[('Nairobi', 'Kibra')]['buildings'], 2)
+        self.assertEqual(stats[('Nairobi', 'Kibra')]['avg_rent'], Decimal('30000.00'))
+        self.assertIsNone(stats[('Mombasa', None)]['district'])
+
+    def test_stats_follow_updates_and_deletes(self):
+        building = self.buildings[1]
+        building.rent = 40000
+        building.occupancy = True
+        building.save()
+        self.buildings[0].delete()
+        nairobi = self.stats()[('Nairobi',)]
+        self.assertEqual(nairobi['buildings'], 3)
+        self.assertEqual(nairobi['occupied'], 2)
+        self.assertEqual(nairobi['avg_rent'], Decimal('35000.00'))
+
+    def test_removing_uncounted_building_rebuilds_instead_of_going_negative(self):
+        uncounted, = Building.objects.bulk_create([Building(building=Point(34.76, -0.1), county='Kisumu', rent=8000, occupancy=True)])
+        with self.assertLogs('buildings.stats', 'WARNING'), self.captureOnCommitCallbacks(execute=True):
+            Building.objects.get(pk=uncounted.pk).delete()
+        self.assertFalse(BuildingRentRollup.objects.filter(buildings__lt=0).exists())
+        self.assertNotIn(('Kisumu',), self.stats())
+        self.assertEqual(self.stats()[('Nairobi',)]['buildings'], 4)
+
+    def test_removing_uncounted_building_from_an_existing_row_rebuilds(self):
+        Building.objects.create(building=Point(34.75, -0.1), county='Kisumu', rent=8000)
+        uncounted, = Building.objects.bulk_create([Building(building=Point(34.76, -0.1), county='Kisumu', rent=8100, occupancy=True)])
+        with self.assertLogs('buildings.stats', 'WARNING'), self.captureOnCommitCallbacks(execute=True):
+            Building.objects.get(pk=uncounted.pk).delete()
+        self.assertFalse(BuildingRentRollup.objects.filter(occupied__lt=0).exists())
+        kisumu = self.stats()[('Kisumu',)]
+        self.assertEqual((kisumu['buildings'], kisumu['occupied'], kisumu['avg_rent']), (1, 0, Decimal('8000.00')))
+
+    def test_stats_follow_partial_loads(self):
+        building = Building.objects.only('rent').get(pk=self.buildings[4].pk)
+        building.rent = 60000
+        building.save()
+        self.assertEqual(self.stats()[('Mombasa',)]['avg_rent'], Decimal('60000.00'))
+
+    def test_rebuild_matches_incremental_rollup(self):
+        incremental = rent_statistics('district')
+        BuildingRentRollup.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_rent_rollup', stdout=out)
+        self.assertIn('rent rollup rebuilt', out.getvalue())
+        self.assertEqual(rent_statistics('district'), incremental)
+
+    def test_stats_query_count_does_not_grow_with_buildings(self):
+        with self.assertNumQueries(1):
+            self.client.get(self.stats_url, data={'group_by': 'district'})
+
+    def test_stats_invalid_group_by(self):
+        response = self.client.get(self.stats_url, data={'group_by': 'country'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'group_by must be one of county, district')
@@ -0,0 +1,142 @@
+from io import StringIO
+from rest_framework.test import APITestCase
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from django.urls import reverse
+from django.contrib.gis.geos import Point
+from buildings.cache import tile_key, LAYER_VERSION
+from buildings.models import Building
+from buildings.tiles import encode_tile, tile_bounds, tile_for_point, EXTENT
+
+
+def read_varint(data, position):
+    value = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, position
+
+def read_fields(data):
+    """decode one protobuf message into a list of (field number, value) pairs"""
+    fields = []
+    position = 0
+    while position < len(data):
+        key, position = read_varint(data, position)
+        number, wire_type = key >> 3, key & 0x7
+        if wire_type == 0:
+            value, position = read_varint(data, position)
+        elif wire_type == 1:
+            value, position = data[position:position + 8], position + 8
+        else:
+            length, position = read_varint(data, position)
+            value, position = data[position:position + length], position + length
+        fields.append((number, value))
+    return fields
+
+def read_layer(tile):
+    layers = [value for number, value in read_fields(tile) if number == 3]
+    return dict((number, value) for number, value in read_fields(layers[0]) if number in (1, 5)), read_fields(layers[0])
+
+
+class TestTileMath(SimpleTestCase):
+
+    def test_tile_for_point_is_inside_tile_bounds(self):
+        for z in [0, 5, 12, 18]:
+            x, y = tile_for_point(36.8219, -1.2921, z)
+            min_lon, min_lat, max_lon, max_lat = tile_bounds(z, x, y)
+            self.assertTrue(min_lon <= 36.8219 < max_lon)
+            self.assertTrue(min_lat <= -1.2921 < max_lat)
+
+    def test_encode_tile(self):
+        x, y = tile_for_point(36.8219, -1.2921, 12)
+        tile = encode_tile([(1, 36.8219, -1.2921, 45000, True, 'Nairobi', None)], 12, x, y)
+        header, fields = read_layer(tile)
+        self.assertEqual(header[1], b'buildings')
+        self.assertEqual(header[5], EXTENT)
+        features = [value for number, value in fields if number == 2]
+        keys = [value for number, value in fields if number == 3]
+        self.assertEqual(len(features), 1)
+        self.assertEqual(keys, [b'rent', b'occupancy', b'county'])
+        feature = dict(read_fields(features[0]))
+        self.assertEqual(feature[1], 1)
+        self.assertEqual(feature[3], 1)
+
+    def test_encode_empty_tile(self):
+        self.assertEqual(encode_tile([], 0, 0, 0), b'')
+
+
+class TestTileEndpoint(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.building = Building.objects.create(building=Point(36.8219, -1.2921), rent=45000, county='Nairobi')
+
+    def setUp(self):
+        caches['tiles'].clear()
+
+    def cached(self, kind, z, lon, lat):
+        x, y = tile_for_point(lon, lat, z)
+        return caches['tiles'].get(tile_key(kind, z, x, y), version=LAYER_VERSION)
+
+    def test_get_tile_with_building(self):
+        x, y = tile_for_point(36.8219, -1.2921, 14)
+        response = self.client.get(reverse('api-building_tile', args=[14, x, y]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/vnd.mapbox-vector-tile')
+        header, fields = read_layer(response.content)
+        self.assertEqual(header[1], b'buildings')
+        self.assertEqual(len([value for number, value in fields if number == 2]), 1)
+
+    def test_get_empty_tile(self):
+        response = self.client.get(reverse('api-building_tile', args=[14, 0, 0]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+
+    def test_get_tile_out_of_range(self):
+        response = self.client.get(reverse('api-building_tile', args=[2, 4, 0]))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['error'], 'tile 2/4/0 does not exist')
+
+    def test_tile_is_served_from_cache(self):
+        x, y = tile_for_point(36.8219, -1.2921, 14)
+        first = self.client.get(reverse('api-building_tile', args=[14, x, y]))
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('api-building_tile', args=[14, x, y]))
+        self.assertEqual(first.content, second.content)
+
+    def test_moving_a_building_invalidates_old_and_new_tiles_at_every_zoom(self):
+        for z in [0, 9, 14, 22]:
+            for lon, lat in [(36.8219, -1.2921), (39.6680, -4.0430)]:
+                x, y = tile_for_point(lon, lat, z)
+                self.client.get(reverse('api-building_tile', args=[z, x, y]))
+        untouched = tile_for_point(36.8219, -1.2921, 14)
+        untouched = (untouched[0] + 1, untouched[1])
+        self.client.get(reverse('api-building_tile', args=[14, *untouched]))
+        self.building.building = Point(39.6680, -4.0430)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.building.save()
+            self.assertIsNotNone(self.cached('mvt', 14, 36.8219, -1.2921))
+        for z in [0, 9, 14, 22]:
+            self.assertIsNone(self.cached('mvt', z, 36.8219, -1.2921))
+            self.assertIsNone(self.cached('mvt', z, 39.6680, -4.0430))
+        self.assertIsNotNone(caches['tiles'].get(tile_key('mvt', 14, *untouched), version=LAYER_VERSION))
+
+    def test_deleting_a_building_invalidates_its_tiles(self):
+        x, y = tile_for_point(36.8219, -1.2921, 14)
+        self.client.get(reverse('api-building_tile', args=[14, x, y]))
+        self.assertIsNotNone(self.cached('mvt', 14, 36.8219, -1.2921))
+        with self.captureOnCommitCallbacks(execute=True):
+            Building.objects.get(pk=self.building.pk).delete()
+        self.assertIsNone(self.cached('mvt', 14, 36.8219, -1.2921))
+        self.assertEqual(self.client.get(reverse('api-building_tile', args=[14, x, y])).content, b'')
+
+    def test_seed_tiles_command(self):
+        out = StringIO()
+        call_command('seed_tiles', '--max-zoom', '3', stdout=out)
+        self.assertIn('tile cache seeded', out.getvalue())
+        for z in range(4):
+            self.assertTrue(self.cached('mvt', z, 36.8219, -1.2921))
+            self.assertEqual(self.cached('clusters', z, 36.8219, -1.2921)[0]['properties']['count'], 1)
@@ -0,0 +1,42 @@
+"""thumbnail rendering run in worker processes, kept free of Django imports so any start method can load it"""
+import os
+import shutil
+import subprocess
+
+JPEG_QUALITY = 80
+VIDEO_PREVIEW_TIMEOUT = 120
+
+
+def render_image_thumbnail(source, target, size):
+    from PIL import Image, ImageOps
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(size)
+        image.convert('RGB').save(target, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+
+def render_video_preview(source, target, size):
+    """poster frame of a video, picked by the ffmpeg thumbnail filter among the first frames"""
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg is None:
+        raise RuntimeError('ffmpeg is not installed')
+    width, height = size
+    subprocess.run(
+        [ffmpeg, '-v', 'error', '-y', '-i', source, '-frames:v', '1',
+         '-vf', f'thumbnail,scale={width}:{height}:force_original_aspect_ratio=decrease',
+         '-q:v', '4', '-f', 'image2', '-c:v', 'mjpeg', target],
+        check=True, capture_output=True, timeout=VIDEO_PREVIEW_TIMEOUT)
+
+def render_thumbnail(source, target, kind, size):
+    """write a JPEG thumbnail of an image or video to target, atomically so readers never see a partial file"""
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    partial = f'{target}.{os.getpid()}.tmp'
+    try:
+        if kind == 'video':
+            render_video_preview(source, partial, size)
+        else:
+            render_image_thumbnail(source, partial, size)
+        os.replace(partial, target)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return target
@@ -0,0 +1,139 @@
+import math
+import struct
+from django.db import connection
+from django.contrib.gis.geos import Polygon
+from buildings.functions import X, Y
+from buildings.models import Building
+
+MVT_CONTENT_TYPE = 'application/vnd.mapbox-vector-tile'
+LAYER_NAME = 'buildings'
+EXTENT = 4096
+MAX_ZOOM = 22
+TILE_PROPERTIES = ('rent', 'occupancy', 'county', 'district')
+MAX_LATITUDE = 85.0511287798
+
+
+def validate_tile(z, x, y):
+    if not 0 <= z <= MAX_ZOOM:
+        raise ValueError(f'zoom must be between 0 and {MAX_ZOOM}')
+    if not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise ValueError(f'tile {z}/{x}/{y} does not exist')
+
+def tile_bounds(z, x, y):
+    """(min_lon, min_lat, max_lon, max_lat) of a web mercator tile"""
+    n = 2 ** z
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+    return (x / n * 360 - 180, lat(y + 1), (x + 1) / n * 360 - 180, lat(y))
+
+def tile_for_point(lon, lat, z):
+    """(x, y) of the tile containing a point at zoom level z"""
+    n = 2 ** z
+    px, py = _mercator(lon, lat)
+    return min(int(px * n), n - 1), min(int(py * n), n - 1)
+
+def tiles_in_bbox(min_lon, min_lat, max_lon, max_lat, z):
+    """(x, y) of every tile at zoom level z that intersects a bbox"""
+    min_x, min_y = tile_for_point(min_lon, max_lat, z)
+    max_x, max_y = tile_for_point(max_lon, min_lat, z)
+    return [(x, y) for x in range(min_x, max_x + 1) for y in range(min_y, max_y + 1)]
+
+def _mercator(lon, lat):
+    """web mercator position of a point, scaled to the unit square with y pointing south"""
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    sin_lat = math.sin(math.radians(lat))
+    return (lon + 180) / 360, 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+
+def render_tile(z, x, y):
+    """encode the building layer of one tile, in the database when PostGIS is available"""
+    if connection.ops.postgis:
+        return _render_tile_postgis(z, x, y)
+    return _render_tile_python(z, x, y)
+
+def _render_tile_postgis(z, x, y):
+    sql = f'''
+        WITH bounds AS (SELECT ST_TileEnvelope(%s, %s, %s) AS geom),
+        features AS (
+            SELECT b.id,
+                   ST_AsMVTGeom(ST_Transform(b.building, 3857), bounds.geom, {EXTENT}, 0, true) AS geom,
+                   b.rent::float8 AS rent, b.occupancy, b.county, b.district
+            FROM {Building._meta.db_table} AS b, bounds
+            WHERE b.building && ST_Transform(bounds.geom, 4326)
+        )
+        SELECT ST_AsMVT(features, '{LAYER_NAME}', {EXTENT}, 'geom', 'id') FROM features
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [z, x, y])
+        tile = cursor.fetchone()[0]
+    return bytes(tile) if tile else b''
+
+def _render_tile_python(z, x, y):
+    bounds = Polygon.from_bbox(tile_bounds(z, x, y))
+    bounds.srid = 4326
+    rows = (Building.objects
+        .filter(building__contained=bounds)
+        .annotate(lon=X('building'), lat=Y('building'))
+        .values_list('pk', 'lon', 'lat', *TILE_PROPERTIES)
+        .order_by('pk'))
+    return encode_tile(rows, z, x, y)
+
+def encode_tile(rows, z, x, y):
+    """encode (pk, lon, lat, *TILE_PROPERTIES) rows as a single layer Mapbox Vector Tile"""
+    keys = {}
+    values = {}
+    features = []
+    n = 2 ** z
+    for pk, lon, lat, *properties in rows:
+        px, py = _mercator(lon, lat)
+        tx = round((px * n - x) * EXTENT)
+        ty = round((py * n - y) * EXTENT)
+        tags = []
+        for key, value in zip(TILE_PROPERTIES, properties):
+            if value is None:
+                continue
+            if not isinstance(value, (bool, str)):
+                value = float(value)
+            tags.append(keys.setdefault(key, len(keys)))
+            tags.append(values.setdefault((type(value), value), len(values)))
+        features.append(
+            _field(1, 0, pk)
+            + _field(2, 2, _packed(tags))
+            + _field(3, 0, 1)
+            + _field(4, 2, _packed([9, _zigzag(tx), _zigzag(ty)])))
+    if not features:
+        return b''
+    layer = _field(15, 0, 2) + _field(1, 2, LAYER_NAME.encode())
+    layer += b''.join(_field(2, 2, feature) for feature in features)
+    layer += b''.join(_field(3, 2, key.encode()) for key in keys)
+    layer += b''.join(_field(4, 2, _value(value)) for _, value in values)
+    layer += _field(5, 0, EXTENT)
+    return _field(3, 2, layer)
+
+def _value(value):
+    if isinstance(value, bool):
+        return _field(7, 0, int(value))
+    if isinstance(value, str):
+        return _field(1, 2, value.encode())
+    return _field(3, 1, value)
+
+def _field(number, wire_type, payload):
+    key = _varint(number << 3 | wire_type)
+    if wire_type == 0:
+        return key + _varint(payload)
+    if wire_type == 1:
+        return key + struct.pack('<d', payload)
+    return key + _varint(len(payload)) + payload
+
+def _packed(integers):
+    return b''.join(_varint(integer) for integer in integers)
+
+def _varint(value):
+    out = bytearray()
+    while value > 0x7f:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+def _zigzag(value):
+    return value << 1 if value >= 0 else (-value << 1) - 1
@@ -11,7 +11,7 @@ from rest_framework.response import Response
 from users.models import Profile, UserBuilding
 from buildings.models import Building
 from announcements.models import Notice, Comment
-from users.pagination import CustomPaginator
+from RentalsManagement.pagination import CursorPaginator
 from django.urls import reverse, exceptions
 from django.db.models.deletion import ProtectedError
 from rest_framework.exceptions import PermissionDenied, ValidationError
@@ -96,8 +96,8 @@ def user_logout(request):
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def users_list(request):
-    all_users = User.objects.all()
-    paginator = CustomPaginator()
+    all_users = User.objects.select_related('profile')
+    paginator = CursorPaginator()
     paginated_queryset = paginator.paginate_queryset(all_users, request)
     users = list(map(lambda x : {'user': {**UserSerializer(x).data, 'profile': UserProfileSerializer(x.profile).data}}, paginated_queryset))
     return paginator.get_paginated_response(users)
@@ -170,7 +170,7 @@ def profile_retrieve_update(request, user_id):
 @permission_classes([IsAuthenticated])
 def users_list_by_building(request, building_id):
     def paginate_data(data):
-        paginator = CustomPaginator()
+        paginator = CursorPaginator()
         paginated_queryset = paginator.paginate_queryset(data, request)
         users = list(map(lambda x: {'user': { **UserSerializer(x.profile.user).data, 'profile': UserProfileSerializer(x.profile).data }}, paginated_queryset))
         return (paginator, users)
@@ -179,10 +179,9 @@ def users_list_by_building(request, building_id):
         building = Building.objects.get(pk=building_id)
         check_permission_filter_users_by_building(request, building)
         query_param = request.query_params.get('relationship')
-        linked_profiles = UserBuilding.objects.filter(building=building)
+        linked_profiles = UserBuilding.objects.filter(building=building).select_related('profile__user')
         if query_param == 'owner' or query_param == 'tenant':
-            users = list(filter(lambda x: x.relationship == query_param, linked_profiles))
-            results = paginate_data(users)
+            results = paginate_data(linked_profiles.filter(relationship=query_param))
             return results[0].get_paginated_response(results[1])
         results = paginate_data(linked_profiles)
         return results[0].get_paginated_response(results[1])
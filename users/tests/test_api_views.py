@@ -130,13 +130,21 @@ class TestAllUsers(APITestCase):
         self.assertEqual(len(response.json()['results']), 5)
         self.assertFalse(response.json()['previous'])
         self.assertTrue(response.json()['next'])
+        self.assertNotIn('count', response.json())
         total_pages = math.ceil(len(users) / 5)
-        last_page = self.client.get(self.users_list_url + f'?page={total_pages}', headers={'Authorization': f'Bearer {self.admin_token}'}).json()
-        self.assertTrue(last_page['previous'])
-        self.assertFalse(last_page['next'])
-        first_10_items = self.client.get(self.users_list_url + '?page=1&page_size=10', headers={'Authorization': f'Bearer {self.admin_token}'}).json()['results']
+        page = response.json()
+        user_ids = [x['user']['id'] for x in page['results']]
+        for _ in range(total_pages - 1):
+            page = self.client.get(page['next'], headers={'Authorization': f'Bearer {self.admin_token}'}).json()
+            user_ids += [x['user']['id'] for x in page['results']]
+        self.assertTrue(page['previous'])
+        self.assertFalse(page['next'])
+        self.assertEqual(user_ids, sorted(x.pk for x in users))
+        first_10_items = self.client.get(self.users_list_url + '?page_size=10', headers={'Authorization': f'Bearer {self.admin_token}'}).json()['results']
         self.assertEqual(len(first_10_items), 10)
-        invalid_page = self.client.get(self.users_list_url + f'?page={total_pages + 1}', headers={'Authorization': f'Bearer {self.admin_token}'})
+        counted = self.client.get(self.users_list_url + '?count=true', headers={'Authorization': f'Bearer {self.admin_token}'}).json()
+        self.assertEqual(counted['count'], len(users))
+        invalid_page = self.client.get(self.users_list_url + '?cursor=invalid', headers={'Authorization': f'Bearer {self.admin_token}'})
         self.assertEqual(invalid_page.status_code, 404)
 
 